@@ -0,0 +1,240 @@
+"""
+异步后端 (ASGI)：与 app.py 相同的 /api/nearest_bus_stop、/api/stats 接口，
+基于 asyncpg 连接池，等待数据库时不占用线程；并发的相同查询合并为一次数据库请求。
+名称解析 (fuzzy=1、matched_name) 与 app.py 共用 name_search.resolve_name。
+
+启动: python serve.py --stack asgi --workers 4
+"""
+import asyncio
+import contextlib
+import logging
+import os
+import sys
+
+import asyncpg
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.university_stats import STATS_TABLE, RADII
+from common.dataset_version import VERSION_TABLE
+import config
+from name_search import NAMES_SQL, NameIndex, resolve_name
+
+logger = logging.getLogger("backend.asgi")
+
+NEAREST_STOP_SQL = """
+    SELECT 
+        b.station as station_name, 
+        ST_X(b.geometry) as lon, 
+        ST_Y(b.geometry) as lat,
+        ST_Distance(b.geometry::geography, ST_Centroid(u.geometry)::geography) as dist
+    FROM "Gz_Stops" b, "Gz_universities" u
+    WHERE u.name = $1
+    ORDER BY b.geometry <-> ST_Centroid(u.geometry)
+    LIMIT 1
+"""
+
+STATS_SQL = f"""
+    SELECT name, count, lon, lat
+    FROM (
+        SELECT name, lon, lat,
+               CASE $1::integer {" ".join(f"WHEN {r} THEN cnt_{r}" for r in RADII)} END as count
+        FROM "{STATS_TABLE}"
+    ) s
+    ORDER BY count DESC
+"""
+
+STATS_LIVE_SQL = """
+    SELECT 
+        u.name, 
+        COUNT(b.station) as count,
+        ST_X(ST_Centroid(u.geometry)) as lon,
+        ST_Y(ST_Centroid(u.geometry)) as lat
+    FROM "Gz_universities" u
+    LEFT JOIN "Gz_Stops" b 
+    ON ST_DWithin(ST_Centroid(u.geometry)::geography, b.geometry::geography, 100)
+    GROUP BY u.name, u.geometry
+    ORDER BY count DESC
+"""
+
+
+VERSIONS_SQL = f"""
+    SELECT dataset, version FROM "{VERSION_TABLE}" ORDER BY dataset
+"""
+
+
+class SingleFlight:
+    """
+    请求合并：同一个 key 同时只有一个查询在执行，其余并发请求等待并共享它的结果。
+    查询结束后立即移除，不充当缓存。
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.shared = 0
+
+    async def do(self, key, fn):
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+        # shield: 某个客户端断开 (取消) 不影响其他等待同一结果的请求
+        return await asyncio.shield(future)
+
+
+pool = None
+single_flight = SingleFlight()
+# 高校名称索引，启动时加载，数据版本变化时重建 (与 app.py 的 NameIndexHolder 相同)
+name_index = None
+
+
+def asyncpg_dsn(url):
+    # SQLAlchemy 风格的 postgresql+psycopg2:// 转为 asyncpg 可识别的 postgresql://
+    scheme, rest = url.split("://", 1)
+    return "postgresql://" + rest
+
+
+async def startup():
+    global pool
+    pool = await asyncpg.create_pool(
+        asyncpg_dsn(config.DATABASE_URL),
+        min_size=config.DB_POOL_SIZE,
+        max_size=config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW,
+        max_inactive_connection_lifetime=config.DB_POOL_RECYCLE,
+        server_settings={"statement_timeout": str(config.STATEMENT_TIMEOUT_MS)},
+    )
+    logger.info("asyncpg 连接池已创建 (min=%d, max=%d)",
+                config.DB_POOL_SIZE, config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW)
+
+
+async def shutdown():
+    if pool is not None:
+        await pool.close()
+
+
+async def refresh_name_index():
+    """数据版本 (dataset_version 表) 与当前索引不同时重建名称索引；版本表不存在时只加载一次"""
+    global name_index
+    async with pool.acquire(timeout=config.DB_POOL_TIMEOUT) as conn:
+        try:
+            token = repr([tuple(row) for row in await conn.fetch(VERSIONS_SQL)])
+        except asyncpg.UndefinedTableError:
+            token = None
+        if name_index is not None and (token is None or name_index.token == token):
+            return
+        names = [row["name"] for row in await conn.fetch(NAMES_SQL.text)]
+    # 拼音索引的构建是纯 CPU 计算，放到线程中，不阻塞事件循环
+    name_index = await asyncio.to_thread(NameIndex, names, token)
+    logger.info("名称索引已加载: %d 所高校", len(name_index.names))
+
+
+async def watch_name_index():
+    while True:
+        await asyncio.sleep(config.DATA_VERSION_CHECK_SECONDS)
+        try:
+            await refresh_name_index()
+        except Exception as e:
+            logger.warning("名称索引刷新失败: %s", e)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    await startup()
+    try:
+        await refresh_name_index()
+    except Exception as e:
+        logger.warning("名称索引加载失败，fuzzy=1 暂时按原名查询: %s", e)
+    watcher = asyncio.ensure_future(watch_name_index()) if config.DATA_VERSION_CHECK_SECONDS > 0 else None
+    try:
+        yield
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        await shutdown()
+
+
+def timeout_seconds(endpoint):
+    return config.ENDPOINT_TIMEOUT_MS.get(endpoint, config.STATEMENT_TIMEOUT_MS) / 1000.0
+
+
+async def fetch_nearest(uni_name):
+    # asyncpg 会在每个连接上自动预编译并缓存语句
+    async with pool.acquire(timeout=config.DB_POOL_TIMEOUT) as conn:
+        return await conn.fetchrow(NEAREST_STOP_SQL, uni_name, timeout=timeout_seconds("nearest_bus_stop"))
+
+
+async def fetch_stats(radius):
+    async with pool.acquire(timeout=config.DB_POOL_TIMEOUT) as conn:
+        try:
+            return await conn.fetch(STATS_SQL, radius, timeout=timeout_seconds("stats"))
+        except asyncpg.UndefinedTableError:
+            if radius != 100:
+                raise
+            logger.warning("统计表 %s 不存在，回退到实时计算", STATS_TABLE)
+            return await conn.fetch(STATS_LIVE_SQL, timeout=timeout_seconds("stats"))
+
+
+async def get_nearest_bus_stop(request):
+    uni_name = (request.query_params.get('name') or "").strip()
+    if not uni_name:
+        return JSONResponse({"error": "Missing 'name' parameter"}, status_code=400)
+    # fuzzy=1 时允许简称、拼音和错别字，例如 "华工" -> 华南理工大学
+    matched_name = resolve_name(name_index, uni_name) if request.query_params.get('fuzzy') == '1' else uni_name
+
+    try:
+        row = await single_flight.do(("nearest", matched_name), lambda: fetch_nearest(matched_name))
+    except Exception as e:
+        logger.exception("Database error")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    if row is None:
+        return JSONResponse({"error": "未找到该学校或附近无站点"}, status_code=404)
+    data = {
+        "station": row["station_name"],
+        "distance_meters": round(row["dist"], 2),
+        "lat": row["lat"],
+        "lon": row["lon"],
+        "coordinates": [row["lon"], row["lat"]]
+    }
+    if matched_name != uni_name:
+        data["matched_name"] = matched_name
+    return JSONResponse(data)
+
+
+async def get_university_stats(request):
+    try:
+        radius = int(request.query_params.get('radius', 100))
+    except ValueError:
+        radius = None
+    if radius not in RADII:
+        return JSONResponse({"error": f"'radius' must be one of {list(RADII)}"}, status_code=400)
+
+    try:
+        rows = await single_flight.do(("stats", radius), lambda: fetch_stats(radius))
+    except Exception as e:
+        logger.exception("Error")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    return JSONResponse([
+        {"name": row["name"], "count": row["count"], "lat": row["lat"], "lon": row["lon"]}
+        for row in rows
+    ])
+
+
+logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s")
+
+app = Starlette(
+    routes=[
+        Route('/api/nearest_bus_stop', get_nearest_bus_stop, methods=['GET']),
+        Route('/api/stats', get_university_stats, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+    lifespan=lifespan,
+)
@@ -0,0 +1,83 @@
+import hashlib
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+from common.dataset_version import fetch_dataset_versions
+
+logger = logging.getLogger(__name__)
+
+# 版本表不存在时 (导入脚本尚未写过版本戳) 的回退签名：
+# 表被 replace 时 oid 会变，增删改会体现在统计计数里
+TABLE_SIGNATURE_SQL = text("""
+    SELECT c.relname, c.oid::bigint AS oid,
+           COALESCE(s.n_tup_ins, 0) + COALESCE(s.n_tup_upd, 0) + COALESCE(s.n_tup_del, 0) AS changes
+    FROM pg_class c
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE c.relname IN ('Gz_BusStops', 'Gz_Stops', 'Gz_universities')
+    ORDER BY c.relname;
+""")
+
+
+class DataVersion:
+    """
+    后台定期读取数据集版本戳，得到当前数据版本 token。
+    内存索引、响应缓存等通过 add_listener 订阅，每次检查后都会收到当前 token，
+    由订阅方自行判断是否需要刷新。订阅方全部返回后 self.token 才更新为新版本。
+    """
+
+    def __init__(self, engine, check_seconds=5):
+        self.engine = engine
+        self.check_seconds = check_seconds
+        self.token = None
+        # 最近一次入库时间 (用于 Last-Modified)，版本表不存在时为 None
+        self.last_modified = None
+        self._listeners = []
+        self._thread = None
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def check(self):
+        with self.engine.connect() as conn:
+            rows = fetch_dataset_versions(conn)
+            if rows:
+                last_modified = max(row[2] for row in rows)
+            else:
+                rows = [tuple(row) for row in conn.execute(TABLE_SIGNATURE_SQL)]
+                last_modified = None
+
+        token = hashlib.sha1(repr(rows).encode("utf-8")).hexdigest()[:16]
+        if token != self.token:
+            logger.info("数据版本变化: %s -> %s", self.token, token)
+
+        # 订阅方 (内存索引等) 全部刷新完后才公布新 token：刷新期间的请求仍由旧索引回答，
+        # 响应按旧 token 缓存，公布后随即失效，不会以新 token / ETag 缓存旧数据
+        for listener in self._listeners:
+            try:
+                listener(token)
+            except Exception as e:
+                logger.warning("数据版本订阅方刷新失败: %s", e)
+        self.token = token
+        self.last_modified = last_modified
+        return token
+
+    def start(self):
+        try:
+            self.check()
+        except Exception as e:
+            logger.warning("读取数据版本失败，暂不启用缓存: %s", e)
+
+        if self.check_seconds > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="data-version-watcher", daemon=True)
+            self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.check_seconds)
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning("读取数据版本失败: %s", e)
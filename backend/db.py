@@ -0,0 +1,75 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, text
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+engine = create_engine(
+    config.DATABASE_URL,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+    pool_timeout=config.DB_POOL_TIMEOUT,
+    pool_recycle=config.DB_POOL_RECYCLE,
+    pool_pre_ping=config.DB_POOL_PRE_PING,
+    # 连接级默认超时，各接口可在事务内用 SET LOCAL 收紧
+    connect_args={"options": f"-c statement_timeout={config.STATEMENT_TIMEOUT_MS}"},
+)
+metrics.instrument_engine(engine)
+
+SET_TIMEOUT_SQL = text("SELECT set_config('statement_timeout', :timeout, true)")
+
+
+@contextmanager
+def connect(endpoint=None):
+    """
+    从连接池借出连接并开启事务。
+    endpoint 对应 config.ENDPOINT_TIMEOUT_MS 中的键，超时只在本事务内生效 (SET LOCAL)，
+    与连接默认值相同时不额外发送语句。借出连接的等待时间计入 pool 阶段。
+    """
+    timeout_ms = config.ENDPOINT_TIMEOUT_MS.get(endpoint, config.STATEMENT_TIMEOUT_MS)
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        waited = time.perf_counter() - start
+        metrics.POOL_CHECKOUT_WAIT.observe(value=waited)
+        metrics.record_stage("pool", waited)
+        with conn.begin():
+            if timeout_ms != config.STATEMENT_TIMEOUT_MS:
+                conn.execute(SET_TIMEOUT_SQL, {"timeout": str(timeout_ms)})
+            yield conn
+
+
+class PreparedStatement:
+    """
+    服务端预编译语句 (PREPARE / EXECUTE)。
+    每个数据库连接第一次使用时 PREPARE，之后只发送 EXECUTE 和参数，省去解析与规划。
+    表被重新导入 (DROP/CREATE) 后 PostgreSQL 会自动重新规划，无需重新 PREPARE。
+    """
+
+    def __init__(self, name, arg_types, sql, params):
+        self.name = name
+        self.prepare_sql = text(f"PREPARE {name} ({', '.join(arg_types)}) AS {sql}")
+        self.execute_sql = text(f"EXECUTE {name} ({', '.join(':' + p for p in params)})")
+
+    def execute(self, conn, params=None):
+        # conn.info 随底层 DBAPI 连接保存，连接归还连接池后仍然有效
+        prepared = conn.info.setdefault("prepared_statements", set())
+        if self.name not in prepared:
+            exists = conn.execute(PREPARED_EXISTS_SQL, {"name": self.name}).scalar()
+            if not exists:
+                conn.execute(self.prepare_sql)
+                logger.debug("prepared %s on new connection", self.name)
+            prepared.add(self.name)
+        try:
+            return conn.execute(self.execute_sql, params or {})
+        except Exception:
+            # 下次使用时重新确认该连接上的预编译状态
+            prepared.discard(self.name)
+            raise
+
+
+PREPARED_EXISTS_SQL = text("SELECT EXISTS (SELECT 1 FROM pg_prepared_statements WHERE name = :name)")
@@ -0,0 +1,183 @@
+"""
+简易 Prometheus 指标 (Counter / Gauge / Histogram)，以文本格式在 /metrics 输出。
+
+每个 worker 进程各自统计；多进程部署时由 Prometheus 分别抓取，或在前面加汇总。
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+from flask.json.provider import DefaultJSONProvider
+
+# 延迟类指标的默认分桶 (秒)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self):
+        lines = self.header()
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}_total{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), func=None):
+        super().__init__(name, help_text, labels)
+        # 无标签的 gauge 可以在输出时调用 func 取值
+        self.func = func
+
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self):
+        lines = self.header()
+        if self.func is not None:
+            lines.append(f"{self.name} {self.func()}")
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *label_values, value):
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            state[1] += 1
+            state[2] += value
+
+    def render(self):
+        lines = self.header()
+        for label_values, (counts, total, value_sum) in sorted(self._values.items()):
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, [('le', '+Inf')])} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {total}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {value_sum}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render_all():
+    lines = []
+    for metric in REGISTRY:
+        with metric._lock:
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---- 后端使用的指标 ----
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ("endpoint", "method", "status"))
+STAGE_LATENCY = Histogram("backend_stage_duration_seconds",
+                          "Time spent per request stage (db, pool, serialize, index)", ("endpoint", "stage"))
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "Database statement execution time", ("endpoint",))
+DB_ROWS = Histogram("db_rows_returned", "Rows returned per database statement", ("endpoint",), buckets=ROW_BUCKETS)
+POOL_CHECKOUT_WAIT = Histogram("db_pool_checkout_seconds", "Time waiting to check out a pooled connection")
+CACHE_REQUESTS = Counter("cache_requests", "Cache lookups by cache, endpoint and result (hit/miss)",
+                         ("cache", "endpoint", "result"))
+
+
+def current_endpoint():
+    if has_request_context():
+        from flask import request
+        return request.endpoint or "unknown"
+    return "background"
+
+
+def record_stage(stage, seconds):
+    """记录请求内某一阶段的耗时：进入直方图，并累计到 g 中用于 Server-Timing"""
+    endpoint = current_endpoint()
+    STAGE_LATENCY.observe(endpoint, stage, value=seconds)
+    if has_request_context():
+        timings = g.setdefault("stage_timings", {})
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def server_timing_header(total_seconds):
+    parts = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in g.get("stage_timings", {}).items()]
+    parts.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify 使用的 JSON 序列化，单独计为 serialize 阶段"""
+
+    def dumps(self, obj, **kwargs):
+        with timed("serialize"):
+            return super().dumps(obj, **kwargs)
+
+
+def instrument_engine(engine):
+    """通过 SQLAlchemy 事件统计每条语句的执行时间与返回行数"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        endpoint = current_endpoint()
+        DB_QUERY_LATENCY.observe(endpoint, value=elapsed)
+        record_stage("db", elapsed)
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            DB_ROWS.observe(endpoint, value=cursor.rowcount)
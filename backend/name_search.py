@@ -0,0 +1,198 @@
+"""
+高校名称检索：前缀 Trie、拼音全拼 / 首字母索引、简称 (按字顺序的子序列，如 "华工" -> 华南理工大学)
+以及有界编辑距离 (容错拼写)。启动时从 "Gz_universities" 建立，数据版本变化时重建。
+
+拼音索引依赖可选的 pypinyin，未安装时只使用汉字匹配。
+"""
+import logging
+import threading
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:  # pragma: no cover - 可选依赖
+    lazy_pinyin = None
+
+NAMES_SQL = text("""
+    SELECT DISTINCT name FROM "Gz_universities" WHERE name IS NOT NULL;
+""")
+
+# 匹配类型及其排序优先级 (越小越靠前)
+MATCH_RANK = {
+    "exact": 0,
+    "prefix": 1,
+    "pinyin": 2,
+    "initials": 2,
+    "abbreviation": 3,
+    "fuzzy": 4,
+}
+
+
+def normalize(s):
+    return "".join(s.split()).lower()
+
+
+class Trie:
+    """前缀树：每个节点记录经过它的所有词的编号，前缀查询为 O(前缀长度)"""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, word, item):
+        node = self.root
+        for ch in word:
+            node = node.setdefault(ch, {})
+            node.setdefault(None, []).append(item)
+
+    def prefix(self, prefix):
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+        return node.get(None, [])
+
+
+def is_subsequence(query, word):
+    it = iter(word)
+    return all(ch in it for ch in query)
+
+
+def bounded_edit_distance(a, b, max_dist):
+    """Levenshtein 距离，超过 max_dist 时提前返回 max_dist + 1"""
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            row_min = min(row_min, cur[j])
+        if row_min > max_dist:
+            return max_dist + 1
+        prev = cur
+    return prev[-1]
+
+
+class NameIndex:
+    def __init__(self, names, token=None):
+        self.names = sorted(set(names))
+        self.token = token
+        self._keys = [normalize(n) for n in self.names]
+        self._exact = {key: i for i, key in enumerate(self._keys)}
+
+        self._trie = Trie()
+        self._pinyin_trie = Trie()
+        self._initials_trie = Trie()
+        self._pinyin = [None] * len(self.names)
+        for i, key in enumerate(self._keys):
+            self._trie.insert(key, i)
+            if lazy_pinyin is not None:
+                syllables = lazy_pinyin(key)
+                full = "".join(syllables)
+                initials = "".join(s[0] for s in syllables if s)
+                self._pinyin[i] = full
+                self._pinyin_trie.insert(full, i)
+                self._initials_trie.insert(initials, i)
+
+    @classmethod
+    def load(cls, engine, token=None):
+        with engine.connect() as conn:
+            names = [row.name for row in conn.execute(NAMES_SQL)]
+        return cls(names, token)
+
+    def __contains__(self, name):
+        return normalize(name) in self._exact
+
+    def canonical(self, name):
+        """忽略大小写与空白后与库中名称相同时，返回库中的写法，否则返回 None"""
+        i = self._exact.get(normalize(name))
+        return None if i is None else self.names[i]
+
+    def search(self, query, limit=10):
+        """返回 [(name, match_type, score), ...]，score 越小越相关"""
+        q = normalize(query)
+        if not q:
+            return []
+
+        best = {}
+
+        def add(i, match, extra=0.0):
+            # score: 匹配类型优先，其次是额外代价，最后偏好较短的名称
+            score = MATCH_RANK[match] * 100 + extra * 10 + len(self._keys[i]) / 100.0
+            if i not in best or score < best[i][1]:
+                best[i] = (match, score)
+
+        exact = self._exact.get(q)
+        if exact is not None:
+            add(exact, "exact")
+
+        for i in self._trie.prefix(q):
+            add(i, "prefix")
+
+        if q.isascii() and lazy_pinyin is not None:
+            for i in self._pinyin_trie.prefix(q):
+                add(i, "pinyin")
+            for i in self._initials_trie.prefix(q):
+                add(i, "initials")
+
+        # 简称：查询的每个字按顺序出现在名称中，且首字相同
+        if len(q) >= 2:
+            for i, key in enumerate(self._keys):
+                if key[0] == q[0] and is_subsequence(q, key):
+                    add(i, "abbreviation", extra=(len(key) - len(q)) / len(key))
+
+        # 容错：与名称 (或拼音) 的编辑距离不超过 1 (短查询) / 2 (长查询)
+        if len(best) < limit:
+            max_dist = 1 if len(q) <= 4 else 2
+            for i, key in enumerate(self._keys):
+                d = bounded_edit_distance(q, key, max_dist)
+                pinyin = self._pinyin[i]
+                if d > max_dist and pinyin is not None and q.isascii():
+                    d = bounded_edit_distance(q, pinyin, max_dist)
+                if d <= max_dist:
+                    add(i, "fuzzy", extra=d)
+
+        ranked = sorted(best.items(), key=lambda item: (item[1][1], self.names[item[0]]))
+        return [(self.names[i], match, round(score, 2)) for i, (match, score) in ranked[:limit]]
+
+    def resolve(self, query):
+        """把近似名称解析为唯一的高校名称，找不到时返回 None"""
+        results = self.search(query, limit=1)
+        return results[0][0] if results else None
+
+
+def resolve_name(index, query):
+    """
+    把查询解析为库中的高校名称 (Flask 与 ASGI 后端共用)：规范化后与库中名称相同时返回库中写法，
+    否则按简称、拼音、错别字匹配。index 为 None (未加载) 或找不到时原样返回
+    """
+    if index is None:
+        return query
+    return index.canonical(query) or index.resolve(query) or query
+
+
+class NameIndexHolder:
+    """与 SpatialIndexHolder 相同：订阅数据版本，版本变化时重建"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.current = None
+        self._lock = threading.Lock()
+
+    def reload(self, token=None):
+        with self._lock:
+            index = NameIndex.load(self.engine, token)
+            self.current = index
+            logger.info("名称索引已加载: %d 所高校 (拼音索引%s)", len(index.names),
+                        "已启用" if lazy_pinyin is not None else "未启用，需要 pypinyin")
+            return index
+
+    def on_data_change(self, token):
+        current = self.current
+        if current is None or current.token != token:
+            self.reload(token)
@@ -0,0 +1,108 @@
+"""
+按需开启的采样分析器：运行时对指定接口的处理线程定期采样调用栈，
+输出折叠栈 (collapsed stacks) 文本，可直接交给 flamegraph.pl / speedscope 生成火焰图。
+不需要重启服务，也不会在未开启时带来任何开销。
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    def __init__(self):
+        # 线程 id -> 正在处理的接口名，由请求钩子维护
+        self.active_threads = {}
+        self.samples = Counter()
+        self.sample_count = 0
+        self.endpoint = None
+        self.running = False
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = None
+
+    def enter(self, endpoint):
+        if self.running:
+            self.active_threads[threading.get_ident()] = endpoint
+
+    def exit(self):
+        self.active_threads.pop(threading.get_ident(), None)
+
+    def start(self, endpoint=None, seconds=30.0, interval=0.005):
+        """开始采样；endpoint 为 None 时采样所有请求线程"""
+        with self._lock:
+            if self.running:
+                return False
+            previous = self._thread
+        # running 为 False 时上一个采样线程已走到收尾，等它完全退出，保证同时只有一个采样线程
+        if previous is not None:
+            previous.join()
+        with self._lock:
+            if self.running:
+                return False
+            self.samples = Counter()
+            self.sample_count = 0
+            self.endpoint = endpoint
+            self.running = True
+            self.started_at = time.time()
+            self.finished_at = None
+            # 每次会话一个停止事件：旧线程只响应自己的事件，不会被新会话的 running 重新唤起
+            self._stop_event = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop_event, seconds, interval),
+                                            name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """停止当前会话并等待采样线程退出"""
+        with self._lock:
+            thread, stop_event = self._thread, self._stop_event
+        if stop_event is not None:
+            stop_event.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self, stop_event, seconds, interval):
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while not stop_event.is_set() and time.monotonic() < deadline:
+            frames = sys._current_frames()
+            for ident, endpoint in list(self.active_threads.items()):
+                if ident == own_ident or (self.endpoint is not None and endpoint != self.endpoint):
+                    continue
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                self.samples[self._collapse(endpoint, frame)] += 1
+                self.sample_count += 1
+            stop_event.wait(interval)
+        with self._lock:
+            if self._stop_event is stop_event:
+                self.running = False
+                self.active_threads.clear()
+                self.finished_at = time.time()
+
+    @staticmethod
+    def _collapse(endpoint, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        stack.append(endpoint)
+        return ";".join(reversed(stack))
+
+    def status(self):
+        return {
+            "running": self.running,
+            "endpoint": self.endpoint,
+            "samples": self.sample_count,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
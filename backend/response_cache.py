@@ -0,0 +1,107 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request, make_response, Response
+
+import metrics
+
+
+class CacheEntry:
+    __slots__ = ("body", "status", "mimetype", "etag", "token", "expires_at")
+
+    def __init__(self, body, status, mimetype, token, ttl):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.token = token
+        # 强 ETag：同一数据版本下内容相同则 ETag 相同
+        self.etag = hashlib.sha1(token.encode("ascii") + body).hexdigest()
+        self.expires_at = time.monotonic() + ttl
+
+
+class ResponseCache:
+    """
+    有界 LRU + TTL 的响应缓存。键为 (接口, 规范化参数)，
+    条目记录生成时的数据版本 token，版本变化后旧条目自动失效。
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, token):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.token != token or entry.expires_at < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, token, body, status, mimetype):
+        entry = CacheEntry(body, status, mimetype, token, self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def on_data_change(self, token):
+        # 旧版本的条目在 get 时按 token 失效；这里顺便清掉，及时释放内存
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e.token != token]
+            for k in stale:
+                del self._entries[k]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def cached_endpoint(cache, data_version, endpoint, normalize, cache_statuses=(200, 404)):
+    """
+    Flask 视图装饰器：按 (endpoint, normalize(request.args)) 缓存响应，
+    并处理 ETag / Last-Modified 条件请求。命中缓存且客户端版本一致时直接返回 304，不访问数据库。
+    数据版本未知 (数据库不可用) 时不缓存。
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            token = data_version.token
+            if token is None:
+                return view(*args, **kwargs)
+
+            key = (endpoint, normalize(request.args))
+            entry = cache.get(key, token)
+            metrics.CACHE_REQUESTS.inc("response", endpoint, "miss" if entry is None else "hit")
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code not in cache_statuses:
+                    return response
+                entry = cache.put(key, token, response.get_data(), response.status_code, response.mimetype)
+
+            response = Response(entry.body, status=entry.status, mimetype=entry.mimetype)
+            if entry.status != 200:
+                return response
+            response.set_etag(entry.etag)
+            if data_version.last_modified is not None:
+                response.last_modified = data_version.last_modified
+            # 浏览器每次都带 If-None-Match 回源校验，数据未变时得到 304
+            response.cache_control.no_cache = True
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
@@ -0,0 +1,87 @@
+"""
+生产环境入口：用多进程 / 多线程 WSGI 服务器运行后端，替代 Flask 自带的调试服务器。
+
+    python serve.py                          # Linux: gunicorn, 进程数默认为 CPU 核数 * 2 + 1
+    python serve.py --server waitress        # Windows 或无 gunicorn 时使用 waitress (多线程)
+    python serve.py --workers 4 --threads 4 --bind 0.0.0.0:5000
+    python serve.py --stack asgi --workers 4 # 异步后端 (asgi_app.py, uvicorn + asyncpg)
+
+也可以直接使用 gunicorn 命令行：
+    gunicorn --chdir backend -w 4 -b 0.0.0.0:5000 app:app
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+
+# 保证从任意目录启动时都能导入 app / config 等模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the backend with a production WSGI/ASGI server")
+    parser.add_argument("--stack", choices=["wsgi", "asgi"], default=os.environ.get("BACKEND_STACK", "wsgi"),
+                        help="wsgi: Flask app (app.py); asgi: async app (asgi_app.py) on uvicorn")
+    parser.add_argument("--server", choices=["gunicorn", "waitress"],
+                        default=os.environ.get("WSGI_SERVER", "waitress" if os.name == "nt" else "gunicorn"))
+    parser.add_argument("--bind", default=os.environ.get("BIND", "0.0.0.0:5000"))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get("WEB_WORKERS", multiprocessing.cpu_count() * 2 + 1)),
+                        help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("WEB_THREADS", 4)),
+                        help="threads per worker (gunicorn gthread) or total threads (waitress)")
+    parser.add_argument("--timeout", type=int, default=int(os.environ.get("WEB_TIMEOUT", 30)))
+    return parser.parse_args(argv)
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class BackendApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", args.bind)
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("threads", args.threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("timeout", args.timeout)
+            # 每个 worker 自己导入 app：连接池与内存索引都不能跨 fork 共享
+            self.cfg.set("preload_app", False)
+            self.cfg.set("accesslog", "-")
+
+        def load(self):
+            from app import app
+            return app
+
+    BackendApplication().run()
+
+
+def run_waitress(args):
+    from waitress import serve
+    from app import app
+
+    host, _, port = args.bind.rpartition(":")
+    serve(app, host=host or "0.0.0.0", port=int(port), threads=args.threads,
+          channel_timeout=args.timeout)
+
+
+def run_uvicorn(args):
+    import uvicorn
+
+    host, _, port = args.bind.rpartition(":")
+    # 多进程时 uvicorn 需要以字符串形式导入应用
+    uvicorn.run("asgi_app:app", host=host or "0.0.0.0", port=int(port), workers=args.workers,
+                app_dir=os.path.dirname(os.path.abspath(__file__)), timeout_keep_alive=args.timeout)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.stack == "asgi":
+        run_uvicorn(args)
+    elif args.server == "gunicorn":
+        run_gunicorn(args)
+    else:
+        run_waitress(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+
+import numpy as np
+import shapely
+from pyproj import Geod
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# 与 PostGIS geography 的 ST_Distance 一致：WGS84 椭球上的测地线距离
+GEOD = Geod(ellps="WGS84")
+
+# 1 度纬度约对应的米数 (取偏小值，换算出的搜索范围只会偏大)
+METERS_PER_DEGREE = 110500.0
+
+STOPS_SQL = text("""
+    SELECT b.station AS station_name, ST_X(b.geometry) AS lon, ST_Y(b.geometry) AS lat
+    FROM "Gz_Stops" b
+    WHERE b.geometry IS NOT NULL;
+""")
+
+# 质心在数据库里算一次，保证与原 SQL 路径的 ST_Centroid 结果完全一致
+CENTROIDS_SQL = text("""
+    SELECT u.name, ST_X(ST_Centroid(u.geometry)) AS lon, ST_Y(ST_Centroid(u.geometry)) AS lat
+    FROM "Gz_universities" u
+    WHERE u.geometry IS NOT NULL;
+""")
+
+class SpatialIndex:
+    """
+    公交站点的内存空间索引 (STRtree) + 高校名称 -> 质心 映射。
+    建好后只读，重新加载时整体替换，因此查询无需加锁。
+    """
+
+    def __init__(self, stations, lons, lats, centroids, token=None):
+        self.stations = stations
+        self.lons = np.asarray(lons, dtype="float64")
+        self.lats = np.asarray(lats, dtype="float64")
+        self.centroids = centroids
+        # 加载时的数据版本
+        self.token = token
+        self.loaded_at = time.time()
+        # 与 SQL 的 `b.geometry <-> centroid` 相同：按经纬度平面距离找最近点
+        self.tree = shapely.STRtree(shapely.points(self.lons, self.lats))
+
+    @classmethod
+    def load(cls, engine, token=None):
+        with engine.connect() as conn:
+            stops = conn.execute(STOPS_SQL).fetchall()
+            unis = conn.execute(CENTROIDS_SQL).fetchall()
+
+        stations = [row.station_name for row in stops]
+        lons = [row.lon for row in stops]
+        lats = [row.lat for row in stops]
+        centroids = {row.name: (row.lon, row.lat) for row in unis}
+        return cls(stations, lons, lats, centroids, token)
+
+    def __len__(self):
+        return len(self.stations)
+
+    def nearest(self, lon, lat):
+        """返回距离 (lon, lat) 最近的站点 (站名, 经度, 纬度, 测地线距离/米)，无站点时返回 None"""
+        if not self.stations:
+            return None
+        idx = self.tree.query_nearest(shapely.Point(lon, lat))
+        # 距离相同的多个站点时取第一个
+        i = int(idx.min())
+        _, _, dist = GEOD.inv(lon, lat, self.lons[i], self.lats[i])
+        return self.stations[i], float(self.lons[i]), float(self.lats[i]), float(dist)
+
+    def nearest_to_university(self, name):
+        centroid = self.centroids.get(name)
+        if centroid is None:
+            return None
+        return self.nearest(*centroid)
+
+    def nearest_many(self, lons, lats, k=1, max_radius=None, search_radius=2000.0):
+        """
+        批量查询：对每个查询点返回最近的 k 个站点，整批一次向量化完成。
+
+        与 SQL 路径 (nearest_stops_from_db) 的结果一致：按经纬度平面距离取最近的 k 个
+        (指定 max_radius 时先按测地线距离过滤)，再按测地线距离排序。
+        不限半径时从 search_radius 米开始搜索，站点不足 k 个的查询点逐步扩大范围。
+        返回长度与输入相同的列表，每项为 [(站名, 经度, 纬度, 距离), ...]
+        """
+        lons = np.asarray(lons, dtype="float64")
+        lats = np.asarray(lats, dtype="float64")
+        results = [[] for _ in range(len(lons))]
+        if not self.stations or len(lons) == 0:
+            return results
+
+        points = shapely.points(lons, lats)
+        if k == 1 and max_radius is None:
+            q_idx, s_idx = self.tree.query_nearest(points, all_matches=False)
+        elif max_radius is None:
+            q_idx, s_idx = self._candidates(points, min(k, len(self.stations)), search_radius)
+        else:
+            # 米 -> 度：每个点按自身纬度 (再加上半径可达的纬度) 的经度收缩放大，
+            # 保证不漏掉候选点，之后再按测地线距离精确过滤
+            reach = np.minimum(np.abs(lats) + max_radius / METERS_PER_DEGREE, 90.0)
+            cos_lat = np.maximum(np.cos(np.radians(reach)), 0.01)
+            q_idx, s_idx = self.tree.query(points, predicate="dwithin",
+                                           distance=max_radius / (METERS_PER_DEGREE * cos_lat))
+
+        _, _, dist = GEOD.inv(lons[q_idx], lats[q_idx], self.lons[s_idx], self.lats[s_idx])
+        dist = np.asarray(dist)
+        if max_radius is not None:
+            keep = dist <= max_radius
+            q_idx, s_idx, dist = q_idx[keep], s_idx[keep], dist[keep]
+
+        # 按 (查询点, 平面距离) 排序后，每组只保留前 k 个 (同 SQL 的 ORDER BY <-> LIMIT k)
+        planar = np.hypot(lons[q_idx] - self.lons[s_idx], lats[q_idx] - self.lats[s_idx])
+        order = np.lexsort((s_idx, planar, q_idx))
+        q_idx, s_idx, dist = q_idx[order], s_idx[order], dist[order]
+        group_start = np.r_[True, q_idx[1:] != q_idx[:-1]]
+        start_pos = np.maximum.accumulate(np.where(group_start, np.arange(len(q_idx)), 0))
+        keep = (np.arange(len(q_idx)) - start_pos) < k
+        q_idx, s_idx, dist = q_idx[keep], s_idx[keep], dist[keep]
+
+        # 每组内再按测地线距离排序输出
+        order = np.lexsort((dist, q_idx))
+        for q, i, d in zip(q_idx[order], s_idx[order], dist[order]):
+            results[q].append((self.stations[i], float(self.lons[i]), float(self.lats[i]), float(d)))
+        return results
+
+    def _candidates(self, points, need, search_radius):
+        """
+        每个查询点平面距离最近的 need 个站点一定在返回的候选中：
+        按度数半径查询，候选不足 need 个的点把半径放大 4 倍重查，直到全部满足
+        """
+        radius_deg = search_radius / METERS_PER_DEGREE
+        pending = np.arange(len(points))
+        q_parts, s_parts = [], []
+        while len(pending):
+            q, s = self.tree.query(points[pending], predicate="dwithin", distance=radius_deg)
+            done = np.bincount(q, minlength=len(pending)) >= need
+            q_parts.append(pending[q[done[q]]])
+            s_parts.append(s[done[q]])
+            pending = pending[~done]
+            radius_deg *= 4
+        return np.concatenate(q_parts), np.concatenate(s_parts)
+
+
+class SpatialIndexHolder:
+    """
+    持有当前索引。订阅数据版本 (DataVersion)，版本变化时重新加载。
+    加载失败时 current 保持为旧索引 (或 None)，调用方应回退到 SQL 查询。
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.current = None
+        self._lock = threading.Lock()
+
+    def reload(self, token=None):
+        with self._lock:
+            index = SpatialIndex.load(self.engine, token)
+            self.current = index
+            logger.info("空间索引已加载: %d 个站点, %d 所高校", len(index), len(index.centroids))
+            return index
+
+    def on_data_change(self, token):
+        current = self.current
+        if current is None or current.token != token:
+            self.reload(token)
+
+    def start(self, token=None):
+        try:
+            self.reload(token)
+        except Exception as e:
+            logger.warning("空间索引加载失败，暂时使用 SQL 查询: %s", e)
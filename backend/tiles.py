@@ -0,0 +1,156 @@
+"""
+Mapbox Vector Tile (MVT) 图层：高校边界与公交站点。
+
+瓦片由 PostGIS 的 ST_AsMVT 生成：高校边界按缩放级别简化，
+低缩放级别下公交站点按网格聚合为带 count 属性的点。
+公交站点来自去重后的 "Gz_Stops"，每个物理站点一个点 (n_lines 为经过的线路数)。
+生成的瓦片按数据版本缓存在磁盘上，重新入库 (数据版本变化) 后旧缓存整体删除。
+"""
+import logging
+import os
+import shutil
+import threading
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Web Mercator 半周长 (米) 与瓦片内坐标分辨率
+MERCATOR_EXTENT = 20037508.342789244
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+MAX_ZOOM = 22
+# 达到该缩放级别后公交站点不再聚合，逐个显示
+STOPS_CLUSTER_MAX_ZOOM = 15
+# 聚合网格边长 (像素)
+STOPS_CLUSTER_CELL_PX = 48
+
+LAYERS = ("universities", "stops")
+
+UNIVERSITIES_TILE_SQL = text(f"""
+    WITH bounds AS (
+        SELECT ST_TileEnvelope(:z, :x, :y) AS geom
+    ), mvtgeom AS (
+        SELECT
+            ST_AsMVTGeom(
+                ST_SimplifyPreserveTopology(ST_Transform(u.geometry, 3857), :tolerance),
+                bounds.geom, {TILE_EXTENT}, {TILE_BUFFER}, true
+            ) AS geom,
+            u.name
+        FROM "Gz_universities" u, bounds
+        WHERE u.geometry && ST_Transform(bounds.geom, 4326)
+    )
+    SELECT ST_AsMVT(mvtgeom.*, 'universities', {TILE_EXTENT}, 'geom')
+    FROM mvtgeom
+    WHERE geom IS NOT NULL;
+""")
+
+STOPS_TILE_SQL = text(f"""
+    WITH bounds AS (
+        SELECT ST_TileEnvelope(:z, :x, :y) AS geom
+    ), mvtgeom AS (
+        SELECT
+            ST_AsMVTGeom(ST_Transform(b.geometry, 3857), bounds.geom, {TILE_EXTENT}, {TILE_BUFFER}, true) AS geom,
+            b.station,
+            b.n_lines,
+            1 AS count
+        FROM "Gz_Stops" b, bounds
+        WHERE b.geometry && ST_Transform(bounds.geom, 4326)
+    )
+    SELECT ST_AsMVT(mvtgeom.*, 'stops', {TILE_EXTENT}, 'geom')
+    FROM mvtgeom
+    WHERE geom IS NOT NULL;
+""")
+
+STOPS_CLUSTER_TILE_SQL = text(f"""
+    WITH bounds AS (
+        SELECT ST_TileEnvelope(:z, :x, :y) AS geom
+    ), pts AS (
+        SELECT ST_Transform(b.geometry, 3857) AS geom, b.station
+        FROM "Gz_Stops" b, bounds
+        WHERE b.geometry && ST_Transform(bounds.geom, 4326)
+    ), clustered AS (
+        SELECT ST_Centroid(ST_Collect(geom)) AS geom, COUNT(*) AS count, MIN(station) AS station
+        FROM pts
+        GROUP BY ST_SnapToGrid(geom, :cell)
+    ), mvtgeom AS (
+        SELECT
+            ST_AsMVTGeom(c.geom, bounds.geom, {TILE_EXTENT}, {TILE_BUFFER}, true) AS geom,
+            c.count,
+            CASE WHEN c.count = 1 THEN c.station END AS station
+        FROM clustered c, bounds
+    )
+    SELECT ST_AsMVT(mvtgeom.*, 'stops', {TILE_EXTENT}, 'geom')
+    FROM mvtgeom
+    WHERE geom IS NOT NULL;
+""")
+
+
+def pixel_size(z):
+    """缩放级别 z 下一个屏幕像素 (256 像素瓦片) 对应的 Web Mercator 米数"""
+    return 2 * MERCATOR_EXTENT / (2 ** z) / 256
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_query(layer, z, x, y):
+    params = {"z": z, "x": x, "y": y}
+    if layer == "universities":
+        # 简化容差取半个屏幕像素，肉眼看不出差别
+        params["tolerance"] = pixel_size(z) / 2
+        return UNIVERSITIES_TILE_SQL, params
+    if z >= STOPS_CLUSTER_MAX_ZOOM:
+        return STOPS_TILE_SQL, params
+    params["cell"] = pixel_size(z) * STOPS_CLUSTER_CELL_PX
+    return STOPS_CLUSTER_TILE_SQL, params
+
+
+def render_tile(conn, layer, z, x, y):
+    sql, params = tile_query(layer, z, x, y)
+    tile = conn.execute(sql, params).scalar()
+    return bytes(tile) if tile else b""
+
+
+class TileCache:
+    """
+    磁盘瓦片缓存: <root>/<数据版本>/<layer>/<z>/<x>/<y>.mvt
+    空瓦片也会缓存 (0 字节文件)，避免重复查询没有数据的区域。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._cleanup_lock = threading.Lock()
+
+    def path(self, token, layer, z, x, y):
+        return os.path.join(self.root, token, layer, str(z), str(x), f"{y}.mvt")
+
+    def get(self, token, layer, z, x, y):
+        try:
+            with open(self.path(token, layer, z, x, y), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, token, layer, z, x, y, tile):
+        path = self.path(token, layer, z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再改名，多个 worker 同时写同一瓦片也不会读到半个文件
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(tile)
+        os.replace(tmp_path, path)
+
+    def on_data_change(self, token):
+        """删除其他数据版本的缓存目录"""
+        if not os.path.isdir(self.root) or not self._cleanup_lock.acquire(blocking=False):
+            return
+        try:
+            for name in os.listdir(self.root):
+                if name != token:
+                    logger.info("删除过期瓦片缓存: %s", name)
+                    shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        finally:
+            self._cleanup_lock.release()
@@ -0,0 +1,84 @@
+"""
+按边界裁剪的性能对比：gpd.clip vs common.clip.clip_gdf (STRtree 预筛 + 预处理多边形分块判断)，
+输出耗时、峰值内存 (tracemalloc) 并确认两者保留的要素相同。
+
+    python benchmarks/bench_clip.py                                  # 100 万个随机点，合成边界
+    python benchmarks/bench_clip.py --boundary data/raw/广州市.shp
+    python benchmarks/bench_clip.py --points 200000 --chunk-size 50000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from common.clip import clip_gdf, CHUNK_SIZE
+
+
+def synthetic_boundary(vertices, rng):
+    """锯齿状的不规则多边形 (模拟行政边界) 加两个离岛"""
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    r = 0.5 * (1 + 0.3 * np.sin(7 * angles)) * (1 + 0.05 * rng.random(vertices))
+    main = shapely.Polygon(np.column_stack((113.5 + r * np.cos(angles), 23.2 + 0.8 * r * np.sin(angles))))
+    islands = [shapely.Point(113.95, 22.65).buffer(0.03), shapely.Point(114.0, 22.7).buffer(0.02)]
+    return gpd.GeoDataFrame({"name": ["边界"]}, geometry=[shapely.MultiPolygon([main] + islands)], crs="EPSG:4326")
+
+
+def synthetic_points(n, bounds, rng):
+    west, south, east, north = bounds
+    # 外扩一些，保证有相当部分的点落在边界外
+    dx, dy = (east - west) * 0.2, (north - south) * 0.2
+    return gpd.GeoDataFrame(
+        {"seq": np.arange(n)},
+        geometry=shapely.points(rng.uniform(west - dx, east + dx, n), rng.uniform(south - dy, north + dy, n)),
+        crs="EPSG:4326")
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--boundary", help="使用真实的边界文件 (如 data/raw/广州市.shp)")
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--vertices", type=int, default=20_000, help="合成边界的顶点数")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.boundary:
+        mask = gpd.read_file(args.boundary).to_crs("EPSG:4326")
+    else:
+        mask = synthetic_boundary(args.vertices, rng)
+    points = synthetic_points(args.points, mask.total_bounds, rng)
+    print(f"{len(points)} 个点，边界 {len(mask)} 个要素 / {shapely.get_num_coordinates(mask.geometry.values).sum()} 个顶点")
+
+    expected, t_gpd, mem_gpd = measure(lambda: gpd.clip(points, mask))
+    fast, t_fast, mem_fast = measure(lambda: clip_gdf(points, mask, chunk_size=args.chunk_size))
+
+    print(f"{'方式':<24}{'耗时(s)':>10}{'峰值内存(MB)':>14}{'保留':>10}")
+    print(f"{'gpd.clip':<24}{t_gpd:>10.3f}{mem_gpd:>14.1f}{len(expected):>10}")
+    print(f"{f'clip_gdf ({args.chunk_size}/块)':<24}{t_fast:>10.3f}{mem_fast:>14.1f}{len(fast):>10}")
+    print(f"加速 {t_gpd / t_fast:.1f}x")
+
+    ok = set(expected["seq"]) == set(fast["seq"])
+    print("结果一致" if ok else "结果不一致！")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+坐标转换 (common/coords.py) 的精度与吞吐量测试。
+
+    python benchmarks/bench_coords.py                      # 数组版 100 万个点，单点版 10 万个点
+    python benchmarks/bench_coords.py --points 200000 --polygons 200 --vertices 2000
+
+输出：
+  1. 各转换方向的单点 / 数组 / 几何吞吐量，以及单点与数组版本的差异
+  2. 与原逐点实现 (benchmarks/coords_reference.py，原样保留的旧公式) 的最大差异，超过 --tolerance 时返回非 0。
+     单点与数组版本共用同一套公式，公式本身被改错时只有这一项能发现
+  3. 往返误差：WGS84 -> GCJ02 -> WGS84 (一次近似与迭代求逆)、BD09 <-> BD09MC 等
+  4. GCJ02 偏移网格 (common/gcj02_grid.py) 的生成耗时、插值误差与吞吐量
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import shapely
+from shapely.ops import transform as shapely_transform
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from common import coords
+from common.gcj02_grid import Gcj02Grid
+from coords_reference import REFERENCE, transform_point_logic
+
+# 1 度约 111 公里，用于把误差换算为米
+METERS_PER_DEGREE = 111_000
+
+# 各方向输入点的生成范围 (广州附近)
+RANGES = {
+    "bd09mc": ((12.55e6, 12.70e6), (2.55e6, 2.75e6)),
+    "bd09": ((113.0, 114.1), (22.5, 24.0)),
+    "gcj02": ((113.0, 114.1), (22.5, 24.0)),
+    "wgs84": ((113.0, 114.1), (22.5, 24.0)),
+}
+
+DIRECTIONS = [
+    ("bd09mc", "wgs84", False),
+    ("wgs84", "bd09mc", False),
+    ("bd09", "gcj02", False),
+    ("gcj02", "wgs84", False),
+    ("gcj02", "wgs84", True),
+    ("wgs84", "gcj02", False),
+]
+
+ROUND_TRIPS = [
+    ("wgs84", "gcj02", False),
+    ("wgs84", "gcj02", True),
+    ("bd09", "bd09mc", False),
+    ("gcj02", "bd09", False),
+    ("wgs84", "bd09mc", True),
+]
+
+
+def random_points(crs, n, rng):
+    (x0, x1), (y0, y1) = RANGES[crs]
+    return rng.uniform(x0, x1, n), rng.uniform(y0, y1, n)
+
+
+def random_polygons(count, vertices, rng):
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    polygons = []
+    for _ in range(count):
+        cx, cy = rng.uniform(12.58e6, 12.66e6), rng.uniform(2.60e6, 2.70e6)
+        r = rng.uniform(200, 2000) * (1 + 0.1 * rng.random(vertices))
+        polygons.append(shapely.Polygon(np.column_stack((cx + r * np.cos(angles), cy + r * np.sin(angles)))))
+    return np.array(polygons, dtype=object)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def check_lazy_import():
+    """只导入 common.coords 时不应加载 numpy / shapely"""
+    code = f"import sys; sys.path.insert(0, {project_root!r}); import common.coords; print('numpy' in sys.modules or 'shapely' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout.strip()
+    return out == "False"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=1_000_000, help="数组版测试点数")
+    parser.add_argument("--scalar-points", type=int, default=100_000, help="单点版测试点数 (取数组版的前 N 个)")
+    parser.add_argument("--polygons", type=int, default=100)
+    parser.add_argument("--vertices", type=int, default=5000)
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="与原逐点实现允许的最大差异 (度)")
+    parser.add_argument("--grid-resolution", type=float, nargs="+", default=[0.01, 0.005, 0.0025],
+                        help="测试的偏移网格分辨率 (度)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    ok = True
+
+    print(f"按需导入 numpy / shapely: {'是' if check_lazy_import() else '否'}")
+
+    print(f"\n1) 吞吐量 (点/秒)，数组版 {args.points} 点，单点版 {args.scalar_points} 点")
+    print(f"{'方向':<26}{'单点':>14}{'数组':>14}{'加速':>9}{'最大差异(度)':>16}")
+    for src, dst, exact in DIRECTIONS:
+        x, y = random_points(src, args.points, rng)
+        xs, ys = x[:args.scalar_points].tolist(), y[:args.scalar_points].tolist()
+        scalar_out, t_scalar = timed(lambda: [coords.transform(a, b, src, dst, exact) for a, b in zip(xs, ys)])
+        (ax, ay), t_array = timed(lambda: coords.transform_array(x, y, src, dst, exact))
+        sx, sy = np.array(scalar_out).T
+        diff = max(np.abs(sx - ax[:len(xs)]).max(), np.abs(sy - ay[:len(ys)]).max())
+        name = f"{src} -> {dst}" + (" (exact)" if exact else "")
+        scalar_rate, array_rate = len(xs) / t_scalar, len(x) / t_array
+        print(f"{name:<26}{scalar_rate:>14,.0f}{array_rate:>14,.0f}{array_rate / scalar_rate:>8.1f}x{diff:>16.2e}")
+
+    print(f"\n2) 与原逐点实现的差异 ({args.scalar_points} 点，允许 {args.tolerance:.0e} 度)")
+    for (src, dst), reference in REFERENCE.items():
+        x, y = random_points(src, args.scalar_points, rng)
+        rx, ry = np.array([reference(a, b) for a, b in zip(x.tolist(), y.tolist())]).T
+        ax, ay = coords.transform_array(x, y, src, dst)
+        diff = max(np.abs(rx - ax).max(), np.abs(ry - ay).max())
+        ok &= diff <= args.tolerance
+        print(f"  {src + ' -> ' + dst:<24}{diff:>12.2e}")
+
+    print(f"\n   几何：{args.polygons} 个多边形，共 {args.polygons * (args.vertices + 1)} 个顶点 (bd09mc -> wgs84)")
+    polygons = random_polygons(args.polygons, args.vertices, rng)
+    out_s, t_scalar = timed(lambda: [shapely_transform(transform_point_logic, g) for g in polygons])
+    out_v, t_array = timed(lambda: coords.transform_geometries(polygons, "bd09mc", "wgs84"))
+    diff = np.abs(shapely.get_coordinates(np.array(out_s, dtype=object)) - shapely.get_coordinates(out_v)).max()
+    ok &= diff <= args.tolerance
+    print(f"  原实现 shapely.ops.transform 逐点 {t_scalar:8.3f} s")
+    print(f"  transform_geometries              {t_array:8.3f} s   加速 {t_scalar / t_array:6.1f}x   最大差异 {diff:.2e} 度")
+
+    print("\n3) 往返误差")
+    print(f"{'往返':<34}{'最大误差(度)':>16}{'约合(米)':>12}")
+    for src, dst, exact in ROUND_TRIPS:
+        x, y = random_points(src, args.points, rng)
+        fx, fy = coords.transform_array(x, y, src, dst)
+        bx, by = coords.transform_array(fx, fy, dst, src, exact)
+        err = max(np.abs(bx - x).max(), np.abs(by - y).max())
+        name = f"{src} -> {dst} -> {src}" + (" (exact)" if exact else "")
+        print(f"{name:<34}{err:>16.2e}{err * METERS_PER_DEGREE:>12.4f}")
+
+    print(f"\n4) GCJ02 偏移网格 ({args.points} 点 gcj02 -> wgs84)")
+    (x0, x1), (y0, y1) = RANGES["gcj02"]
+    x, y = random_points("gcj02", args.points, rng)
+    (fx, fy), t_formula = timed(lambda: coords.transform_array(x, y, "gcj02", "wgs84"))
+    print(f"{'分辨率(度)':<12}{'网格大小':>12}{'生成(s)':>10}{'吞吐(点/秒)':>16}{'加速':>8}{'最大误差(米)':>14}{'P99(米)':>12}")
+    for resolution in args.grid_resolution:
+        grid, t_build = timed(lambda: Gcj02Grid.build((x0, y0, x1, y1), resolution))
+        (gx, gy), t_grid = timed(lambda: coords.transform_array(x, y, "gcj02", "wgs84", grid=grid))
+        err = np.hypot(gx - fx, gy - fy) * METERS_PER_DEGREE
+        print(f"{resolution:<12}{grid.offsets.nbytes / 1024:>10.0f}KB{t_build:>10.2f}{len(x) / t_grid:>16,.0f}"
+              f"{t_formula / t_grid:>7.1f}x{err.max():>14.4f}{np.percentile(err, 99):>12.4f}")
+
+    print("\n与原逐点实现结果一致" if ok else f"\n与原逐点实现的差异超过 {args.tolerance} 度！")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+中间文件格式对比：Shapefile / CSV / pickle / GeoParquet 的写入、读取耗时与磁盘占用。
+
+    python benchmarks/bench_formats.py                     # 100 万个站点 + 2000 个高校多边形
+    python benchmarks/bench_formats.py --points 200000 --polygons 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from common.geoio import write_geodata, read_geodata, file_size_mb
+
+
+def synthetic_stops(n, rng):
+    lines = np.array([f"{i}路" for i in range(2000)], dtype=object)
+    return gpd.GeoDataFrame({
+        "line": lines[rng.integers(0, len(lines), n)],
+        "station": np.array([f"站点{i}" for i in rng.integers(0, 20000, n)], dtype=object),
+        "seq": rng.integers(1, 60, n),
+    }, geometry=shapely.points(rng.uniform(113.0, 114.0, n), rng.uniform(22.6, 23.9, n)), crs="EPSG:4326")
+
+
+def synthetic_universities(n, vertices, rng):
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    polygons = []
+    for _ in range(n):
+        cx, cy = rng.uniform(113.0, 114.0), rng.uniform(22.6, 23.9)
+        r = rng.uniform(0.002, 0.02) * (1 + 0.05 * rng.random(vertices))
+        polygons.append(shapely.Polygon(np.column_stack((cx + r * np.cos(angles), cy + r * np.sin(angles)))))
+    return gpd.GeoDataFrame({"name": [f"大学{i}" for i in range(n)], "uid": [f"{i:024x}" for i in range(n)]},
+                            geometry=polygons, crs="EPSG:4326")
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def run(name, gdf, workdir, columns):
+    base = os.path.join(workdir, name)
+    rows = []
+
+    written, t_write = timed(lambda: write_geodata(gdf, base))
+    _, t_read = timed(lambda: read_geodata(base))
+    _, t_proj = timed(lambda: read_geodata(base, columns=columns))
+    rows.append(("GeoParquet", t_write, t_read, file_size_mb(written)))
+    rows.append((f"GeoParquet 只读 {columns}", None, t_proj, None))
+
+    _, t_write = timed(lambda: gdf.to_file(base + ".shp", encoding="utf-8"))
+    _, t_read = timed(lambda: gpd.read_file(base + ".shp", encoding="utf-8"))
+    rows.append(("Shapefile", t_write, t_read, file_size_mb([base + ".shp"])))
+
+    _, t_write = timed(lambda: gdf.to_pickle(base + ".pkl"))
+    _, t_read = timed(lambda: pd.read_pickle(base + ".pkl"))
+    rows.append(("pickle", t_write, t_read, file_size_mb([base + ".pkl"])))
+
+    # CSV 中几何存为 WKT
+    _, t_write = timed(lambda: gdf.assign(geometry=gdf.geometry.to_wkt()).to_csv(base + ".csv", index=False))
+    _, t_read = timed(lambda: gpd.GeoDataFrame(
+        (df := pd.read_csv(base + ".csv")), geometry=gpd.GeoSeries.from_wkt(df["geometry"])))
+    rows.append(("CSV (WKT)", t_write, t_read, file_size_mb([base + ".csv"])))
+
+    print(f"\n{name}: {len(gdf)} 行")
+    print(f"{'格式':<36}{'写入(s)':>10}{'读取(s)':>10}{'大小(MB)':>10}")
+    for fmt, t_write, t_read, size in rows:
+        print(f"{fmt:<36}{'' if t_write is None else f'{t_write:.3f}':>10}{t_read:>10.3f}"
+              f"{'' if size is None else f'{size:.2f}':>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--polygons", type=int, default=2000)
+    parser.add_argument("--vertices", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        run("stops", synthetic_stops(args.points, rng), workdir, ["station"])
+        run("universities", synthetic_universities(args.polygons, args.vertices, rng), workdir, ["name"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+百度 geo 字符串解析性能对比：逐行 parse_baidu_geo vs 批量 parse_baidu_geo_bulk (103_geo_to_geometry.py)，
+输出批量版本各阶段 (split / parse / build / repair / union) 耗时，并确认两者结果相同。
+
+    python benchmarks/bench_geo_parse.py                         # 合成数据：2000 条，每段 2000 个顶点
+    python benchmarks/bench_geo_parse.py --csv data/raw/university_geo.csv
+"""
+import argparse
+import glob
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import shapely
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_parser_module():
+    """103 的文件名以数字开头，只能按路径加载"""
+    path = glob.glob(os.path.join(project_root, "data_pipeline", "1_universities", "103_*.py"))[0]
+    spec = importlib.util.spec_from_file_location("geo_to_geometry", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_geo(records, vertices, rng):
+    """生成 '4|bound|1-x,y,...;1-x,y,...' 格式的字符串，约 5% 为自相交的蝴蝶形多边形"""
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    values = []
+    for _ in range(records):
+        segments = []
+        for _ in range(rng.integers(1, 4)):
+            cx, cy = rng.uniform(12.58e6, 12.66e6), rng.uniform(2.60e6, 2.70e6)
+            if rng.random() < 0.05:
+                ring = np.array([[cx, cy], [cx + 500, cy + 500], [cx + 500, cy], [cx, cy + 500]])
+            else:
+                r = rng.uniform(200, 2000) * (1 + 0.05 * rng.random(vertices))
+                ring = np.column_stack((cx + r * np.cos(angles), cy + r * np.sin(angles)))
+            segments.append("1-" + ",".join(f"{v:.2f}" for v in ring.ravel()))
+        values.append("4|bound|" + ";".join(segments))
+    return np.array(values, dtype=object)
+
+
+def same_geometries(a, b):
+    a = np.asarray(a, dtype=object)
+    b = np.asarray(b, dtype=object)
+    a_none, b_none = shapely.is_missing(a), shapely.is_missing(b)
+    if not (a_none == b_none).all():
+        return False
+    both = ~a_none
+    return bool(shapely.equals_exact(a[both], b[both], tolerance=0).all())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="使用真实的 university_geo.csv")
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--vertices", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    module = load_parser_module()
+    if args.csv:
+        geo = pd.read_csv(args.csv, encoding=module.detect_encoding(args.csv))["geo"].to_numpy()
+    else:
+        geo = synthetic_geo(args.records, args.vertices, np.random.default_rng(args.seed))
+    print(f"{len(geo)} 条记录，共 {sum(len(g) for g in geo if isinstance(g, str)) / 1e6:.1f} MB 字符串")
+
+    start = time.perf_counter()
+    legacy = pd.Series(geo).apply(module.parse_baidu_geo).to_numpy()
+    t_legacy = time.perf_counter() - start
+
+    timings = {}
+    start = time.perf_counter()
+    bulk = module.parse_baidu_geo_bulk(geo, timings=timings)
+    t_bulk = time.perf_counter() - start
+
+    print(f"逐行 parse_baidu_geo   {t_legacy:8.3f} s")
+    print(f"批量 parse_baidu_geo_bulk {t_bulk:8.3f} s   加速 {t_legacy / t_bulk:.1f}x")
+    for stage, seconds in timings.items():
+        print(f"  {stage:<8}{seconds:8.3f} s  ({seconds / t_bulk:5.1%})")
+
+    ok = same_geometries(legacy, bulk)
+    print("结果一致" if ok else "结果不一致！")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
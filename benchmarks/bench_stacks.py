@@ -0,0 +1,91 @@
+"""
+同步 (Flask/WSGI) 与异步 (Starlette/asyncpg/ASGI) 两套后端在不同并发下的对比。
+
+1. 启动本地 PostGIS 容器并导入数据 (运行 106 / 206 导入脚本)：
+       docker run -d --name gis -e POSTGRES_PASSWORD=your_password -p 5432:5432 postgis/postgis:16-3.4
+2. 运行对比 (两套后端会依次在不同端口启动)：
+       python benchmarks/bench_stacks.py --workers 2 --concurrency 1 8 64 256
+
+为了比较数据库访问路径本身，WSGI 后端默认以 NEAREST_ENGINE=sql、RESPONSE_CACHE_SIZE=0 启动。
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from load_test import DEFAULT_NAMES, build_requests, run_level, print_table
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+
+
+def wait_ready(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/api/stats", timeout=2).status_code < 500:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def bench_stack(stack, port, args):
+    env = dict(os.environ)
+    if not args.keep_fast_paths:
+        env.update({"NEAREST_ENGINE": "sql", "RESPONSE_CACHE_SIZE": "0"})
+    cmd = [sys.executable, os.path.join(BACKEND_DIR, "serve.py"), "--stack", stack,
+           "--bind", f"127.0.0.1:{port}", "--workers", str(args.workers), "--threads", str(args.threads)]
+    if stack == "wsgi" and os.name == "nt":
+        cmd += ["--server", "waitress"]
+
+    proc = subprocess.Popen(cmd, env=env, cwd=BACKEND_DIR)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        if not wait_ready(url):
+            raise RuntimeError(f"{stack} backend did not start on {url}")
+        results = {}
+        for endpoint in args.endpoints:
+            make_request = build_requests(url, endpoint, args.names)
+            run_level(make_request, 1, 1.0)  # 预热
+            rows = [run_level(make_request, c, args.duration) for c in args.concurrency]
+            print_table(f"{stack} / {endpoint}", rows)
+            results[endpoint] = rows
+        return results
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the WSGI and ASGI backends")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64, 256])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--endpoints", nargs="+", choices=["nearest", "stats"], default=["nearest", "stats"])
+    parser.add_argument("--names", nargs="+", default=DEFAULT_NAMES)
+    parser.add_argument("--keep-fast-paths", action="store_true",
+                        help="keep the in-memory index and response cache enabled for the WSGI stack")
+    args = parser.parse_args(argv)
+
+    results = {
+        "wsgi": bench_stack("wsgi", 5101, args),
+        "asgi": bench_stack("asgi", 5102, args),
+    }
+
+    for endpoint in args.endpoints:
+        print(f"\n{endpoint}: 吞吐对比 (req/s)")
+        print("| 并发 | WSGI | ASGI | ASGI/WSGI |")
+        print("| ---: | ---: | ---: | ---: |")
+        for w, a in zip(results["wsgi"][endpoint], results["asgi"][endpoint]):
+            ratio = a["rps"] / w["rps"] if w["rps"] else float("nan")
+            print(f"| {w['concurrency']} | {w['rps']:.1f} | {a['rps']:.1f} | {ratio:.2f} |")
+
+
+if __name__ == "__main__":
+    main()
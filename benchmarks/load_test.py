@@ -0,0 +1,109 @@
+"""
+后端接口压测：在 1 / 8 / 64 个并发客户端下测量吞吐量与延迟分位数。
+
+先启动后端 (例如 `python backend/serve.py`)，再运行：
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --duration 20
+    python benchmarks/load_test.py --endpoint stats --concurrency 1 8 64
+"""
+import argparse
+import random
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+
+DEFAULT_NAMES = ["广州大学", "中山大学", "华南理工大学", "暨南大学", "华南师范大学", "广东工业大学"]
+
+
+def build_requests(base_url, endpoint, names):
+    if endpoint == "nearest":
+        return lambda: ("GET", f"{base_url}/api/nearest_bus_stop?name={quote(random.choice(names))}", None)
+    if endpoint == "stats":
+        return lambda: ("GET", f"{base_url}/api/stats", None)
+    if endpoint == "batch":
+        return lambda: ("POST", f"{base_url}/api/nearest_bus_stops", {"names": names, "k": 3})
+    raise ValueError(endpoint)
+
+
+def worker(make_request, deadline, latencies, errors, lock):
+    session = requests.Session()
+    local_latencies, local_errors = [], 0
+    while time.perf_counter() < deadline:
+        method, url, body = make_request()
+        start = time.perf_counter()
+        try:
+            res = session.request(method, url, json=body, timeout=30)
+            ok = res.status_code < 500
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        if ok:
+            local_latencies.append(elapsed)
+        else:
+            local_errors += 1
+    with lock:
+        latencies.extend(local_latencies)
+        errors[0] += local_errors
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    idx = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def run_level(make_request, concurrency, duration):
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=worker, args=(make_request, deadline, latencies, errors, lock))
+               for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / wall,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print("| 并发 | 请求数 | 错误 | 吞吐 (req/s) | p50 (ms) | p95 (ms) | p99 (ms) |")
+    print("| ---: | ---: | ---: | ---: | ---: | ---: | ---: |")
+    for r in rows:
+        print(f"| {r['concurrency']} | {r['requests']} | {r['errors']} | {r['rps']:.1f} "
+              f"| {r['p50_ms']:.1f} | {r['p95_ms']:.1f} | {r['p99_ms']:.1f} |")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the backend API")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--endpoint", choices=["nearest", "stats", "batch"], default="nearest")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--names", nargs="+", default=DEFAULT_NAMES)
+    args = parser.parse_args(argv)
+
+    make_request = build_requests(args.url.rstrip("/"), args.endpoint, args.names)
+    # 预热：建立连接、加载索引、准备预编译语句
+    run_level(make_request, 1, 1.0)
+
+    rows = [run_level(make_request, c, args.duration) for c in args.concurrency]
+    print_table(f"{args.endpoint} @ {args.url}", rows)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+本地模拟的百度地图接口 (qt=s 搜索、qt=ext 详情)，用于测试 102_fetch_baidu_boundary.py 的并行搜索、
+限速与 uid 缓存，不访问真实网站。
+
+--fixtures 目录中录制的 JSON 原样返回：
+    s/<quote(wd)>.json     qt=s 的返回
+    ext/<uid>.json         qt=ext 的返回
+没有对应文件时，指定 --record 则转发到百度 (需设置环境变量 BAIDU_COOKIE) 并保存到 fixtures，
+否则按关键词生成确定性的合成数据：同一学校的不同关键词 (原名 / +校区 / +广州) 返回部分相同的 uid，
+约 1/4 的 uid 带有边界多边形。
+服务端统计请求数、峰值请求速率与并发数，GET /stats 返回 JSON，退出时打印。
+
+    python benchmarks/mock_baidu_server.py --port 8766 --latency 0.2
+    python data_pipeline/1_universities/102_fetch_baidu_boundary.py --base-url http://127.0.0.1:8766 \\
+        --cache /tmp/uid_geo.sqlite --output /tmp/university_geo.csv
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+from mock_icauto_server import Stats
+
+UPSTREAM = "https://map.baidu.com"
+SUFFIXES = ("校区", "广州")
+
+
+def _seed(text):
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest(), 16)
+
+
+def synthetic_uid(base, i):
+    return hashlib.md5(f"{base}:{i}".encode("utf-8")).hexdigest()[:24]
+
+
+def synthetic_search(wd, rn=10):
+    """同一学校的各个关键词取同一组 uid，只是顺序不同 (模拟不同搜索命中同一校区)"""
+    base = wd
+    for suffix in SUFFIXES:
+        if base.endswith(suffix):
+            base = base[:-len(suffix)]
+    rng = random.Random(_seed(wd))
+    indexes = rng.sample(range(rn * 2), rn)
+    content = []
+    for i in indexes:
+        uid = synthetic_uid(base, i)
+        x, y = synthetic_point(uid)
+        content.append({"uid": uid, "name": f"{base}({i}号地点)", "x": x, "y": y})
+    return {"content": content}
+
+
+def synthetic_point(uid):
+    rng = random.Random(_seed(uid))
+    # 广州附近的百度墨卡托坐标
+    return round(rng.uniform(12590000, 12640000), 2), round(rng.uniform(2610000, 2660000), 2)
+
+
+def synthetic_ext(uid):
+    x, y = synthetic_point(uid)
+    if _seed(uid) % 4:
+        geo = f"1|{x},{y}|{x},{y};"
+    else:
+        ring = [(x, y), (x + 800, y), (x + 800, y + 600), (x, y + 600), (x, y)]
+        coords = ",".join(f"{px:.2f},{py:.2f}" for px, py in ring)
+        geo = f"4|{x},{y};{x + 800},{y + 600}|1-{coords};"
+    return {"content": {"uid": uid, "geo": geo}}
+
+
+def fixture_path(fixtures, qt, key):
+    name = quote(key, safe="") if qt == "s" else key
+    return os.path.join(fixtures, qt, name + ".json")
+
+
+def record(fixtures, qt, key, path_qs):
+    """从百度获取并保存到 fixtures"""
+    request = urllib.request.Request(UPSTREAM + path_qs, headers={
+        "User-Agent": "Mozilla/5.0", "Referer": UPSTREAM + "/",
+        "Cookie": os.environ.get("BAIDU_COOKIE", ""),
+    })
+    with urllib.request.urlopen(request, timeout=10) as res:
+        body = res.read().decode("utf-8")
+    path = fixture_path(fixtures, qt, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(body)
+    return body
+
+
+def make_handler(args, stats):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+        def send_body(self, status, body, content_type="application/json; charset=utf-8"):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def answer(self, query):
+            qt = query.get("qt", [""])[0]
+            key = query.get("wd" if qt == "s" else "uid", [""])[0]
+            if qt not in ("s", "ext") or not key:
+                return None
+            if args.fixtures:
+                path = fixture_path(args.fixtures, qt, key)
+                if os.path.exists(path):
+                    with open(path, encoding="utf-8") as f:
+                        return f.read()
+                if args.record:
+                    return record(args.fixtures, qt, key, self.path)
+            if qt == "s":
+                return json.dumps(synthetic_search(key, int(query.get("rn", ["10"])[0])), ensure_ascii=False)
+            return json.dumps(synthetic_ext(key), ensure_ascii=False)
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path == "/stats":
+                self.send_body(200, json.dumps(stats.snapshot()))
+                return
+
+            stats.begin()
+            outcome = "ok"
+            try:
+                if args.latency:
+                    time.sleep(random.uniform(0.5, 1.5) * args.latency)
+                body = self.answer(parse_qs(parts.query))
+                if body is None:
+                    outcome = "not_found"
+                    self.send_body(404, '{"content": null}')
+                else:
+                    self.send_body(200, body)
+            except Exception as e:
+                outcome = "errors"
+                self.send_body(502, json.dumps({"error": str(e)}))
+            finally:
+                stats.end(outcome)
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--fixtures", help="录制的 JSON 目录 (s/、ext/ 子目录)")
+    parser.add_argument("--record", action="store_true", help="fixtures 中没有时转发到百度并保存")
+    parser.add_argument("--latency", type=float, default=0.1, help="平均响应延迟 (秒)")
+    parser.add_argument("--verbose", action="store_true", help="打印每个请求")
+    args = parser.parse_args(argv)
+    if args.record and not args.fixtures:
+        parser.error("--record 需要同时指定 --fixtures")
+
+    stats = Stats()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args, stats))
+    print(f"模拟服务器: http://{args.host}:{args.port}/?qt=s&wd=...  (Ctrl-C 退出)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(stats.snapshot(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
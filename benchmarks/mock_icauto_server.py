@@ -0,0 +1,154 @@
+"""
+本地模拟的公交线路网站，用于测试 202_scrape_stops.py 的并发抓取、限速与重试，不访问真实网站。
+
+--fixtures 目录中有 bus_440100.html / bl_*.html 时原样返回 (页面中的绝对链接由 202 改写到 --base-url)，
+否则按 --lines 生成合成页面。可模拟延迟、随机 503，以及超过 --max-rps 时返回 429。
+服务端统计实际的峰值请求速率与并发数，GET /stats 返回 JSON，退出时打印。
+
+    python benchmarks/mock_icauto_server.py --port 8765 --lines 300 --latency 0.2 --error-rate 0.05 --max-rps 5
+    python data_pipeline/2_bus_stops/202_scrape_stops.py --base-url http://127.0.0.1:8765 --save-dir /tmp/bus_stops --rate 4
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LIST_PATH = "/chuxing/bus_440100.html"
+LINE_PATH = re.compile(r"^/chuxing/bl_(\d+)\.html$")
+
+
+def synthetic_list(lines):
+    rows = "".join(f'<tr><td>{i}路</td><td><a href="/chuxing/bl_{1000 + i}.html">{i}路公交线路</a></td></tr>'
+                   for i in range(1, lines + 1))
+    return f'<html><body><table class="bordered"><thead><tr><th>线路</th><th>详情</th></tr></thead>' \
+           f'<tbody>{rows}</tbody></table></body></html>'
+
+
+def synthetic_line(line_id):
+    rng = random.Random(line_id)
+    stations = "".join(f"<tr><td>{seq}</td><td>模拟站{rng.randint(1, 5000)}</td></tr>"
+                       for seq in range(1, rng.randint(10, 40)))
+    return f'<html><body><table class="bordered"><tr><th>站序</th><th>站名</th></tr>{stations}</table></body></html>'
+
+
+class Stats:
+    """峰值并发与滑动 1 秒窗口内的峰值请求数"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.window = deque()
+        self.in_flight = 0
+        self.counts = {"requests": 0, "ok": 0, "throttled": 0, "errors": 0, "not_found": 0,
+                       "peak_rps": 0, "peak_concurrency": 0}
+
+    def begin(self):
+        now = time.monotonic()
+        with self.lock:
+            self.counts["requests"] += 1
+            self.in_flight += 1
+            self.counts["peak_concurrency"] = max(self.counts["peak_concurrency"], self.in_flight)
+            self.window.append(now)
+            while self.window and self.window[0] <= now - 1.0:
+                self.window.popleft()
+            self.counts["peak_rps"] = max(self.counts["peak_rps"], len(self.window))
+            return len(self.window)
+
+    def end(self, outcome):
+        with self.lock:
+            self.in_flight -= 1
+            self.counts[outcome] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+def make_handler(args, stats):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+        def send_body(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def page(self, path):
+            name = os.path.basename(path)
+            if args.fixtures and os.path.exists(os.path.join(args.fixtures, name)):
+                with open(os.path.join(args.fixtures, name), encoding="utf-8") as f:
+                    return f.read()
+            if path == LIST_PATH:
+                return synthetic_list(args.lines)
+            match = LINE_PATH.match(path)
+            if match and not args.fixtures:
+                return synthetic_line(int(match.group(1)))
+            return None
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self.send_body(200, json.dumps(stats.snapshot()), "application/json")
+                return
+
+            rps = stats.begin()
+            outcome = "ok"
+            try:
+                if args.max_rps and rps > args.max_rps:
+                    outcome = "throttled"
+                    self.send_body(429, "Too Many Requests", headers={"Retry-After": "1"})
+                    return
+                if args.latency:
+                    time.sleep(random.uniform(0.5, 1.5) * args.latency)
+                if random.random() < args.error_rate:
+                    outcome = "errors"
+                    self.send_body(503, "Service Unavailable")
+                    return
+                body = self.page(self.path.split("?")[0])
+                if body is None:
+                    outcome = "not_found"
+                    self.send_body(404, "Not Found")
+                else:
+                    self.send_body(200, body)
+            finally:
+                stats.end(outcome)
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", help="包含 bus_440100.html 与 bl_*.html 的目录")
+    parser.add_argument("--lines", type=int, default=200, help="合成线路数 (没有 fixtures 时)")
+    parser.add_argument("--latency", type=float, default=0.1, help="平均响应延迟 (秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 503 的比例")
+    parser.add_argument("--max-rps", type=float, default=0, help="超过该速率 (1 秒窗口) 时返回 429，0 表示不限")
+    parser.add_argument("--verbose", action="store_true", help="打印每个请求")
+    args = parser.parse_args(argv)
+
+    stats = Stats()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args, stats))
+    print(f"模拟服务器: http://{args.host}:{args.port}{LIST_PATH}  (Ctrl-C 退出)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(stats.snapshot(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
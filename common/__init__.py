@@ -0,0 +1 @@
+# 数据流水线 (data_pipeline) 与后端 (backend) 共用的模块
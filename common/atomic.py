@@ -0,0 +1,23 @@
+"""
+原子写文件：先写入同目录下的临时文件，再用 os.replace 替换目标文件。
+读者 (或中断后重新运行的脚本) 只会看到旧文件或完整的新文件，不会看到写了一半的文件。
+"""
+import os
+import tempfile
+
+
+def atomic_write_text(path, text, encoding="utf-8"):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # 临时文件以 . 开头、.tmp 结尾，不会被按扩展名扫描目录的脚本读到
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline="") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
@@ -0,0 +1,19 @@
+"""
+城市边界 (data/raw/广州市.shp) 的读取缓存。
+
+104 / 204 (偏移网格范围) 与 105 / 205 (裁剪) 都要读取边界；由 data_pipeline/run_pipeline.py
+在同一进程内依次运行时，文件只读一次，之后返回缓存的副本。文件被修改 (mtime 变化) 后自动重新读取。
+"""
+import os
+
+_cache = {}
+
+
+def load_boundary(path):
+    """读取边界为 GeoDataFrame，同一进程内按 (路径, mtime) 缓存；返回副本，调用方可以随意修改"""
+    import geopandas as gpd
+
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    if key not in _cache:
+        _cache[key] = gpd.read_file(path)
+    return _cache[key].copy()
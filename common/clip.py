@@ -0,0 +1,73 @@
+"""
+按边界多边形 (如 广州市.shp) 快速裁剪，替代 gpd.clip。
+
+边界先合并并拆成若干多边形建 STRtree，分块查询：包围盒不相交的要素直接排除，
+候选的点用 shapely.intersects_xy (预处理过的多边形，不为每个点创建 Point 对象) 判断，
+候选的面完全在边界内时原样保留，跨越边界时才计算交集。
+结果与 gpd.clip 一致 (落在边界线上的点同样保留)，内存占用只与分块大小有关。
+"""
+import numpy as np
+import shapely
+
+CHUNK_SIZE = 200_000
+
+
+def prepare_boundary(mask_geoms):
+    """合并边界并拆分为单个多边形，返回 (合并后的边界, 各部分, STRtree)"""
+    boundary = shapely.union_all(np.asarray(mask_geoms, dtype=object))
+    parts = shapely.get_parts(boundary)
+    shapely.prepare(boundary)
+    shapely.prepare(parts)
+    return boundary, parts, shapely.STRtree(parts)
+
+
+def clip_geometries(geoms, mask_geoms, chunk_size=CHUNK_SIZE):
+    """
+    返回 (保留要素的下标, 裁剪后的几何)。点原样保留；面 / 线只在跨越边界时计算交集。
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    boundary, parts, tree = prepare_boundary(mask_geoms)
+    kept, clipped = [], []
+
+    for start in range(0, len(geoms), chunk_size):
+        chunk = geoms[start:start + chunk_size]
+        # 包围盒预筛：得到 (要素下标, 边界部分下标) 候选对
+        g_idx, p_idx = tree.query(chunk)
+        if len(g_idx) == 0:
+            continue
+
+        candidates = chunk[g_idx]
+        is_point = shapely.get_type_id(candidates) == 0
+        hit = np.zeros(len(g_idx), dtype=bool)
+        if is_point.any():
+            points = candidates[is_point]
+            hit[is_point] = shapely.intersects_xy(parts[p_idx[is_point]], shapely.get_x(points), shapely.get_y(points))
+        if (~is_point).any():
+            hit[~is_point] = shapely.intersects(candidates[~is_point], parts[p_idx[~is_point]])
+
+        idx = np.unique(g_idx[hit])
+        out = chunk[idx].copy()
+        # 面 / 线：完全在边界内的保留原几何，其余与边界求交
+        not_point = shapely.get_type_id(out) != 0
+        if not_point.any():
+            crossing = not_point.copy()
+            crossing[not_point] = ~shapely.within(out[not_point], boundary)
+            if crossing.any():
+                out[crossing] = shapely.intersection(out[crossing], boundary)
+        nonempty = ~shapely.is_empty(out)
+        kept.append(idx[nonempty] + start)
+        clipped.append(out[nonempty])
+
+    if not kept:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=object)
+    return np.concatenate(kept), np.concatenate(clipped)
+
+
+def clip_gdf(gdf, mask_gdf, chunk_size=CHUNK_SIZE):
+    """gpd.clip(gdf, mask_gdf) 的快速版本，两者需为同一坐标系；保留原索引与顺序"""
+    import geopandas as gpd
+
+    idx, geoms = clip_geometries(gdf.geometry.values, mask_gdf.geometry.values, chunk_size)
+    result = gdf.iloc[idx].copy()
+    result[result.geometry.name] = gpd.GeoSeries(geoms, index=result.index, crs=gdf.crs)
+    return result
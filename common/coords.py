@@ -0,0 +1,283 @@
+"""
+坐标转换：百度墨卡托 (BD09MC)、百度经纬度 (BD09)、火星坐标 (GCJ02) 与 WGS84 之间的相互转换。
+
+入口：
+    transform(x, y, src, dst)            单点，纯 Python，不依赖 numpy
+    transform_array(x, y, src, dst)      numpy 数组整体运算
+    transform_geometries(geoms, src, dst) shapely 2 几何数组，所有顶点一次转换
+
+坐标系名称为 "bd09mc" / "bd09" / "gcj02" / "wgs84"，沿 BD09MC <-> BD09 <-> GCJ02 <-> WGS84 依次转换。
+GCJ02 -> WGS84 默认使用与历史数据一致的一次近似 (误差约 1~2 米)；exact=True 时迭代求逆，误差小于 1e-9 度。
+
+每个公式只写一遍，单点与数组版本通过 _ScalarOps / _ArrayOps 提供各自的数学函数。
+numpy / shapely 在第一次使用数组版本时才导入，命令行脚本只做单点转换时启动不受影响。
+"""
+import math
+
+PI = math.pi
+X_PI = PI * 3000.0 / 180.0
+# Krasovsky 1940 椭球长半轴与偏心率平方
+A = 6378245.0
+EE = 0.00669342162296594323
+
+CRS_CHAIN = ("bd09mc", "bd09", "gcj02", "wgs84")
+
+# 百度墨卡托 -> 百度经纬度的系数表 (按墨卡托 y 分带，从高到低)
+MCBAND = (12890594.86, 8362377.87, 5591021, 3481989.83, 1678043.12, 0)
+MC2LL = (
+    (1.410526172116255e-8, 0.00000898305509648872, -1.9939833816331, 200.9824383106796, -187.2403703815547, 91.6087516669843, -23.38765649603339, 2.57121317296198, -0.03801003308653, 17337981.2),
+    (-7.435856389565537e-9, 0.000008983055097726239, -0.78625201886289, 96.32687599759846, -1.85204757529826, -59.36935905485877, 47.40033549296737, -16.50741931063887, 2.28786674699375, 10260144.86),
+    (-3.030883460898826e-8, 0.00000898305509983578, 0.30071316287616, 59.74293618442277, 7.357984074871, -25.38371002664745, 13.45380521110908, -3.29883767235584, 0.32710905363475, 6856817.37),
+    (-1.981981304930552e-8, 0.000008983055099779535, 0.03278182852591, 40.31678527705744, 0.65659298677277, -4.44255534477492, 0.85341911805263, 0.12923347998204, -0.04625736007561, 4482777.06),
+    (3.09191371068437e-9, 0.000008983055096812155, 0.00006995724062, 23.10934304144901, -0.00023663490511, -0.6321817810242, -0.00663494467273, 0.03430082397953, -0.00466043876332, 2555164.4),
+    (2.890871144776878e-9, 0.000008983055095805407, -3.068298e-8, 7.47137025468032, -0.00000353937994, -0.02145144861037, -0.00001234426596, 0.00010322952773, -0.00000323890364, 826088.5),
+)
+
+# 百度经纬度 -> 百度墨卡托的系数表 (按纬度分带，从高到低)
+LLBAND = (75, 60, 45, 30, 15, 0)
+LL2MC = (
+    (-0.0015702102444, 111320.7020616939, 1704480524535203, -10338987376042340, 26112667856603880, -35149669176653700, 26595700718403920, -10725012454188240, 1800819912950474, 82.5),
+    (0.0008277824516172526, 111320.7020463578, 647795574.6671607, -4082003173.641316, 10774905663.51142, -15171875531.51559, 12053065338.62167, -5124939663.577472, 913311935.9512032, 67.5),
+    (0.00337398766765, 111320.7020202162, 4481351.045890365, -23393751.19931662, 79682215.47186455, -115964993.2797253, 97236711.15602145, -43661946.33752821, 8477230.501135234, 52.5),
+    (0.00220636496208, 111320.7020209128, 51751.86112841131, 3796837.749470245, 992013.7397791013, -1221952.21711287, 1340652.697009075, -620943.6990984312, 144416.9293806241, 37.5),
+    (-0.0003441963504368392, 111320.7020576856, 278.2353980772752, 2485758.690035394, 6070.750963243378, 54821.18345352118, 9540.606633304236, -2710.55326746645, 1405.483844121726, 22.5),
+    (-0.0003218135878613132, 111320.7020701615, 0.00369383431289, 823725.6402795718, 0.46104986909093, 2351.343141331292, 1.58060784298199, 8.77738589078284, 0.37238884252424, 7.45),
+)
+# 百度墨卡托只定义到南北纬 74 度
+BD_MAX_LAT = 74.0
+
+# GCJ02 -> WGS84 迭代求逆的收敛阈值 (度) 与最大迭代次数
+EXACT_TOLERANCE = 1e-12
+EXACT_MAX_ITER = 10
+
+
+class _ScalarOps:
+    sin = staticmethod(math.sin)
+    cos = staticmethod(math.cos)
+    sqrt = staticmethod(math.sqrt)
+    atan2 = staticmethod(math.atan2)
+    fabs = staticmethod(math.fabs)
+
+    @staticmethod
+    def asfloat(v):
+        return float(v)
+
+    @staticmethod
+    def clip(v, low, high):
+        return min(max(v, low), high)
+
+    @staticmethod
+    def negate_where(cond, v):
+        return -v if cond else v
+
+    @staticmethod
+    def band_coefficients(value, bands, table):
+        """第一个满足 value >= bands[i] 的分带系数；bands 最后一项为 0，总能选中"""
+        for band, cf in zip(bands, table):
+            if value >= band:
+                return cf
+        return table[-1]
+
+    @staticmethod
+    def max_abs(v):
+        return abs(v)
+
+
+class _ArrayOps:
+    def __init__(self):
+        import numpy as np
+        self.np = np
+        self.sin = np.sin
+        self.cos = np.cos
+        self.sqrt = np.sqrt
+        self.atan2 = np.arctan2
+        self.fabs = np.abs
+        self.clip = np.clip
+        # searchsorted 需要升序的分带边界
+        self._tables = {}
+
+    def asfloat(self, v):
+        return self.np.asarray(v, dtype="float64")
+
+    def negate_where(self, cond, v):
+        return self.np.where(cond, -v, v)
+
+    def band_coefficients(self, value, bands, table):
+        np = self.np
+        key = id(table)
+        if key not in self._tables:
+            self._tables[key] = (np.asarray(bands[::-1], dtype="float64"), np.asarray(table, dtype="float64"))
+        ascending, coefficients = self._tables[key]
+        band = len(bands) - np.searchsorted(ascending, value, side="right")
+        # NaN 会排到末尾得到 band=0，结果仍为 NaN
+        return coefficients[np.clip(band, 0, len(bands) - 1)].T
+
+    def max_abs(self, v):
+        return float(self.np.nanmax(self.np.abs(v))) if self.np.size(v) else 0.0
+
+
+_SCALAR = _ScalarOps()
+_array_ops = None
+
+
+def _array():
+    global _array_ops
+    if _array_ops is None:
+        _array_ops = _ArrayOps()
+    return _array_ops
+
+
+# ---- 各步转换公式 (ops 为 _SCALAR 或数组版) ----
+
+def _polynomial(ops, x, y, bands, table):
+    """百度墨卡托 <-> 百度经纬度共用的分带多项式"""
+    abs_x, abs_y = ops.fabs(x), ops.fabs(y)
+    cf = ops.band_coefficients(abs_y, bands, table)
+    out_x = cf[0] + cf[1] * abs_x
+    cc = abs_y / cf[9]
+    out_y = cf[2] + cc * (cf[3] + cc * (cf[4] + cc * (cf[5] + cc * (cf[6] + cc * (cf[7] + cc * cf[8])))))
+    return ops.negate_where(x < 0, out_x), ops.negate_where(y < 0, out_y)
+
+
+def _bd09mc_to_bd09(ops, x, y):
+    return _polynomial(ops, x, y, MCBAND, MC2LL)
+
+
+def _bd09_to_bd09mc(ops, lng, lat):
+    return _polynomial(ops, lng, ops.clip(lat, -BD_MAX_LAT, BD_MAX_LAT), LLBAND, LL2MC)
+
+
+def _bd09_to_gcj02(ops, bd_lng, bd_lat):
+    x = bd_lng - 0.0065
+    y = bd_lat - 0.006
+    z = ops.sqrt(x * x + y * y) - 0.00002 * ops.sin(y * X_PI)
+    theta = ops.atan2(y, x) - 0.000003 * ops.cos(x * X_PI)
+    return z * ops.cos(theta), z * ops.sin(theta)
+
+
+def _gcj02_to_bd09(ops, lng, lat):
+    z = ops.sqrt(lng * lng + lat * lat) + 0.00002 * ops.sin(lat * X_PI)
+    theta = ops.atan2(lat, lng) + 0.000003 * ops.cos(lng * X_PI)
+    return z * ops.cos(theta) + 0.0065, z * ops.sin(theta) + 0.006
+
+
+def _transformlat(ops, lng, lat):
+    ret = -100.0 + 2.0 * lng + 3.0 * lat + 0.2 * lat * lat + 0.1 * lng * lat + 0.2 * ops.sqrt(ops.fabs(lng))
+    ret += (20.0 * ops.sin(6.0 * lng * PI) + 20.0 * ops.sin(2.0 * lng * PI)) * 2.0 / 3.0
+    ret += (20.0 * ops.sin(lat * PI) + 40.0 * ops.sin(lat / 3.0 * PI)) * 2.0 / 3.0
+    ret += (160.0 * ops.sin(lat / 12.0 * PI) + 320 * ops.sin(lat * PI / 30.0)) * 2.0 / 3.0
+    return ret
+
+
+def _transformlng(ops, lng, lat):
+    ret = 300.0 + lng + 2.0 * lat + 0.1 * lng * lng + 0.1 * lng * lat + 0.1 * ops.sqrt(ops.fabs(lng))
+    ret += (20.0 * ops.sin(6.0 * lng * PI) + 20.0 * ops.sin(2.0 * lng * PI)) * 2.0 / 3.0
+    ret += (20.0 * ops.sin(lng * PI) + 40.0 * ops.sin(lng / 3.0 * PI)) * 2.0 / 3.0
+    ret += (150.0 * ops.sin(lng / 12.0 * PI) + 300.0 * ops.sin(lng / 30.0 * PI)) * 2.0 / 3.0
+    return ret
+
+
+def _gcj02_offset(ops, lng, lat):
+    """在 (lng, lat) 处 GCJ02 相对 WGS84 的偏移量 (度)"""
+    dlat = _transformlat(ops, lng - 105.0, lat - 35.0)
+    dlng = _transformlng(ops, lng - 105.0, lat - 35.0)
+    radlat = lat / 180.0 * PI
+    magic = ops.sin(radlat)
+    magic = 1 - EE * magic * magic
+    sqrtmagic = ops.sqrt(magic)
+    dlat = (dlat * 180.0) / ((A * (1 - EE)) / (magic * sqrtmagic) * PI)
+    dlng = (dlng * 180.0) / (A / sqrtmagic * ops.cos(radlat) * PI)
+    return dlng, dlat
+
+
+def _wgs84_to_gcj02(ops, lng, lat):
+    dlng, dlat = _gcj02_offset(ops, lng, lat)
+    return lng + dlng, lat + dlat
+
+
+def _gcj02_to_wgs84(ops, lng, lat):
+    # 用 GCJ02 坐标处的偏移量近似 WGS84 坐标处的偏移量
+    dlng, dlat = _gcj02_offset(ops, lng, lat)
+    return lng - dlng, lat - dlat
+
+
+def _gcj02_to_wgs84_exact(ops, lng, lat):
+    """迭代求逆：不断用正向公式修正，直到正向转换回来与输入相差小于 EXACT_TOLERANCE"""
+    wgs_lng, wgs_lat = _gcj02_to_wgs84(ops, lng, lat)
+    for _ in range(EXACT_MAX_ITER):
+        gcj_lng, gcj_lat = _wgs84_to_gcj02(ops, wgs_lng, wgs_lat)
+        err_lng, err_lat = lng - gcj_lng, lat - gcj_lat
+        wgs_lng, wgs_lat = wgs_lng + err_lng, wgs_lat + err_lat
+        if max(ops.max_abs(err_lng), ops.max_abs(err_lat)) < EXACT_TOLERANCE:
+            break
+    return wgs_lng, wgs_lat
+
+
+_STEPS = {
+    ("bd09mc", "bd09"): _bd09mc_to_bd09,
+    ("bd09", "bd09mc"): _bd09_to_bd09mc,
+    ("bd09", "gcj02"): _bd09_to_gcj02,
+    ("gcj02", "bd09"): _gcj02_to_bd09,
+    ("gcj02", "wgs84"): _gcj02_to_wgs84,
+    ("wgs84", "gcj02"): _wgs84_to_gcj02,
+}
+
+
+def _steps(src, dst, exact, grid=None):
+    if src not in CRS_CHAIN or dst not in CRS_CHAIN:
+        raise ValueError(f"不支持的坐标系: {src} -> {dst}，可选 {CRS_CHAIN}")
+    if exact and grid is not None:
+        # 偏移网格插值的是一次近似的偏移量，不能给出 exact 的精度，不静默地二选一
+        raise ValueError("exact=True 与 grid 不能同时使用")
+    i, j = CRS_CHAIN.index(src), CRS_CHAIN.index(dst)
+    path = CRS_CHAIN[i:j + 1] if i <= j else CRS_CHAIN[j:i + 1][::-1]
+    steps = []
+    for a, b in zip(path, path[1:]):
+        if grid is not None and (a, b) == ("gcj02", "wgs84"):
+            steps.append(lambda ops, x, y: grid.gcj02_to_wgs84(x, y))
+        elif grid is not None and (a, b) == ("wgs84", "gcj02"):
+            steps.append(lambda ops, x, y: grid.wgs84_to_gcj02(x, y))
+        elif exact and (a, b) == ("gcj02", "wgs84"):
+            steps.append(_gcj02_to_wgs84_exact)
+        else:
+            steps.append(_STEPS[(a, b)])
+    return steps
+
+
+def _run(ops, x, y, src, dst, exact, grid=None):
+    x, y = ops.asfloat(x), ops.asfloat(y)
+    for step in _steps(src, dst, exact, grid):
+        x, y = step(ops, x, y)
+    return x, y
+
+
+def transform(x, y, src="bd09mc", dst="wgs84", exact=False):
+    """单点转换，返回 (x, y) 浮点数"""
+    return _run(_SCALAR, x, y, src, dst, exact)
+
+
+def transform_array(x, y, src="bd09mc", dst="wgs84", exact=False, grid=None):
+    """
+    数组转换，x / y 为任意形状的数组 (或可转换为数组的序列)，返回两个 float64 数组。
+    grid 为 common.gcj02_grid.Gcj02Grid 时，GCJ02 <-> WGS84 一步改用预先计算的偏移网格插值
+    (与默认的一次近似相同，误差为厘米级的插值误差)；与 exact=True 同时指定时抛出 ValueError。
+    """
+    return _run(_array(), x, y, src, dst, exact, grid)
+
+
+def gcj02_offset(lng, lat):
+    """(lng, lat) 处 GCJ02 相对 WGS84 的偏移量 (数组)，用于生成偏移网格"""
+    ops = _array()
+    return _gcj02_offset(ops, ops.asfloat(lng), ops.asfloat(lat))
+
+
+def transform_geometries(geoms, src="bd09mc", dst="wgs84", exact=False, grid=None):
+    """对一组几何 (shapely 数组 / GeoSeries.values) 的全部顶点一次完成转换，返回 shapely 几何数组"""
+    import shapely
+    np = _array().np
+
+    def apply(coords):
+        new_x, new_y = transform_array(coords[:, 0], coords[:, 1], src, dst, exact, grid)
+        return np.column_stack((new_x, new_y))
+
+    return shapely.transform(np.asarray(geoms, dtype=object), apply)
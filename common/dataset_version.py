@@ -0,0 +1,44 @@
+"""
+数据集版本戳。
+
+导入脚本 (106 / 206) 成功入库后调用 bump_dataset_version，
+后端据此判断数据是否变化，从而刷新内存索引、让响应缓存失效。
+"""
+from sqlalchemy import text
+
+VERSION_TABLE = "dataset_version"
+
+CREATE_SQL = text(f"""
+    CREATE TABLE IF NOT EXISTS "{VERSION_TABLE}" (
+        dataset text PRIMARY KEY,
+        version bigint NOT NULL,
+        updated_at timestamptz NOT NULL DEFAULT now()
+    );
+""")
+
+BUMP_SQL = text(f"""
+    INSERT INTO "{VERSION_TABLE}" (dataset, version, updated_at)
+    VALUES (:dataset, 1, now())
+    ON CONFLICT (dataset) DO UPDATE SET
+        version = "{VERSION_TABLE}".version + 1,
+        updated_at = now()
+    RETURNING version;
+""")
+
+FETCH_SQL = text(f"""
+    SELECT dataset, version, updated_at FROM "{VERSION_TABLE}" ORDER BY dataset;
+""")
+
+
+def bump_dataset_version(conn, dataset):
+    """数据集 (通常是表名) 重新入库后调用，返回新的版本号"""
+    conn.execute(CREATE_SQL)
+    return conn.execute(BUMP_SQL, {"dataset": dataset}).scalar()
+
+
+def fetch_dataset_versions(conn):
+    """返回 [(dataset, version, updated_at), ...]；版本表不存在时返回 None"""
+    exists = conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": f'"{VERSION_TABLE}"'}).scalar()
+    if not exists:
+        return None
+    return [tuple(row) for row in conn.execute(FETCH_SQL)]
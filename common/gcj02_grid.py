@@ -0,0 +1,146 @@
+"""
+GCJ02 偏移量网格：在固定范围 (默认广州市边界外扩一圈) 内按给定分辨率预先计算 GCJ02 相对 WGS84 的偏移，
+保存为 .npy (float32，可内存映射) + .json (范围、分辨率、误差)，批量转换时双线性插值，
+省去每个点十几次三角函数计算。网格范围外的点自动回退到解析公式。
+
+偏移函数在经纬度上很平滑，0.005 度分辨率下插值误差约为 1e-7 度 (厘米级)，
+实际误差在生成网格时按随机点测量并写入 .json。
+GCJ02 -> WGS84 与 coords 的默认方式一样是一次近似，没有迭代求逆的版本；
+coords.transform_array 等同时传入 grid 与 exact=True 时会报错。
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+from common import coords
+
+DEFAULT_RESOLUTION = 0.005
+# 城市边界外扩的范围 (度)，保证边界附近的点也落在网格内
+DEFAULT_MARGIN = 0.05
+# 测量误差时的随机点数
+ERROR_SAMPLES = 200_000
+METERS_PER_DEGREE = 111_000
+
+
+class Gcj02Grid:
+    def __init__(self, offsets, west, south, resolution, meta=None):
+        # offsets[0] 为经度偏移，offsets[1] 为纬度偏移，形状 (2, ny, nx)
+        self.offsets = offsets
+        self.west = west
+        self.south = south
+        self.resolution = resolution
+        self.ny, self.nx = offsets.shape[1:]
+        self.meta = meta or {}
+
+    @property
+    def bbox(self):
+        return (self.west, self.south,
+                self.west + (self.nx - 1) * self.resolution, self.south + (self.ny - 1) * self.resolution)
+
+    @classmethod
+    def build(cls, bbox, resolution=DEFAULT_RESOLUTION):
+        west, south, east, north = bbox
+        nx = max(int(math.ceil((east - west) / resolution)) + 1, 2)
+        ny = max(int(math.ceil((north - south) / resolution)) + 1, 2)
+        lng, lat = np.meshgrid(west + np.arange(nx) * resolution, south + np.arange(ny) * resolution)
+        dlng, dlat = coords.gcj02_offset(lng, lat)
+        grid = cls(np.stack([dlng, dlat]).astype("float32"), west, south, resolution)
+        grid.meta["error"] = grid.error_bounds()
+        return grid
+
+    def save(self, path):
+        """写入 path.npy 与 path.json"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.save(path + ".npy", self.offsets)
+        meta = dict(self.meta, west=self.west, south=self.south, resolution=self.resolution,
+                    shape=[self.ny, self.nx], bbox=list(self.bbox))
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        offsets = np.load(path + ".npy", mmap_mode="r")
+        return cls(offsets, meta["west"], meta["south"], meta["resolution"], meta)
+
+    def covers(self, bbox):
+        west, south, east, north = self.bbox
+        return west <= bbox[0] and south <= bbox[1] and east >= bbox[2] and north >= bbox[3]
+
+    def offset(self, lng, lat):
+        """双线性插值得到 (lng, lat) 处的偏移量；网格外的点使用解析公式"""
+        lng = np.asarray(lng, dtype="float64")
+        lat = np.asarray(lat, dtype="float64")
+        fx = (lng - self.west) / self.resolution
+        fy = (lat - self.south) / self.resolution
+        # NaN 的比较结果为 False，也按网格外处理
+        inside = (fx >= 0) & (fy >= 0) & (fx <= self.nx - 1) & (fy <= self.ny - 1)
+        fx = np.where(inside, fx, 0.0)
+        fy = np.where(inside, fy, 0.0)
+
+        ix = np.minimum(fx.astype(np.intp), self.nx - 2)
+        iy = np.minimum(fy.astype(np.intp), self.ny - 2)
+        tx, ty = fx - ix, fy - iy
+        w00, w01, w10, w11 = (1 - tx) * (1 - ty), tx * (1 - ty), (1 - tx) * ty, tx * ty
+
+        result = []
+        for component in self.offsets:
+            value = (component[iy, ix] * w00 + component[iy, ix + 1] * w01
+                     + component[iy + 1, ix] * w10 + component[iy + 1, ix + 1] * w11)
+            result.append(value)
+        dlng, dlat = result
+
+        if not inside.all():
+            outside = ~inside
+            dlng[outside], dlat[outside] = coords.gcj02_offset(lng[outside], lat[outside])
+        return dlng, dlat
+
+    def gcj02_to_wgs84(self, lng, lat):
+        """与 coords 中的一次近似相同：用 GCJ02 坐标处的偏移量近似"""
+        dlng, dlat = self.offset(lng, lat)
+        return np.asarray(lng, dtype="float64") - dlng, np.asarray(lat, dtype="float64") - dlat
+
+    def wgs84_to_gcj02(self, lng, lat):
+        dlng, dlat = self.offset(lng, lat)
+        return np.asarray(lng, dtype="float64") + dlng, np.asarray(lat, dtype="float64") + dlat
+
+    def error_bounds(self, samples=ERROR_SAMPLES, seed=0):
+        """网格范围内随机点上插值结果与解析公式的差异 (度 / 米)"""
+        rng = np.random.default_rng(seed)
+        west, south, east, north = self.bbox
+        lng = rng.uniform(west, east, samples)
+        lat = rng.uniform(south, north, samples)
+        formula_lng, formula_lat = coords.gcj02_offset(lng, lat)
+        grid_lng, grid_lat = self.offset(lng, lat)
+        err = np.hypot(grid_lng - formula_lng, grid_lat - formula_lat)
+        return {
+            "samples": samples,
+            "max_deg": float(err.max()),
+            "p99_deg": float(np.percentile(err, 99)),
+            "max_m": float(err.max() * METERS_PER_DEGREE),
+        }
+
+
+def boundary_bbox(boundary_path, margin=DEFAULT_MARGIN):
+    """读取城市边界 (如 广州市.shp) 的 WGS84 外包矩形并外扩 margin 度"""
+    from common.boundary import load_boundary
+    west, south, east, north = load_boundary(boundary_path).to_crs("EPSG:4326").total_bounds
+    return (float(west) - margin, float(south) - margin, float(east) + margin, float(north) + margin)
+
+
+def ensure_grid(path, boundary_path, resolution=DEFAULT_RESOLUTION):
+    """
+    加载已有网格；不存在、分辨率不同或不能覆盖边界范围时重新生成并保存。
+    返回 (grid, 是否新生成)
+    """
+    bbox = boundary_bbox(boundary_path, margin=0)
+    if os.path.exists(path + ".npy") and os.path.exists(path + ".json"):
+        grid = Gcj02Grid.load(path)
+        if grid.resolution == resolution and grid.covers(bbox):
+            return grid, False
+    grid = Gcj02Grid.build(boundary_bbox(boundary_path), resolution)
+    grid.save(path)
+    return grid, True
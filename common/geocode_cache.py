@@ -0,0 +1,174 @@
+"""
+持久化的地理编码缓存 (SQLite)：站点名 -> 坐标。
+
+键为 规范化后的站名 + 城市代码，每条记录保存状态、坐标、接口原始返回与抓取时间：
+    ok          找到坐标，永久有效
+    not_found   接口正常返回但没有结果，NEGATIVE_TTL 秒内不再重复查询
+    error       请求失败 / 验证码等，只作记录，下次运行会重新查询
+每次查询结果单条写入 (WAL 模式，O(1))，启动时不需要加载任何数据；
+多个线程可共享同一个缓存对象。
+
+UidGeoCache 是 102 使用的 百度 POI uid -> geo 字符串 缓存，结构相同。
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+OK = "ok"
+NOT_FOUND = "not_found"
+ERROR = "error"
+
+# 未找到结果的缓存有效期 (秒)
+NEGATIVE_TTL = 7 * 24 * 3600
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS geocode (
+        key        TEXT PRIMARY KEY,
+        name       TEXT NOT NULL,
+        city       INTEGER NOT NULL,
+        status     TEXT NOT NULL,
+        x          REAL,
+        y          REAL,
+        raw        TEXT,
+        fetched_at REAL NOT NULL
+    );
+"""
+
+UID_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS uid_geo (
+        uid        TEXT PRIMARY KEY,
+        geo        TEXT,
+        fetched_at REAL NOT NULL
+    );
+"""
+
+
+def normalize_name(name):
+    """全角转半角、去掉所有空白，使 “天河 客运站” 与 “天河客运站” 命中同一条缓存"""
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", str(name)))
+
+
+def cache_key(name, city):
+    return f"{city}|{normalize_name(name)}"
+
+
+def _connect(path, schema):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(schema)
+    conn.commit()
+    return conn
+
+
+class GeocodeCache:
+    def __init__(self, path, negative_ttl=NEGATIVE_TTL):
+        self.path = path
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._conn = _connect(path, SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+
+    def get(self, name, city):
+        """
+        返回有效的缓存记录 (status, x, y)：ok，或未过期的 not_found；
+        没有记录、已过期或上次出错时返回 None (需要重新查询)
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT status, x, y, fetched_at FROM geocode WHERE key = ?",
+                                     (cache_key(name, city),)).fetchone()
+        if row is None:
+            return None
+        status, x, y, fetched_at = row
+        if status == OK:
+            return status, x, y
+        if status == NOT_FOUND and time.time() - fetched_at < self.negative_ttl:
+            return status, None, None
+        return None
+
+    def put(self, name, city, status, x=None, y=None, raw=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode (key, name, city, status, x, y, raw, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (cache_key(name, city), name, city, status, x, y, raw, time.time()),
+            )
+            self._conn.commit()
+
+    def put_many(self, records, city):
+        """批量写入 [(name, status, x, y, raw), ...]，用于从旧的 CSV 导入"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO geocode (key, name, city, status, x, y, raw, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(cache_key(name, city), name, city, status, x, y, raw, now) for name, status, x, y, raw in records],
+            )
+            self._conn.commit()
+
+    def coordinates(self, city):
+        """该城市所有找到坐标的记录，返回 DataFrame (key, x, y)，用于导出时按键合并"""
+        import pandas as pd
+
+        with self._lock:
+            return pd.read_sql_query("SELECT key, x, y FROM geocode WHERE city = ? AND status = ?",
+                                     self._conn, params=(city, OK))
+
+    def status_counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM geocode GROUP BY status").fetchall())
+
+
+class UidGeoCache:
+    """
+    uid -> geo。geo 为 None 表示该 uid 没有几何 (同样缓存，不再重复请求)；
+    请求失败的结果不应写入
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = _connect(path, UID_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM uid_geo").fetchone()[0]
+
+    def get(self, uid):
+        """返回 (是否命中, geo)"""
+        with self._lock:
+            row = self._conn.execute("SELECT geo FROM uid_geo WHERE uid = ?", (uid,)).fetchone()
+        return (False, None) if row is None else (True, row[0])
+
+    def put(self, uid, geo):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO uid_geo (uid, geo, fetched_at) VALUES (?, ?, ?)",
+                               (uid, geo, time.time()))
+            self._conn.commit()
@@ -0,0 +1,105 @@
+"""
+流水线各阶段之间的数据交换：默认使用 GeoParquet (列式存储，几何为 WKB 列)，
+比 CSV / pickle / Shapefile 读写快得多、文件更小，也没有 Shapefile 字段名 10 字符与 GBK/UTF-8 编码的问题。
+
+路径均不带扩展名 (如 data/raw/bus_stops_wgs84)：
+    write_geodata(gdf, base)       写 base.parquet，legacy_shp=True 时另外导出 base.shp
+    read_geodata(base, columns)    优先读 base.parquet (可只读部分列、内存映射)，不存在时回退到旧格式
+"""
+import os
+
+PARQUET_SUFFIX = ".parquet"
+# 旧格式按顺序尝试
+LEGACY_GEO_SUFFIXES = (".shp", ".geojson", ".pkl")
+LEGACY_TABLE_SUFFIXES = (".csv", ".pkl")
+COMPRESSION = "zstd"
+
+
+def parquet_path(base):
+    return base + PARQUET_SUFFIX
+
+
+def existing_path(base, suffixes=(PARQUET_SUFFIX,) + LEGACY_GEO_SUFFIXES + LEGACY_TABLE_SUFFIXES):
+    """返回 base 对应的第一个存在的文件，都不存在时返回 None"""
+    for suffix in suffixes:
+        if os.path.exists(base + suffix):
+            return base + suffix
+    return None
+
+
+def write_geodata(gdf, base, legacy_shp=False):
+    """写 GeoParquet (几何为 WKB)，返回写出的文件列表"""
+    os.makedirs(os.path.dirname(os.path.abspath(base)), exist_ok=True)
+    gdf.to_parquet(parquet_path(base), compression=COMPRESSION, index=False)
+    written = [parquet_path(base)]
+    if legacy_shp:
+        gdf.to_file(base + ".shp", driver="ESRI Shapefile", encoding="utf-8")
+        written.append(base + ".shp")
+    return written
+
+
+def write_table(df, base):
+    """无几何列的表写为 Parquet"""
+    os.makedirs(os.path.dirname(os.path.abspath(base)), exist_ok=True)
+    df.to_parquet(parquet_path(base), compression=COMPRESSION, index=False)
+    return parquet_path(base)
+
+
+def read_geodata(base, columns=None, memory_map=True):
+    """
+    读取 GeoDataFrame。columns 为要读取的属性列 (几何列总会读取)，None 表示全部。
+    GeoParquet 不存在时依次尝试 .shp / .geojson / .pkl，都不存在时抛出 FileNotFoundError
+    """
+    import geopandas as gpd
+
+    path = existing_path(base, (PARQUET_SUFFIX,) + LEGACY_GEO_SUFFIXES)
+    if path is None:
+        raise FileNotFoundError(f"{base}{PARQUET_SUFFIX} / {'/'.join(LEGACY_GEO_SUFFIXES)}")
+
+    if path.endswith(PARQUET_SUFFIX):
+        if columns is not None:
+            columns = list(columns) + ["geometry"]
+        return gpd.read_parquet(path, columns=columns, memory_map=memory_map)
+    if path.endswith(".pkl"):
+        import pandas as pd
+        gdf = gpd.GeoDataFrame(pd.read_pickle(path), geometry="geometry")
+    else:
+        try:
+            gdf = gpd.read_file(path, encoding="utf-8")
+        except UnicodeDecodeError:
+            gdf = gpd.read_file(path, encoding="gbk")
+    if columns is not None:
+        gdf = gdf[list(columns) + ["geometry"]]
+    return gdf
+
+
+def read_table(base, columns=None, memory_map=True):
+    """读取无几何列的表：优先 Parquet，不存在时依次尝试 .csv (UTF-8 / GBK) / .pkl"""
+    import pandas as pd
+
+    path = existing_path(base, (PARQUET_SUFFIX,) + LEGACY_TABLE_SUFFIXES)
+    if path is None:
+        raise FileNotFoundError(f"{base}{PARQUET_SUFFIX} / {'/'.join(LEGACY_TABLE_SUFFIXES)}")
+
+    if path.endswith(PARQUET_SUFFIX):
+        return pd.read_parquet(path, columns=columns, memory_map=memory_map)
+    if path.endswith(".pkl"):
+        df = pd.read_pickle(path)
+        return df[columns] if columns is not None else df
+    try:
+        return pd.read_csv(path, encoding="utf-8", usecols=columns)
+    except UnicodeDecodeError:
+        return pd.read_csv(path, encoding="gbk", usecols=columns)
+
+
+def file_size_mb(paths):
+    """文件大小 (MB)；Shapefile 计入同名的 .dbf / .shx / .prj / .cpg"""
+    total = 0
+    for path in paths:
+        if path.endswith(".shp"):
+            stem = path[:-4]
+            total += sum(os.path.getsize(stem + ext) for ext in (".shp", ".dbf", ".shx", ".prj", ".cpg")
+                         if os.path.exists(stem + ext))
+        else:
+            total += os.path.getsize(path)
+    return total / 1024 / 1024
@@ -0,0 +1,122 @@
+"""
+流水线各阶段的增量执行：按记录 (高校名称) 计算输入内容哈希，与上次运行保存的清单比较，
+只处理内容变化或新增的记录，其余记录直接沿用上次的输出。
+
+清单保存在输出文件旁 (<output_base>.manifest.json)：
+    params   影响输出的处理参数 (如修复方式、坐标转换方式、边界文件哈希)，与上次不同时视为全部变化
+    records  {键: 该记录输入内容的哈希}
+清单在输出写完后才更新；中途中断时下次运行仍按旧清单判断，不会漏掉记录。
+"""
+import hashlib
+import json
+import os
+
+from common.atomic import atomic_write_text
+
+KEY = "name"
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def manifest_path(output_base):
+    return output_base + MANIFEST_SUFFIX
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """文件内容的 sha1，不存在时返回 None"""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def row_hashes(df, key=KEY, digests=None):
+    """
+    按 key 分组计算每条记录所有列的内容哈希，返回 {键: sha1}。
+    几何列按 WKB 计算，坐标有任何变化都会反映到哈希上。
+    分块读取时把同一个 digests ({键: hashlib 对象}) 传给每一块：同一键的行跨块时累积为整组的哈希，
+    与一次读入整个表的结果相同
+    """
+    import numpy as np
+    import shapely
+
+    columns = []
+    for column in df.columns:
+        values = df[column]
+        if values.dtype.name == "geometry":
+            columns.append(shapely.to_wkb(np.asarray(values.values, dtype=object)))
+        else:
+            columns.append(values.to_numpy())
+
+    digests = {} if digests is None else digests
+    for k, *row in zip(df[key].astype(str).to_numpy(), *columns):
+        h = digests.setdefault(k, hashlib.sha1())
+        for value in row:
+            h.update(value if isinstance(value, bytes) else str(value).encode("utf-8"))
+            h.update(b"\x1f")
+        h.update(b"\x1e")
+    # 只返回本块中出现的键 (累积时为截至本块的哈希，整组的哈希在读完全部块后从 digests 取得)
+    return {k: digests[k].hexdigest() for k in dict.fromkeys(df[key].astype(str).to_numpy())}
+
+
+class Manifest:
+    def __init__(self, path, params=None):
+        self.path = path
+        # 经 JSON 往返一次，使 tuple 等与读回的清单可以直接比较
+        self.params = json.loads(json.dumps(params or {}))
+        self.records = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("params") == self.params:
+                self.records = data.get("records", {})
+
+    def clear(self):
+        """忽略上次的记录 (全部重新处理)"""
+        self.records = {}
+
+    def changed(self, hashes):
+        """新增或内容变化的键"""
+        return [k for k, h in hashes.items() if self.records.get(k) != h]
+
+    def removed(self, hashes):
+        """上次有、本次输入中已没有的键"""
+        return [k for k in self.records if k not in hashes]
+
+    def save(self, records=None):
+        if records is not None:
+            self.records = dict(records)
+        atomic_write_text(self.path, json.dumps({"params": self.params, "records": self.records},
+                                                ensure_ascii=False, indent=1))
+
+
+def read_previous(output_base, full=False):
+    """上次的输出 (GeoParquet)；全量运行或不存在时返回 None"""
+    from common.geoio import parquet_path, read_geodata
+
+    if full or not os.path.exists(parquet_path(output_base)):
+        return None
+    return read_geodata(output_base)
+
+
+def select(df, keys, key=KEY):
+    return df[df[key].astype(str).isin(set(keys))]
+
+
+def merge_outputs(previous, processed, replaced, order, key=KEY):
+    """
+    上次输出中未被替换、且仍在本次输入中的记录 + 本次处理的记录，按输入顺序 order (键的序列) 排列，
+    与全量运行的输出一致。previous 为 None 时直接返回 processed
+    """
+    import pandas as pd
+
+    if previous is None:
+        return processed
+    # 清单失效 (参数变化、清单丢失) 时 removed 为空，已从输入中删除的记录也要靠 order 过滤掉
+    previous_keys = previous[key].astype(str)
+    kept = previous[previous_keys.isin(set(order)) & ~previous_keys.isin(set(replaced))]
+    merged = kept if processed is None or len(processed) == 0 else pd.concat([kept, processed], ignore_index=True)
+    position = {k: i for i, k in enumerate(order)}
+    return merged.sort_values(by=key, key=lambda s: s.astype(str).map(position), kind="stable").reset_index(drop=True)
@@ -0,0 +1,59 @@
+"""
+投影 (米制) 几何副本，供按校园边界计算步行范围使用。
+
+"Gz_universities_utm" / "Gz_Stops_utm" 把高校边界与公交站点预先投影到
+UTM 49N (EPSG:32649，覆盖广州)，并建立 GiST 索引。查询时直接在米制平面上
+用 ST_DWithin / ST_Distance，可以走索引，不需要逐行转换为 geography。
+导入脚本每次入库后整表重建 (数据量小，重建只需几秒)，与基础表一样先写 staging 表再原子替换。
+"""
+from sqlalchemy import text
+
+from common.bulk_load import swap_table, STAGING_SUFFIX
+
+# 广州位于 UTM 49 带 (108°E - 114°E)，东部少量区域超出带边，长度变形仍小于 0.1%
+METRIC_SRID = 32649
+
+UNIVERSITIES_UTM_TABLE = "Gz_universities_utm"
+STOPS_UTM_TABLE = "Gz_Stops_utm"
+
+UNIVERSITIES_UTM_STAGING = UNIVERSITIES_UTM_TABLE + STAGING_SUFFIX
+STOPS_UTM_STAGING = STOPS_UTM_TABLE + STAGING_SUFFIX
+
+# 先在 staging 表中建好数据与索引，最后再替换正式表：重建期间步行范围查询照常读旧表，
+# 只在替换到提交之间短暂等锁
+BUILD_UNIVERSITIES_SQL = text(f"""
+    DROP TABLE IF EXISTS "{UNIVERSITIES_UTM_STAGING}";
+    CREATE TABLE "{UNIVERSITIES_UTM_STAGING}" AS
+        SELECT name, ST_Multi(ST_Transform(geometry, {METRIC_SRID}))::geometry(MultiPolygon, {METRIC_SRID}) AS geom_utm
+        FROM "Gz_universities"
+        WHERE geometry IS NOT NULL;
+    CREATE INDEX "{UNIVERSITIES_UTM_STAGING}_name_idx" ON "{UNIVERSITIES_UTM_STAGING}" (name);
+    CREATE INDEX "{UNIVERSITIES_UTM_STAGING}_geom_idx" ON "{UNIVERSITIES_UTM_STAGING}" USING GIST (geom_utm);
+    ANALYZE "{UNIVERSITIES_UTM_STAGING}";
+""")
+
+BUILD_STOPS_SQL = text(f"""
+    -- 旧版本按线路逐行投影的表
+    DROP TABLE IF EXISTS "Gz_BusStops_utm";
+    DROP TABLE IF EXISTS "{STOPS_UTM_STAGING}";
+    CREATE TABLE "{STOPS_UTM_STAGING}" AS
+        SELECT stop_id, station, geometry, ST_Transform(geometry, {METRIC_SRID})::geometry(Point, {METRIC_SRID}) AS geom_utm
+        FROM "Gz_Stops"
+        WHERE geometry IS NOT NULL;
+    CREATE INDEX "{STOPS_UTM_STAGING}_geom_idx" ON "{STOPS_UTM_STAGING}" USING GIST (geom_utm);
+    ANALYZE "{STOPS_UTM_STAGING}";
+""")
+
+
+def rebuild_projected_universities(conn):
+    """重建 "Gz_universities_utm" (需在事务中调用，替换后应尽快提交)，返回行数"""
+    conn.execute(BUILD_UNIVERSITIES_SQL)
+    swap_table(conn, UNIVERSITIES_UTM_STAGING, UNIVERSITIES_UTM_TABLE)
+    return conn.execute(text(f'SELECT COUNT(*) FROM "{UNIVERSITIES_UTM_TABLE}"')).scalar()
+
+
+def rebuild_projected_stops(conn):
+    """重建 "Gz_Stops_utm" (需在事务中调用，替换后应尽快提交)，返回行数"""
+    conn.execute(BUILD_STOPS_SQL)
+    swap_table(conn, STOPS_UTM_STAGING, STOPS_UTM_TABLE)
+    return conn.execute(text(f'SELECT COUNT(*) FROM "{STOPS_UTM_TABLE}"')).scalar()
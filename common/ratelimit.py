@@ -0,0 +1,175 @@
+"""
+爬虫 / 接口调用的限速工具，可在多个线程 (或协程) 之间共享：
+    TokenBucket    全局令牌桶：所有线程 / 协程合计每秒不超过 rate 个请求 (允许 burst 个突发)
+    HostLimiter    每个主机同时进行中的请求数上限
+    backoff_delay  带随机抖动的指数退避
+    PoliteSession  把以上三者组合到 requests 上：每次请求先取令牌与主机名额，
+                   429 / 5xx / 网络错误按退避重试，服务端给出 Retry-After 时按其等待；
+                   取得令牌时请求已不再需要 (cancelled() 为真) 则归还令牌、不发请求
+"""
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+
+# 需要重试的状态码
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶。acquire 先预约令牌再在锁外等待，
+    令牌不足时各线程按调用顺序依次排队，合计速率严格不超过 rate。
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = max(float(burst), 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """预约令牌，返回需要等待的秒数 (不阻塞)"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def pause(self, seconds):
+        """暂停发放令牌：之后的第一个请求至少等待 seconds 秒 (触发验证码等情况下让所有线程 / 协程一起退避)"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+    def refund(self, tokens=1):
+        """归还已取得但没有使用的令牌 (请求在等待期间被取消)"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def acquire(self, tokens=1):
+        """取令牌，不足时阻塞等待；返回等待的秒数"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=1):
+        """asyncio 版本的 acquire：等待期间不阻塞事件循环"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class HostLimiter:
+    """按主机 (scheme://host:port) 限制同时进行中的请求数"""
+
+    def __init__(self, per_host=2):
+        self.per_host = per_host
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, url):
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+    @contextmanager
+    def slot(self, url):
+        semaphore = self._semaphore(url)
+        with semaphore:
+            yield
+
+
+def backoff_delay(attempt, base=1.0, cap=30.0, rng=random):
+    """
+    第 attempt 次 (从 0 开始) 重试前等待的秒数：上限为 min(cap, base * 2^attempt)，
+    一半固定、一半随机，避免多个线程同时失败后又同时重试
+    """
+    ceiling = min(cap, base * 2 ** attempt)
+    return ceiling / 2 + rng.uniform(0, ceiling / 2)
+
+
+def retry_after_seconds(response):
+    """解析 Retry-After (秒数形式)，没有或无法解析时返回 0"""
+    value = response.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class PoliteSession:
+    """
+    多线程共享的限速 HTTP 客户端，每个线程使用自己的 requests.Session (连接复用)。
+    stats 记录请求数、重试数、429 次数、取消数与累计等待令牌的秒数。
+    """
+
+    def __init__(self, rate, burst=1, per_host=2, max_retries=3, backoff_base=1.0, backoff_cap=30.0,
+                 session_factory=requests.Session):
+        self.bucket = TokenBucket(rate, burst)
+        self.hosts = HostLimiter(per_host)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._session_factory = session_factory
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "cancelled": 0, "waited": 0.0}
+
+    def _count(self, key, value=1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._session_factory()
+        return session
+
+    def request(self, method, url, cancelled=None, **kwargs):
+        """
+        限速请求。返回最后一次的 Response (可能仍是 429 / 5xx)；
+        重试用尽后仍是网络错误时抛出最后一次的 requests.RequestException。
+        cancelled 为可选的无参函数，等到令牌后返回真时不发请求，返回 None
+        """
+        for attempt in range(self.max_retries + 1):
+            self._count("waited", self.bucket.acquire())
+            if cancelled is not None and cancelled():
+                self.bucket.refund()
+                self._count("cancelled")
+                return None
+            self._count("requests")
+            try:
+                with self.hosts.slot(url):
+                    res = self.session.request(method, url, **kwargs)
+            except requests.RequestException:
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+            else:
+                if res.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    return res
+                if res.status_code == 429:
+                    self._count("throttled")
+                delay = max(retry_after_seconds(res), backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+            self._count("retries")
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
@@ -0,0 +1,85 @@
+"""
+去重后的公交站点表。
+
+"Gz_BusStops" 每行是一条线路上的一个站 (line, station, seq)，同一个物理站点被 30 条线路
+经过就有 30 个相同的点。导入脚本入库后由它生成：
+    "Gz_Stops"      每个物理站点一行 (stop_id, station, geometry, n_lines)：
+                    同名且相距不超过 STOP_MERGE_DISTANCE 米的点 (ST_ClusterDBSCAN) 合并为一个站点，
+                    几何取各点的中心
+    "Gz_LineStops"  线路与站点的关联 (line, seq, stop_id)
+后端的最近站点、统计、步行范围与瓦片查询都使用 "Gz_Stops"。
+"""
+from sqlalchemy import text
+
+from common.projected import METRIC_SRID
+from common.bulk_load import swap_table, STAGING_SUFFIX
+
+RAW_STOPS_TABLE = "Gz_BusStops"
+STOPS_TABLE = "Gz_Stops"
+LINE_STOPS_TABLE = "Gz_LineStops"
+
+# 同名站点合并的距离 (米)：同一站点各线路的坐标通常只差几米到十几米，
+# 而相隔一个路口的同名站点 (如道路两侧、不同出入口) 一般在 100 米以上
+STOP_MERGE_DISTANCE = 50
+
+STOPS_STAGING = STOPS_TABLE + STAGING_SUFFIX
+LINE_STOPS_STAGING = LINE_STOPS_TABLE + STAGING_SUFFIX
+
+# 先在 staging 表中建好数据与索引，最后再替换正式表，重建期间后端照常查询旧表
+BUILD_SQL = text(f"""
+    DROP TABLE IF EXISTS "{LINE_STOPS_STAGING}";
+    DROP TABLE IF EXISTS "{STOPS_STAGING}";
+
+    CREATE TEMP TABLE stop_members ON COMMIT DROP AS
+        SELECT line, seq, station, geometry,
+               DENSE_RANK() OVER (ORDER BY station, cluster)::integer AS stop_id
+        FROM (
+            SELECT line, seq, station, geometry,
+                   ST_ClusterDBSCAN(ST_Transform(geometry, {METRIC_SRID}),
+                                    eps := CAST(:tolerance AS double precision), minpoints := 1)
+                       OVER (PARTITION BY station) AS cluster
+            FROM "{RAW_STOPS_TABLE}"
+            WHERE geometry IS NOT NULL
+        ) c;
+
+    CREATE TABLE "{STOPS_STAGING}" AS
+        SELECT stop_id,
+               station,
+               ST_Centroid(ST_Collect(geometry))::geometry(Point, 4326) AS geometry,
+               COUNT(DISTINCT line)::integer AS n_lines
+        FROM stop_members
+        GROUP BY stop_id, station;
+    ALTER TABLE "{STOPS_STAGING}" ADD PRIMARY KEY (stop_id);
+    CREATE INDEX "{STOPS_STAGING}_geom_idx" ON "{STOPS_STAGING}" USING GIST (geometry);
+    CREATE INDEX "{STOPS_STAGING}_station_idx" ON "{STOPS_STAGING}" (station);
+
+    CREATE TABLE "{LINE_STOPS_STAGING}" AS
+        SELECT DISTINCT line, seq, stop_id
+        FROM stop_members;
+    ALTER TABLE "{LINE_STOPS_STAGING}"
+        ADD FOREIGN KEY (stop_id) REFERENCES "{STOPS_STAGING}" (stop_id) ON DELETE CASCADE;
+    CREATE INDEX "{LINE_STOPS_STAGING}_line_idx" ON "{LINE_STOPS_STAGING}" (line, seq);
+    CREATE INDEX "{LINE_STOPS_STAGING}_stop_idx" ON "{LINE_STOPS_STAGING}" (stop_id);
+
+    ANALYZE "{STOPS_STAGING}";
+    ANALYZE "{LINE_STOPS_STAGING}";
+""")
+
+COUNTS_SQL = text(f"""
+    SELECT (SELECT COUNT(*) FROM "{RAW_STOPS_TABLE}") AS raw,
+           (SELECT COUNT(*) FROM "{STOPS_TABLE}") AS stops,
+           (SELECT COUNT(*) FROM "{LINE_STOPS_TABLE}") AS line_stops;
+""")
+
+
+def rebuild_stops(conn, tolerance=STOP_MERGE_DISTANCE):
+    """
+    由 "Gz_BusStops" 重建 "Gz_Stops" 与 "Gz_LineStops"，需在事务中调用。
+    返回 (原始行数, 去重后站点数, 线路-站点关联数)
+    """
+    conn.execute(BUILD_SQL, {"tolerance": tolerance})
+    # 关联表引用站点表，先替换关联表
+    swap_table(conn, LINE_STOPS_STAGING, LINE_STOPS_TABLE)
+    swap_table(conn, STOPS_STAGING, STOPS_TABLE)
+    row = conn.execute(COUNTS_SQL).one()
+    return row.raw, row.stops, row.line_stops
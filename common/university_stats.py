@@ -0,0 +1,177 @@
+"""
+高校周边公交站数量的物化统计表。
+
+表 "Gz_university_stats" 为每所高校保存质心坐标以及质心周边
+100/300/500/800 米内的公交站数量 (按去重后的 "Gz_Stops" 计，
+每个物理站点只算一次，而不是每条经过的线路各算一次)。由导入脚本在入库后建立，
+之后只对几何变化的高校、或周边站点有变化的高校做增量刷新，
+后端 /api/stats 直接按键读取该表。
+"""
+from sqlalchemy import text
+
+STATS_TABLE = "Gz_university_stats"
+STOPS_SNAPSHOT_TABLE = "Gz_Stops_prev"
+
+# 统计半径 (米)，对应表中的 cnt_100 / cnt_300 / ...
+RADII = (100, 300, 500, 800)
+MAX_RADIUS = max(RADII)
+
+# 先用几何 bbox (&&) 走 GiST 索引粗筛，再用 geography 精确判断距离。
+# 0.01 度在广州纬度约为 1 公里，覆盖最大半径 800 米。
+BBOX_MARGIN_DEG = 0.01
+
+
+def _count_columns():
+    return ",\n".join(
+        f"COUNT(b.station) FILTER (WHERE ST_DWithin(u.centroid::geography, b.geometry::geography, {r})) AS cnt_{r}"
+        for r in RADII
+    )
+
+
+CREATE_SQL = text(f"""
+    CREATE TABLE IF NOT EXISTS "{STATS_TABLE}" (
+        name text PRIMARY KEY,
+        lon double precision,
+        lat double precision,
+        geom_hash text,
+        {", ".join(f"cnt_{r} integer NOT NULL DEFAULT 0" for r in RADII)},
+        updated_at timestamptz NOT NULL DEFAULT now()
+    );
+    CREATE INDEX IF NOT EXISTS "{STATS_TABLE}_cnt_100_idx" ON "{STATS_TABLE}" (cnt_100 DESC);
+""")
+
+# :names 为 NULL 时刷新全部高校
+REFRESH_SQL = text(f"""
+    INSERT INTO "{STATS_TABLE}" AS s (name, lon, lat, geom_hash, {", ".join(f"cnt_{r}" for r in RADII)}, updated_at)
+    SELECT
+        u.name,
+        ST_X(u.centroid),
+        ST_Y(u.centroid),
+        u.geom_hash,
+        {_count_columns()},
+        now()
+    FROM (
+        SELECT DISTINCT ON (name)
+            name,
+            ST_Centroid(geometry) AS centroid,
+            md5(ST_AsEWKB(geometry)) AS geom_hash
+        FROM "Gz_universities"
+        WHERE geometry IS NOT NULL
+          AND (CAST(:names AS text[]) IS NULL OR name = ANY(CAST(:names AS text[])))
+        ORDER BY name
+    ) u
+    LEFT JOIN "Gz_Stops" b
+        ON b.geometry && ST_Expand(u.centroid, {BBOX_MARGIN_DEG})
+       AND ST_DWithin(u.centroid::geography, b.geometry::geography, {MAX_RADIUS})
+    GROUP BY u.name, u.centroid, u.geom_hash
+    ON CONFLICT (name) DO UPDATE SET
+        lon = EXCLUDED.lon,
+        lat = EXCLUDED.lat,
+        geom_hash = EXCLUDED.geom_hash,
+        {", ".join(f"cnt_{r} = EXCLUDED.cnt_{r}" for r in RADII)},
+        updated_at = EXCLUDED.updated_at;
+""")
+
+# 几何发生变化 (或新增) 的高校
+CHANGED_UNIVERSITIES_SQL = text(f"""
+    SELECT DISTINCT u.name
+    FROM "Gz_universities" u
+    LEFT JOIN "{STATS_TABLE}" s ON s.name = u.name
+    WHERE u.geometry IS NOT NULL
+      AND (s.name IS NULL OR s.geom_hash IS DISTINCT FROM md5(ST_AsEWKB(u.geometry)));
+""")
+
+DELETE_REMOVED_SQL = text(f"""
+    DELETE FROM "{STATS_TABLE}" s
+    WHERE NOT EXISTS (SELECT 1 FROM "Gz_universities" u WHERE u.name = s.name);
+""")
+
+SNAPSHOT_STOPS_SQL = text(f"""
+    DROP TABLE IF EXISTS "{STOPS_SNAPSHOT_TABLE}";
+    CREATE TABLE "{STOPS_SNAPSHOT_TABLE}" AS
+        SELECT station, geometry FROM "Gz_Stops";
+""")
+
+# 新旧站点表的对称差：新增、删除或移动过的站点
+AFFECTED_BY_STOPS_SQL = text(f"""
+    WITH new_stops AS (
+        SELECT station, ST_AsEWKB(geometry) AS wkb FROM "Gz_Stops"
+    ), old_stops AS (
+        SELECT station, ST_AsEWKB(geometry) AS wkb FROM "{STOPS_SNAPSHOT_TABLE}"
+    ), changed AS (
+        (SELECT * FROM new_stops EXCEPT ALL SELECT * FROM old_stops)
+        UNION ALL
+        (SELECT * FROM old_stops EXCEPT ALL SELECT * FROM new_stops)
+    ), changed_geom AS (
+        SELECT ST_GeomFromEWKB(wkb) AS geometry FROM changed WHERE wkb IS NOT NULL
+    )
+    SELECT DISTINCT s.name
+    FROM "{STATS_TABLE}" s
+    JOIN changed_geom c
+      ON c.geometry && ST_Expand(ST_SetSRID(ST_MakePoint(s.lon, s.lat), 4326), {BBOX_MARGIN_DEG})
+     AND ST_DWithin(ST_SetSRID(ST_MakePoint(s.lon, s.lat), 4326)::geography, c.geometry::geography, {MAX_RADIUS});
+""")
+
+
+def _table_exists(conn, table_name):
+    return conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": f'"{table_name}"'}).scalar()
+
+
+def _refresh(conn, names=None):
+    conn.execute(REFRESH_SQL, {"names": list(names) if names is not None else None})
+
+
+def ensure_stats_table(conn):
+    conn.execute(CREATE_SQL)
+
+
+def rebuild_all(conn):
+    """全量重建统计表"""
+    ensure_stats_table(conn)
+    conn.execute(text(f'TRUNCATE "{STATS_TABLE}";'))
+    _refresh(conn)
+    return conn.execute(text(f'SELECT COUNT(*) FROM "{STATS_TABLE}"')).scalar()
+
+
+def refresh_changed_universities(conn):
+    """
+    高校表重新入库后调用：只重算新增或几何变化的高校，并删除已不存在的高校。
+    返回被刷新的高校数量。
+    """
+    if not _table_exists(conn, "Gz_Stops"):
+        print("   提示：公交站点表尚未入库，跳过统计表刷新。")
+        return 0
+    if not _table_exists(conn, STATS_TABLE):
+        return rebuild_all(conn)
+
+    names = [row.name for row in conn.execute(CHANGED_UNIVERSITIES_SQL)]
+    conn.execute(DELETE_REMOVED_SQL)
+    if names:
+        _refresh(conn, names)
+    return len(names)
+
+
+def snapshot_stops(conn):
+    """公交站点表重新入库前调用：保存旧站点，用于入库后计算变化的站点"""
+    if _table_exists(conn, "Gz_Stops"):
+        conn.execute(SNAPSHOT_STOPS_SQL)
+
+
+def refresh_for_stop_changes(conn):
+    """
+    公交站点表重新入库后调用：只重算周边 (最大半径内) 有站点变化的高校。
+    没有旧快照或统计表时全量重建。返回被刷新的高校数量。
+    """
+    if not _table_exists(conn, "Gz_universities"):
+        print("   提示：高校表尚未入库，跳过统计表刷新。")
+        return 0
+    if not _table_exists(conn, STATS_TABLE) or not _table_exists(conn, STOPS_SNAPSHOT_TABLE):
+        count = rebuild_all(conn)
+    else:
+        names = [row.name for row in conn.execute(AFFECTED_BY_STOPS_SQL)]
+        if names:
+            _refresh(conn, names)
+        count = len(names)
+
+    conn.execute(text(f'DROP TABLE IF EXISTS "{STOPS_SNAPSHOT_TABLE}";'))
+    return count
@@ -1,10 +1,23 @@
-import requests
+import argparse
+import heapq
+import os
+import sys
+import threading
 import time
-import pandas as pd
-import json
-import random
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from urllib.parse import quote
-import os
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+data_raw_dir = os.path.join(project_root, 'data', 'raw')
+
+sys.path.insert(0, project_root)
+from common.ratelimit import PoliteSession
+from common.geocode_cache import UidGeoCache
+from common.incremental import Manifest, manifest_path
+from common.atomic import atomic_write_text
 
 # 【配置区】请在此处更新你的 Cookie
 
@@ -18,23 +31,51 @@ HEADERS = {
     "Cookie": BAIDU_COOKIE
 }
 
-SEARCH_URL = "https://map.baidu.com/?qt=s&wd={}&rn=10&ie=utf-8&c=1"
-EXT_URL = "https://map.baidu.com/?qt=ext&uid={}&l=18&ext_ver=new"
+# 接口地址，可用 --base-url 指向本地模拟服务器 (benchmarks/mock_baidu_server.py)
+BASE_URL = "https://map.baidu.com"
+SEARCH_PATH = "/?qt=s&wd={}&rn=10&ie=utf-8&c=1"
+EXT_PATH = "/?qt=ext&uid={}&l=18&ext_ver=new"
+
+TIMEOUT = 10
+MAX_RETRIES = 3
 
-def search_place(keyword):
+# parallel: 三种搜索策略与各结果的 qt=ext 查询同时进行，按优先级取第一个面数据
+# serial:   与原来相同，逐个策略、逐个结果查询
+MODE = "parallel"
+# 所有线程共享一个令牌桶，合计每秒不超过 RATE 个请求。
+# 并行模式会提前查询优先级较低的结果，请求数多于串行；响应延迟是瓶颈时更快，
+# 限速是瓶颈时 (RATE x 响应时间 < 1) 用较少的线程或 --mode serial
+WORKERS = 4
+RATE = 2.0
+BURST = 2
+# 每次搜索最多检查的结果数 (与 rn=10 一致)
+MAX_RESULTS = 10
+
+# uid -> geo 持久化缓存：重新运行、不同学校共享同一校区时不再重复请求
+UID_CACHE_PATH = os.path.join(data_raw_dir, "uid_geo_cache.sqlite")
+
+def strategy_keywords(name):
+    """
+    智能抓取策略 (按优先级)：
+    1. 搜原名
+    2. 搜 "原名+校区"：很多大学的主词条没边界，但 'xx大学xx校区' 有边界
+    3. 搜 "原名+广州"：有些学校名字比较短，或者需要具体到城市
+    """
+    return [name, name + "校区", name + "广州"]
+
+def search_place(client, keyword, base_url=BASE_URL, cancelled=None):
     """搜索地点，返回结果列表"""
-    encoded_kw = quote(keyword)
-    url = SEARCH_URL.format(encoded_kw)
+    url = base_url + SEARCH_PATH.format(quote(keyword))
     try:
-        # 随机延迟，避免触发反爬
-        time.sleep(random.uniform(0.8, 1.5))
-        r = requests.get(url, headers=HEADERS, timeout=10)
-        
+        r = client.get(url, headers=HEADERS, timeout=TIMEOUT, cancelled=cancelled)
+        if r is None:
+            return []
+
         # 检查是否被百度拦截
         if "反爬" in r.text or r.status_code == 403:
             print(f" 警告：可能触发了验证码，建议更新 Cookie 或在浏览器访问一次 map.baidu.com")
             return []
-            
+
         data = r.json()
         content = data.get("content", [])
         return content if isinstance(content, list) else []
@@ -42,19 +83,31 @@ def search_place(keyword):
         print(f" 搜索请求异常: {e}")
         return []
 
-def fetch_geo(uid):
-    """根据 UID 获取 geo 字符串"""
-    url = EXT_URL.format(uid)
+def fetch_geo(client, uid, base_url=BASE_URL, cancelled=None):
+    """根据 UID 获取 geo 字符串，返回 (是否成功, geo)；请求被取消时视为不成功"""
+    url = base_url + EXT_PATH.format(uid)
     try:
-        r = requests.get(url, headers=HEADERS, timeout=10)
+        r = client.get(url, headers=HEADERS, timeout=TIMEOUT, cancelled=cancelled)
+        if r is None:
+            return False, None
         data = r.json()
         content = data.get("content")
         if isinstance(content, dict):
-            return content.get("geo")
-        return None
+            return True, content.get("geo")
+        return True, None
     except Exception as e:
         print(f" 获取 geo 异常: {e}")
-        return None
+        return False, None
+
+def lookup_geo(client, cache, uid, base_url=BASE_URL, cancelled=None):
+    """先查 uid 缓存，未命中再请求；没有几何的 uid 也缓存，请求失败 / 取消的不缓存"""
+    hit, geo = cache.get(uid)
+    if hit:
+        return geo
+    ok, geo = fetch_geo(client, uid, base_url, cancelled)
+    if ok:
+        cache.put(uid, geo)
+    return geo
 
 def is_polygon(geo_str):
     """
@@ -68,104 +121,225 @@ def is_polygon(geo_str):
     # 如果长度非常长 (>100)，也大概率是面
     return ";" in geo_str and len(geo_str) > 100
 
-def find_best_geo_in_results(results, strict_polygon=True):
+def result_uids(results):
+    """搜索结果中前 MAX_RESULTS 个带 uid 的 [(uid, name), ...]"""
+    return [(item.get("uid"), item.get("name")) for item in results[:MAX_RESULTS] if item.get("uid")]
+
+def find_best_geo_in_results(client, cache, results, base_url=BASE_URL):
     """
     在搜索结果列表中寻找最佳的 geo 数据。
-    strict_polygon=True 表示只接受面数据（有边界的），忽略单纯的点。
+    只接受面数据（有边界的），忽略单纯的点。
     """
-    for i, item in enumerate(results):
-        uid = item.get("uid")
-        name = item.get("name")
-        
-        if not uid: continue
-        
-        geo = fetch_geo(uid)
-        
+    for i, (uid, name) in enumerate(result_uids(results)):
+        geo = lookup_geo(client, cache, uid, base_url)
+
         # 判断是否为面数据
-        if geo and is_polygon(geo):
+        if is_polygon(geo):
             print(f"    found polygon at result #{i+1}: {name}")
             return uid, geo
-            
+
     return None, None
 
-def fetch_university_geo_smart(name):
-    """
-    智能抓取策略：
-    1. 搜原名 -> 遍历前10个结果找面数据
-    2. 搜 "原名+校区" -> 遍历找面数据
-    3. 搜 "原名+广州" -> 遍历找面数据
-    """
-    
-    # --- 策略 1: 直接搜索原名 ---
-    # print(f"尝试策略1: 搜索 '{name}'")
-    results = search_place(name)
-    uid, geo = find_best_geo_in_results(results)
-    if uid: return uid, geo
-
-    # --- 策略 2: 尝试添加 '校区' (针对大学) ---
-    # 很多大学的主词条没边界，但 'xx大学xx校区' 有边界
-    keyword_2 = name + "校区"
-    print(f"未找到，尝试策略2: 搜索 '{keyword_2}'")
-    results = search_place(keyword_2)
-    uid, geo = find_best_geo_in_results(results)
-    if uid: return uid, geo
-    
-    # --- 策略 3: 尝试添加 '学院' 或 '广州' (针对职业技术学院) ---
-    # 有些学校名字比较短，或者需要具体到城市
-    keyword_3 = name + "广州"
-    print(f"未找到，尝试策略3: 搜索 '{keyword_3}'")
-    results = search_place(keyword_3)
-    uid, geo = find_best_geo_in_results(results)
-    if uid: return uid, geo
-
-    # --- 兜底: 如果只要是点也行，可以在这里放宽限制 ---
+def fetch_university_geo_smart(client, cache, name, base_url=BASE_URL):
+    """串行版本：依次尝试各策略，每个策略遍历前10个结果找面数据"""
+    for s, keyword in enumerate(strategy_keywords(name)):
+        if s > 0:
+            print(f"未找到，尝试策略{s+1}: 搜索 '{keyword}'")
+        uid, geo = find_best_geo_in_results(client, cache, search_place(client, keyword, base_url), base_url)
+        if uid: return uid, geo
+
     # 目前保持严格，只返回有边界的数据
     return None, None
 
-def main():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(os.path.dirname(current_dir))
-    data_raw_dir = os.path.join(project_root, 'data', 'raw')
+class SearchState:
+    """
+    一所学校并行搜索的共享状态：已找到的最高优先级 (策略序号, 结果序号)。
+    优先级更低的任务开始执行前、以及等到令牌后各检查一次，直接跳过，不再发请求。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._best = None
+
+    def found(self, priority):
+        with self._lock:
+            if self._best is None or priority < self._best:
+                self._best = priority
 
-    # 输入文件 
-    input_path = os.path.join(data_raw_dir, "University Name.csv")
-    # 输出文件
-    output_path = os.path.join(data_raw_dir, "university_geo.csv")
+    def obsolete(self, priority):
+        with self._lock:
+            return self._best is not None and self._best < priority
+
+    def close(self):
+        """结果已确定，尚未开始的任务全部跳过"""
+        self.found((-1, -1))
+
+def _search_task(state, client, keyword, s, base_url):
+    cancelled = lambda: state.obsolete((s, -1))
+    if cancelled():
+        return []
+    return search_place(client, keyword, base_url, cancelled)
+
+def _lookup_task(state, client, cache, uid, s, i, base_url):
+    cancelled = lambda: state.obsolete((s, i))
+    if cancelled():
+        return None
+    geo = lookup_geo(client, cache, uid, base_url, cancelled)
+    if is_polygon(geo):
+        state.found((s, i))
+    return geo
+
+def _decide(n_strategies, result_counts, resolved):
+    """
+    按优先级检查已完成的结果：返回 (是否已确定, 优先级, uid, geo)。
+    只有优先级更高的查询全部完成且都不是面数据时，才能确定当前的面数据，
+    因此结果与串行版本一致。
+    """
+    for s in range(n_strategies):
+        if s not in result_counts:
+            return False, None, None, None
+        for i in range(result_counts[s]):
+            if (s, i) not in resolved:
+                return False, None, None, None
+            uid, geo = resolved[(s, i)]
+            if geo:
+                return True, (s, i), uid, geo
+    return True, None, None, None
+
+def fetch_university_geo_parallel(pool, client, cache, name, base_url=BASE_URL, max_in_flight=WORKERS):
+    """
+    并行版本：三种策略的搜索同时提交，每个搜索返回后其结果的 qt=ext 查询进入待办队列。
+    待办按优先级出队，同时进行的任务不超过 max_in_flight 个，使令牌先用在优先级高的查询上。
+    一旦按优先级确定了面数据，取消尚未开始的任务，正在等待令牌的任务也会跳过请求。
+    """
+    keywords = strategy_keywords(name)
+    state = SearchState()
+    # 待办堆：(优先级, uid)，uid 为 None 表示搜索任务
+    todo = [((s, -1), None) for s in range(len(keywords))]
+    futures, pending = {}, set()
+    result_counts, resolved = {}, {}
+    try:
+        while todo or pending:
+            while todo and len(pending) < max_in_flight:
+                (s, i), uid = heapq.heappop(todo)
+                if uid is None:
+                    future = pool.submit(_search_task, state, client, keywords[s], s, base_url)
+                else:
+                    future = pool.submit(_lookup_task, state, client, cache, uid, s, i, base_url)
+                futures[future] = (s, i, uid)
+                pending.add(future)
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                s, i, uid = futures.pop(future)
+                if uid is None:
+                    uids = result_uids(future.result())
+                    result_counts[s] = len(uids)
+                    for i, (uid, _) in enumerate(uids):
+                        heapq.heappush(todo, ((s, i), uid))
+                else:
+                    geo = future.result()
+                    resolved[(s, i)] = (uid, geo if is_polygon(geo) else None)
+
+            decided, priority, uid, geo = _decide(len(keywords), result_counts, resolved)
+            if decided:
+                if priority:
+                    print(f"    found polygon: '{keywords[priority[0]]}' result #{priority[1]+1}")
+                return uid, geo
+        return None, None
+    finally:
+        state.close()
+        for future in pending:
+            future.cancel()
+
+def save_rows(rows, names, output_path):
+    """按名单顺序原子写出已找到边界的学校，中断时输出文件仍是完整的；返回写出的条数"""
+    records = [rows[name] for name in names if name in rows]
+    if records:
+        text = pd.DataFrame(records, columns=["name", "uid", "geo"]).to_csv(index=False)
+        atomic_write_text(output_path, text, encoding="utf-8-sig")
+    return len(records)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从百度地图抓取高校边界 (uid -> geo 持久化缓存)")
+    parser.add_argument("--mode", choices=["parallel", "serial"], default=MODE, help=f"抓取方式 (默认 {MODE})")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"并发线程数 (默认 {WORKERS})")
+    parser.add_argument("--rate", type=float, default=RATE, help=f"所有线程合计每秒请求数 (默认 {RATE})")
+    parser.add_argument("--base-url", default=BASE_URL, help="接口地址，测试时可指向本地模拟服务器")
+    parser.add_argument("--cache", default=UID_CACHE_PATH, help="uid -> geo 缓存文件")
+    parser.add_argument("--input", default=os.path.join(data_raw_dir, "University Name.csv"), help="学校名单")
+    parser.add_argument("--output", default=os.path.join(data_raw_dir, "university_geo.csv"), help="输出文件")
+    parser.add_argument("--refresh", action="store_true", help="忽略上次的进度，重新搜索所有学校")
+    parser.add_argument("--retry-missing", action="store_true", help="重新搜索上次未找到边界的学校")
+    args = parser.parse_args(argv)
+    base_url = args.base_url.rstrip('/')
 
     # 读取文件
     try:
-        df = pd.read_csv(input_path, encoding='utf-8')
+        df = pd.read_csv(args.input, encoding='utf-8')
     except:
-        df = pd.read_csv(input_path, encoding='gbk')
-
-    rows = []
-    total = len(df)
-    print(f"开始任务，共 {total} 所学校")
-
-    for index, row in df.iterrows():
-        name = str(row["University Name"]).strip()
-        print(f"[{index+1}/{total}] 正在抓取: {name} ...", end="", flush=True)
-        
-        try:
-            uid, geo = fetch_university_geo_smart(name)
-            
-            if geo:
-                rows.append({"name": name, "uid": uid, "geo": geo})
-                print(f"成功 (Geo长度: {len(geo)})")
-            else:
-                print(f"彻底未找到边界")
-            
-            # 这里的sleep稍微短一点，因为 search_place 内部已经有 sleep 了
-            # 但为了安全，还是稍微停顿一下
-            time.sleep(0.5)
-            
-        except Exception as e:
-            print(f" Error: {e}")
-
-    # 保存
-    if rows:
-        pd.DataFrame(rows).to_csv(output_path, index=False, encoding="utf-8-sig")
-        print(f"\n完成！已保存 {len(rows)} 条数据到 {output_path}")
+        df = pd.read_csv(args.input, encoding='gbk')
+    names = list(dict.fromkeys(str(name).strip() for name in df["University Name"]))
+
+    # --- 断点续传 ---
+    # 进度清单记录每所已搜索过的学校 (名称 -> uid，未找到为 "")，每所学校完成后立即写入
+    progress = Manifest(manifest_path(os.path.splitext(args.output)[0]))
+    rows = {}
+    if args.refresh:
+        progress.clear()
+    elif os.path.exists(args.output):
+        for row in pd.read_csv(args.output, encoding='utf-8-sig', dtype=str).itertuples(index=False):
+            rows[row.name] = {"name": row.name, "uid": row.uid, "geo": row.geo}
+            # 旧版本生成的输出没有进度清单，其中的学校同样视为已完成
+            progress.records.setdefault(row.name, row.uid)
+    todo = [name for name in names
+            if name not in progress.records or (args.retry_missing and not progress.records[name])]
+
+    client = PoliteSession(args.rate, burst=BURST, per_host=args.workers, max_retries=MAX_RETRIES)
+    cache = UidGeoCache(args.cache)
+    pool = ThreadPoolExecutor(max_workers=args.workers) if args.mode == "parallel" else None
+
+    total = len(todo)
+    print(f"开始任务，共 {len(names)} 所学校，其中 {len(names) - total} 所已完成，本次抓取 {total} 所 "
+          f"({args.mode}，缓存中已有 {len(cache)} 个 uid)")
+
+    start = time.perf_counter()
+    try:
+        for index, name in enumerate(todo):
+            print(f"[{index+1}/{total}] 正在抓取: {name} ...", flush=True)
+
+            try:
+                if pool:
+                    uid, geo = fetch_university_geo_parallel(pool, client, cache, name, base_url, args.workers)
+                else:
+                    uid, geo = fetch_university_geo_smart(client, cache, name, base_url)
+
+                if geo:
+                    rows[name] = {"name": name, "uid": uid, "geo": geo}
+                    save_rows(rows, names, args.output)
+                    print(f"成功 (Geo长度: {len(geo)})")
+                else:
+                    rows.pop(name, None)
+                    print(f"彻底未找到边界")
+                progress.records[name] = uid or ""
+                progress.save()
+
+            except Exception as e:
+                print(f" Error: {e}")
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        cache.close()
+
+    elapsed = time.perf_counter() - start
+    stats = client.stats
+    print(f"\n耗时 {elapsed:.1f}s，共 {stats['requests']} 次请求，重试 {stats['retries']} 次，"
+          f"取消 {stats['cancelled']} 次，限速等待累计 {stats['waited']:.1f}s")
+
+    # 保存 (只保留当前名单中的学校)
+    saved = save_rows(rows, names, args.output)
+    if saved:
+        print(f"\n完成！已保存 {saved} 条数据到 {args.output}")
     else:
         print("\n未获取到任何数据，请检查 Cookie 或网络。")
 
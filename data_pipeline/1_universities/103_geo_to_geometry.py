@@ -1,8 +1,28 @@
 import pandas as pd
+import geopandas as gpd
+import numpy as np
+import shapely
 from shapely.geometry import Polygon
 from shapely.ops import unary_union
+import argparse
+import codecs
 import re
 import os
+import sys
+import time
+
+# 引用项目根目录下的共用模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from common.geoio import write_geodata, file_size_mb
+from common.incremental import Manifest, manifest_path, read_previous, row_hashes, select, merge_outputs
+
+# 【配置区】
+# 每次从 CSV 读入的行数：geo 字符串很长，分块读取可以让内存占用保持平稳
+CHUNK_ROWS = 500
+# 判断文件编码时读取的字节数 (开头全是 ASCII 时继续往后读，直到遇到中文)
+SNIFF_BYTES = 1 << 16
+# 无效多边形的修复方式: buffer = buffer(0)，与逐行解析结果一致；make_valid = 保留自相交部分的全部面积
+REPAIR = "buffer"
 
 def parse_baidu_geo(geo_str):
     """
@@ -66,33 +86,240 @@ def parse_baidu_geo(geo_str):
         # print(f"Error parsing geo: {e}")
         return None
 
-def main():
+def split_baidu_geo(geo_values):
+    """
+    把 geo 字符串切分为坐标段，返回 (各段坐标文本, 各段所属记录下标, 各段数值个数)。
+    规则与 parse_baidu_geo 相同：取第 3 部分，按 ';' 分段，去掉首个数值前的 '1-' 前缀，
+    少于 6 个数值的段跳过
+    """
+    seg_texts, seg_records, seg_counts = [], [], []
+    for i, geo_str in enumerate(geo_values):
+        if not isinstance(geo_str, str):
+            continue
+        parts = geo_str.split('|')
+        if len(parts) < 3:
+            continue
+        for seg in parts[2].split(';'):
+            if not seg.strip():
+                continue
+            if not seg.startswith('-'):
+                dash, comma = seg.find('-'), seg.find(',')
+                if dash != -1 and (comma == -1 or dash < comma):
+                    seg = seg[dash + 1:]
+            count = seg.count(',') + 1
+            if count < 6:
+                continue
+            seg_texts.append(seg)
+            seg_records.append(i)
+            seg_counts.append(count)
+    return seg_texts, np.array(seg_records, dtype=np.intp), np.array(seg_counts, dtype=np.intp)
+
+
+def parse_segments(seg_texts):
+    """所有段一次转换为 float64 数组；有无法解析的数值时逐段重试，返回 (数值, 各段是否有效)"""
+    ok = np.ones(len(seg_texts), dtype=bool)
+    if not seg_texts:
+        return np.empty(0), ok
+    try:
+        return np.array(','.join(seg_texts).split(','), dtype='float64'), ok
+    except ValueError:
+        values = []
+        for j, seg in enumerate(seg_texts):
+            try:
+                values.append(np.array(seg.split(','), dtype='float64'))
+            except ValueError:
+                ok[j] = False
+        return (np.concatenate(values) if values else np.empty(0)), ok
+
+
+def repair_polygons(polys, repair=REPAIR):
+    invalid = ~shapely.is_valid(polys)
+    if invalid.any():
+        if repair == "make_valid":
+            fixed = shapely.make_valid(polys[invalid])
+            # make_valid 可能返回带线段的 GeometryCollection，只保留面
+            parts, owner = shapely.get_parts(fixed, return_index=True)
+            polygonal = np.isin(shapely.get_type_id(parts), (3, 6))
+            fixed = np.array([shapely.union_all(parts[polygonal & (owner == k)]) for k in range(len(fixed))],
+                             dtype=object)
+        else:
+            fixed = shapely.buffer(polys[invalid], 0)
+        polys = polys.copy()
+        polys[invalid] = fixed
+    return polys
+
+
+def parse_baidu_geo_bulk(geo_values, repair=REPAIR, timings=None):
+    """
+    parse_baidu_geo 的批量版本：整批字符串一次解析为 numpy 坐标数组，
+    用 shapely.linearrings / shapely.polygons 批量构造多边形。返回与输入等长的几何数组 (失败为 None)。
+    timings 为 dict 时累加各阶段耗时 (秒)。
+    """
+    timings = timings if timings is not None else {}
+    n = len(geo_values)
+    result = np.full(n, None, dtype=object)
+
+    def lap(stage, start):
+        now = time.perf_counter()
+        timings[stage] = timings.get(stage, 0.0) + now - start
+        return now
+
+    t = time.perf_counter()
+    seg_texts, seg_records, seg_counts = split_baidu_geo(list(geo_values))
+    t = lap("split", t)
+
+    values, ok = parse_segments(seg_texts)
+    seg_records, seg_counts = seg_records[ok], seg_counts[ok]
+    t = lap("parse", t)
+    if len(seg_records) == 0:
+        return result
+
+    # 奇数个数值的段丢弃最后一个 (该数值仍需能解析，与逐行版本一致)
+    odd = seg_counts % 2 == 1
+    if odd.any():
+        drop = np.zeros(len(values), dtype=bool)
+        drop[np.cumsum(seg_counts)[odd] - 1] = True
+        values = values[~drop]
+    coords = values.reshape(-1, 2)
+    npts = seg_counts // 2
+    starts = np.concatenate(([0], np.cumsum(npts)[:-1]))
+    # 首尾相同的 3 点段闭合后不足 4 个点，Polygon() 会报错，逐行版本整条记录返回 None
+    closed = (coords[starts] == coords[starts + npts - 1]).all(axis=1)
+    bad = npts + ~closed < 4
+    failed = np.zeros(n, dtype=bool)
+    failed[seg_records[bad]] = True
+    keep = ~failed[seg_records]
+    if not keep.any():
+        return result
+
+    point_keep = np.repeat(keep, npts)
+    ring_index = np.repeat(np.arange(keep.sum()), npts[keep])
+    polys = shapely.polygons(shapely.linearrings(coords[point_keep], indices=ring_index))
+    poly_records = seg_records[keep]
+    t = lap("build", t)
+
+    polys = repair_polygons(polys, repair)
+    nonempty = ~shapely.is_empty(polys)
+    polys, poly_records = polys[nonempty], poly_records[nonempty]
+    t = lap("repair", t)
+
+    # 同一记录的多个多边形 (如南北校区) 合并；poly_records 为升序
+    bounds = np.flatnonzero(np.r_[True, poly_records[1:] != poly_records[:-1], True])
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        result[poly_records[a]] = shapely.union_all(polys[a:b])
+    lap("union", t)
+    return result
+
+
+def detect_encoding(path, sniff_bytes=SNIFF_BYTES):
+    """读文件开头一段判断是否为 UTF-8，不是则按 GBK 读取；不必为判断编码把整个文件多读一遍"""
+    with open(path, 'rb') as f:
+        sample = f.read(sniff_bytes)
+        # 表头与 geo 坐标都是 ASCII，读到第一个非 ASCII 字节 (学校名称) 所在的块为止
+        while sample.isascii():
+            block = f.read(sniff_bytes)
+            if not block:
+                break
+            sample += block
+    try:
+        # final=False：样本末尾被截断的多字节字符不算错误
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'gbk'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="解析百度 geo 字符串为 BD09MC 几何")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="每次读入的 CSV 行数")
+    parser.add_argument("--repair", choices=["buffer", "make_valid"], default=REPAIR, help="无效多边形的修复方式")
+    parser.add_argument("--legacy", action="store_true", help="使用逐行 parse_baidu_geo 解析 (对比用)")
+    parser.add_argument("--full", action="store_true", help="忽略清单，全部重新解析")
+    args = parser.parse_args(argv)
+
     current_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(os.path.dirname(current_dir))
     data_raw_dir = os.path.join(project_root, 'data', 'raw')
 
     input_csv = os.path.join(data_raw_dir, "university_geo.csv")
-    output_pkl = os.path.join(data_raw_dir, "university_bd09mc.pkl")
+    # 输出为 GeoParquet (university_bd09mc.parquet)，几何仍是百度墨卡托坐标
+    output_base = os.path.join(data_raw_dir, "university_bd09mc")
+
+    # 增量：只解析 (名称, uid, geo) 有变化的学校，其余沿用上次的输出
+    manifest = Manifest(manifest_path(output_base), {"repair": args.repair, "legacy": args.legacy})
+    previous = read_previous(output_base, args.full)
+    if previous is None:
+        manifest.clear()
 
     print(f"Reading {input_csv}...")
-    try:
-        df = pd.read_csv(input_csv, encoding='utf-8')
-    except UnicodeDecodeError:
-        df = pd.read_csv(input_csv, encoding='gbk')
-    
-    if 'geo' not in df.columns:
-        print("Error: 'geo' column not found in CSV.")
-        return
+    encoding = detect_encoding(input_csv)
+    timings = {}
+    # 同一学校的行可能跨块 (或不相邻)，内容哈希按整组累积，不能逐块覆盖
+    digests = {}
+    changed_keys = None
+    if manifest.records:
+        # 增量：先只计算哈希 (不解析)，确定变化的学校后再流式解析这些学校
+        t = time.perf_counter()
+        for chunk in pd.read_csv(input_csv, encoding=encoding, chunksize=args.chunk_rows):
+            if 'geo' not in chunk.columns:
+                print("Error: 'geo' column not found in CSV.")
+                return
+            row_hashes(chunk, digests=digests)
+        timings["hash"] = time.perf_counter() - t
+        hashes = {k: h.hexdigest() for k, h in digests.items()}
+        changed_keys = set(manifest.changed(hashes))
+        if not changed_keys and not manifest.removed(hashes):
+            print(f"{len(hashes)} 所学校均无变化，跳过。")
+            return
 
-    print("Parsing geometries...")
-    df['geometry'] = df['geo'].apply(parse_baidu_geo)
-    
-    # Filter valid results
-    valid_df = df[df['geometry'].notnull()].copy()
-    print(f"Successfully parsed {len(valid_df)} out of {len(df)} records.")
+    total, frames = 0, []
+    t = time.perf_counter()
+    for chunk in pd.read_csv(input_csv, encoding=encoding, chunksize=args.chunk_rows):
+        timings["read"] = timings.get("read", 0.0) + time.perf_counter() - t
+        if 'geo' not in chunk.columns:
+            print("Error: 'geo' column not found in CSV.")
+            return
+
+        total += len(chunk)
+        if changed_keys is None:
+            # 全量：没有可比较的清单，解析全部记录，顺便累积哈希
+            row_hashes(chunk, digests=digests)
+        else:
+            chunk = select(chunk, changed_keys)
+        chunk = chunk.copy()
+        if len(chunk) == 0:
+            t = time.perf_counter()
+            continue
+
+        if args.legacy:
+            start = time.perf_counter()
+            chunk['geometry'] = chunk['geo'].apply(parse_baidu_geo)
+            timings["legacy"] = timings.get("legacy", 0.0) + time.perf_counter() - start
+        else:
+            chunk['geometry'] = parse_baidu_geo_bulk(chunk['geo'].to_numpy(), args.repair, timings)
+
+        # Filter valid results
+        # 原始 geo 字符串已解析为几何，在这里就丢弃，不随各块一起累积到最后
+        frames.append(chunk.loc[chunk['geometry'].notnull()].drop(columns=['geo']))
+        t = time.perf_counter()
+
+    if changed_keys is None:
+        hashes = {k: h.hexdigest() for k, h in digests.items()}
+    changed, removed = manifest.changed(hashes), manifest.removed(hashes)
+
+    valid_df = pd.concat(frames) if frames else pd.DataFrame(columns=['name', 'geometry'])
+    frames.clear()
+    print(f"Successfully parsed {len(valid_df)} out of {len(changed)} changed records ({total} in total, "
+          f"{len(removed)} removed).")
+    print("各阶段耗时: " + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in timings.items()))
     
-    print(f"Saving to {output_pkl}...")
-    valid_df.to_pickle(output_pkl)
+    processed = gpd.GeoDataFrame(valid_df, geometry='geometry')
+    gdf = merge_outputs(previous, processed, changed + removed, list(hashes))
+    start = time.perf_counter()
+    written = write_geodata(gdf, output_base)
+    manifest.save(hashes)
+    print(f"Saved {', '.join(written)} ({len(gdf)} records, {file_size_mb(written):.2f} MB, "
+          f"{time.perf_counter() - start:.2f}s)")
     print("Done.")
 
 if __name__ == "__main__":
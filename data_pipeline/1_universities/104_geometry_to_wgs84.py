@@ -1,144 +1,144 @@
 import geopandas as gpd
-import pandas as pd
-from shapely.ops import transform
-import math
+import numpy as np
+import shapely
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import argparse
 import os
+import sys
+import time
+
+# 引用项目根目录下的共用模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# 坐标转换算法：BD09MC -> BD09 -> GCJ02 -> WGS84 (与 204 共用)
+from common.coords import transform_geometries
+from common.geoio import read_geodata, write_geodata, existing_path, file_size_mb
+from common.incremental import Manifest, manifest_path, read_previous, row_hashes, select, merge_outputs
+
+# 【配置区】
+# 并行转换的进程数 (1 表示在当前进程内完成) 与每个任务包含的要素数，可用命令行参数覆盖
+WORKERS = 1
+CHUNK_SIZE = 200
+# GCJ02 -> WGS84 的计算方式: formula = 一次近似的解析公式 (与历史数据一致，误差约 1~2 米)；
+# grid = 广州市范围内对同一公式预计算的偏移网格插值 (更快，与 formula 相差厘米级)。
+# 两者都不是 common.coords 中 exact=True 的迭代求逆
+GCJ_MODE = "formula"
+GRID_RESOLUTION = 0.005
+
+# 子进程内按路径缓存已加载的偏移网格 (内存映射，加载开销很小)
+_grids = {}
+
+
+def load_grid(grid_path):
+    if grid_path is None:
+        return None
+    if grid_path not in _grids:
+        from common.gcj02_grid import Gcj02Grid
+        _grids[grid_path] = Gcj02Grid.load(grid_path)
+    return _grids[grid_path]
 
-# 坐标转换算法模块
-# 包含：BD09MC -> BD09 -> GCJ02 -> WGS84
-x_pi = 3.14159265358979324 * 3000.0 / 180.0
-pi = math.pi
-a = 6378245.0
-es = 0.00669342162296594323
-
-# 百度墨卡托转经纬度所需的系数表
-MCBAND = [12890594.86, 8362377.87, 5591021, 3481989.83, 1678043.12, 0]
-MC2LL = [
-    [1.410526172116255e-8, 0.00000898305509648872, -1.9939833816331, 200.9824383106796, -187.2403703815547, 91.6087516669843, -23.38765649603339, 2.57121317296198, -0.03801003308653, 17337981.2],
-    [-7.435856389565537e-9, 0.000008983055097726239, -0.78625201886289, 96.32687599759846, -1.85204757529826, -59.36935905485877, 47.40033549296737, -16.50741931063887, 2.28786674699375, 10260144.86],
-    [-3.030883460898826e-8, 0.00000898305509983578, 0.30071316287616, 59.74293618442277, 7.357984074871, -25.38371002664745, 13.45380521110908, -3.29883767235584, 0.32710905363475, 6856817.37],
-    [-1.981981304930552e-8, 0.000008983055099779535, 0.03278182852591, 40.31678527705744, 0.65659298677277, -4.44255534477492, 0.85341911805263, 0.12923347998204, -0.04625736007561, 4482777.06],
-    [3.09191371068437e-9, 0.000008983055096812155, 0.00006995724062, 23.10934304144901, -0.00023663490511, -0.6321817810242, -0.00663494467273, 0.03430082397953, -0.00466043876332, 2555164.4],
-    [2.890871144776878e-9, 0.000008983055095805407, -3.068298e-8, 7.47137025468032, -0.00000353937994, -0.02145144861037, -0.00001234426596, 0.00010322952773, -0.00000323890364, 826088.5]
-]
-
-def bdmc_to_bdll(x, y):
-    """百度墨卡托 -> 百度经纬度"""
-    abs_x, abs_y = abs(x), abs(y)
-    cf = None
-    for i in range(len(MCBAND)):
-        if abs_y >= MCBAND[i]:
-            cf = MC2LL[i]
-            break
-    if cf is None: return x, y # Fallback or Error
-    
-    lon = cf[0] + cf[1] * abs_x
-    cc = abs_y / cf[9]
-    lat = cf[2] + cf[3]*cc + cf[4]*cc**2 + cf[5]*cc**3 + cf[6]*cc**4 + cf[7]*cc**5 + cf[8]*cc**6
-    
-    if x < 0: lon = -lon
-    if y < 0: lat = -lat
-    return lon, lat
-
-def BD09_to_GCJ02(bd_lng, bd_lat):
-    """百度经纬度 -> GCJ02"""
-    x = bd_lng - 0.0065
-    y = bd_lat - 0.006
-    z = math.sqrt(x * x + y * y) - 0.00002 * math.sin(y * x_pi)
-    theta = math.atan2(y, x) - 0.000003 * math.cos(x * x_pi)
-    gcj_lng = z * math.cos(theta)
-    gcj_lat = z * math.sin(theta)
-    return gcj_lng, gcj_lat
-
-def _transformlat(lng, lat):
-    ret = -100.0 + 2.0 * lng + 3.0 * lat + 0.2 * lat * lat + 0.1 * lng * lat + 0.2 * math.sqrt(math.fabs(lng))
-    ret += (20.0 * math.sin(6.0 * lng * pi) + 20.0 * math.sin(2.0 * lng * pi)) * 2.0 / 3.0
-    ret += (20.0 * math.sin(lat * pi) + 40.0 * math.sin(lat / 3.0 * pi)) * 2.0 / 3.0
-    ret += (160.0 * math.sin(lat / 12.0 * pi) + 320 * math.sin(lat * pi / 30.0)) * 2.0 / 3.0
-    return ret
-
-def _transformlng(lng, lat):
-    ret = 300.0 + lng + 2.0 * lat + 0.1 * lng * lng + 0.1 * lng * lat + 0.1 * math.sqrt(math.fabs(lng))
-    ret += (20.0 * math.sin(6.0 * lng * pi) + 20.0 * math.sin(2.0 * lng * pi)) * 2.0 / 3.0
-    ret += (20.0 * math.sin(lng * pi) + 40.0 * math.sin(lng / 3.0 * pi)) * 2.0 / 3.0
-    ret += (150.0 * math.sin(lng / 12.0 * pi) + 300.0 * math.sin(lng / 30.0 * pi)) * 2.0 / 3.0
-    return ret
-
-def GCJ02_to_WGS84(gcj_lng, gcj_lat):
-    """GCJ02 -> WGS84"""
-    dlat = _transformlat(gcj_lng - 105.0, gcj_lat - 35.0)
-    dlng = _transformlng(gcj_lng - 105.0, gcj_lat - 35.0)
-    radlat = gcj_lat / 180.0 * pi
-    magic = math.sin(radlat)
-    magic = 1 - es * magic * magic
-    sqrtmagic = math.sqrt(magic)
-    dlat = (dlat * 180.0) / ((a * (1 - es)) / (magic * sqrtmagic) * pi)
-    dlng = (dlng * 180.0) / (a / sqrtmagic * math.cos(radlat) * pi)
-    mglat = gcj_lat + dlat
-    mglng = gcj_lng + dlng
-    lng = gcj_lng * 2 - mglng
-    lat = gcj_lat * 2 - mglat
-    return lng, lat
-
-def transform_point_logic(x, y, z=None):
-    """
-    组合变换函数: BD09MC -> BD09 -> GCJ02 -> WGS84
-    """
-    # 1. 墨卡托 -> 百度经纬度
-    lon_bd, lat_bd = bdmc_to_bdll(x, y)
-    # 2. 百度经纬度 -> GCJ02
-    lon_gcj, lat_gcj = BD09_to_GCJ02(lon_bd, lat_bd)
-    # 3. GCJ02 -> WGS84
-    lon_wgs, lat_wgs = GCJ02_to_WGS84(lon_gcj, lat_gcj)
-    
-    if z is not None:
-        return lon_wgs, lat_wgs, z
-    return lon_wgs, lat_wgs
 
-def main():
+def transform_wkb_chunk(wkb_chunk, grid_path=None):
+    """子进程任务：WKB -> 几何 -> 坐标转换 -> WKB。WKB 按原始 double 存储，往返不损失精度"""
+    geoms = shapely.from_wkb(wkb_chunk)
+    return shapely.to_wkb(transform_geometries(geoms, "bd09mc", "wgs84", grid=load_grid(grid_path)))
+
+
+def transform_parallel(geoms, workers, chunk_size, grid_path=None):
+    """按 chunk_size 分块后交给进程池转换，按原顺序拼回"""
+    wkb = shapely.to_wkb(geoms)
+    chunks = [wkb[i:i + chunk_size] for i in range(0, len(wkb), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(partial(transform_wkb_chunk, grid_path=grid_path), chunks))
+    return shapely.from_wkb(np.concatenate(results)) if results else geoms[:0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="高校边界坐标转换 BD09MC -> WGS84")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="并行进程数，1 为单进程")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="每个任务包含的要素数")
+    parser.add_argument("--verify", action="store_true", help="并行模式下同时单进程转换一次，确认结果完全相同")
+    parser.add_argument("--gcj-mode", choices=["formula", "grid"], default=GCJ_MODE,
+                        help="GCJ02 -> WGS84: formula 一次近似的解析公式 / grid 同一公式的偏移网格插值")
+    parser.add_argument("--grid-resolution", type=float, default=GRID_RESOLUTION, help="偏移网格分辨率 (度)")
+    parser.add_argument("--legacy-shp", action="store_true", help="另外导出 Shapefile (university_wgs84.shp)")
+    parser.add_argument("--full", action="store_true", help="忽略清单，全部重新转换")
+    args = parser.parse_args(argv)
+
     current_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(os.path.dirname(current_dir))
     data_raw_dir = os.path.join(project_root, 'data', 'raw')
     output_dir = os.path.join(project_root, 'data', 'raw')
+    grid_path = os.path.join(project_root, 'data', 'processed', 'gcj02_offset_grid')
 
-    input_path = os.path.join(data_raw_dir, "university_bd09mc.pkl")
-    output_path = os.path.join(output_dir, "university_wgs84.shp")
+    # 不带扩展名：优先 GeoParquet，兼容旧的 .pkl
+    input_base = os.path.join(data_raw_dir, "university_bd09mc")
+    output_base = os.path.join(output_dir, "university_wgs84")
     
-    if not os.path.exists(input_path):
-        print(f"找不到输入文件: {input_path}")
-        print("   请先运行 03_geo_to_geometry.py 生成该文件")
+    input_path = existing_path(input_base)
+    if input_path is None:
+        print(f"找不到输入文件: {input_base}.parquet")
+        print("   请先运行 103_geo_to_geometry.py 生成该文件")
         return
 
     print(f"Loading data: {input_path}")
-    df = pd.read_pickle(input_path)
+    gdf = read_geodata(input_base)
     
-    # 转换为 GeoDataFrame
     # 注意：EPSG:3857 只是一个占位符，用来告诉 geopandas 这是投影坐标，
     # 实际上它是百度特有的投影，我们马上就会手动 transform 掉它
-    gdf = gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:3857")
+    gdf = gdf.set_crs("EPSG:3857", allow_override=True)
+
+    # 增量：只转换几何或属性有变化的学校，其余沿用上次的输出
+    manifest = Manifest(manifest_path(output_base), {
+        "gcj_mode": args.gcj_mode,
+        "grid_resolution": args.grid_resolution if args.gcj_mode == "grid" else None,
+    })
+    previous = read_previous(output_base, args.full)
+    if previous is None:
+        manifest.clear()
+    hashes = row_hashes(gdf)
+    changed, removed = manifest.changed(hashes), manifest.removed(hashes)
+    if previous is not None and not changed and not removed and not args.legacy_shp:
+        print(f"{len(gdf)} 条记录均无变化，跳过。")
+        return
+    gdf = select(gdf, changed).copy()
 
-    print(f"Transforming coordinates for {len(gdf)} features...")
+    print(f"Transforming coordinates for {len(gdf)} changed features ({len(hashes)} in total, {len(removed)} removed)...")
     print("Step: BD09MC -> BD09 -> GCJ02 -> WGS84")
     
-    # 使用 shapely 的 transform 对 geometry 列的所有点进行各种数学变换
-    gdf["geometry"] = gdf["geometry"].apply(
-        lambda g: transform(transform_point_logic, g)
-    )
+    grid = None
+    if args.gcj_mode == "grid":
+        from common.gcj02_grid import ensure_grid
+        grid, built = ensure_grid(grid_path, os.path.join(data_raw_dir, '广州市.shp'), args.grid_resolution)
+        print(f"{'已生成' if built else '使用'}偏移网格 {grid_path}.npy，插值最大误差 {grid.meta['error']['max_m']:.4f} 米")
+    else:
+        grid_path = None
+
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    start = time.perf_counter()
+    if args.workers > 1 and len(geoms) > args.chunk_size:
+        print(f"并行转换: {args.workers} 个进程，每块 {args.chunk_size} 个要素")
+        result = transform_parallel(geoms, args.workers, args.chunk_size, grid_path)
+        if args.verify:
+            serial = transform_geometries(geoms, "bd09mc", "wgs84", grid=grid)
+            if not (shapely.to_wkb(serial) == shapely.to_wkb(result)).all():
+                raise RuntimeError("并行转换结果与单进程不一致")
+            print("校验通过：与单进程结果完全相同")
+    else:
+        # 所有要素的顶点一次取出、按数组整体转换后写回
+        result = transform_geometries(geoms, "bd09mc", "wgs84", grid=grid)
+    print(f"转换耗时 {time.perf_counter() - start:.2f} 秒")
+    gdf["geometry"] = gpd.GeoSeries(result, index=gdf.index)
 
     # 转换完成后，坐标系就是 WGS84 (EPSG:4326) 了
     gdf = gdf.set_crs("EPSG:4326", allow_override=True)
+    gdf = merge_outputs(previous, gdf, changed + removed, list(hashes))
     
-    print(f"Saving Shapefile to: {output_path}")
-    # Shapefile 字段名有截断风险，确保没有超长字段名
-    try:
-        gdf.to_file(output_path, encoding='utf-8')
-        print("转换成功！Shapefile 已保存。")
-    except Exception as e:
-        print(f"保存失败: {e}")
-        # 如果 shp 保存失败，尝试保存为 GeoJSON
-        json_path = output_path.replace(".shp", ".geojson")
-        gdf.to_file(json_path, driver='GeoJSON')
-        print(f"已备份保存为 GeoJSON: {json_path}")
+    print(f"Saving GeoParquet to: {output_base}.parquet")
+    start = time.perf_counter()
+    written = write_geodata(gdf, output_base, legacy_shp=args.legacy_shp)
+    manifest.save(hashes)
+    print(f"转换成功！已保存 {', '.join(written)} ({file_size_mb(written):.2f} MB, {time.perf_counter() - start:.2f}s)")
 
 if __name__ == "__main__":
     main()
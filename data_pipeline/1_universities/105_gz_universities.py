@@ -1,7 +1,28 @@
 import geopandas as gpd
+import argparse
 import os
+import sys
+import time
+
+# 引用项目根目录下的共用模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from common.geoio import read_geodata, write_geodata, existing_path, file_size_mb
+from common.clip import clip_gdf, CHUNK_SIZE
+from common.boundary import load_boundary
+from common.incremental import Manifest, manifest_path, file_hash, read_previous, row_hashes, select, merge_outputs
+
+# 【配置区】
+# fast: STRtree 包围盒预筛 + 预处理多边形分块判断；gpd: 原来的 gpd.clip
+CLIP_MODE = "fast"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按广州市边界裁剪")
+    parser.add_argument("--legacy-shp", action="store_true", help="另外导出 Shapefile (Gz_university.shp)")
+    parser.add_argument("--clip-mode", choices=("fast", "gpd"), default=CLIP_MODE, help=f"裁剪方式 (默认 {CLIP_MODE})")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help=f"fast 模式每块要素数 (默认 {CHUNK_SIZE})")
+    parser.add_argument("--full", action="store_true", help="忽略清单，全部重新裁剪")
+    args = parser.parse_args(argv)
 
-def main():
     # 1. 设定相对路径
     # 当前脚本所在目录: .../data_pipeline/1_universities
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,26 +38,45 @@ def main():
     # 2. 定义文件路径
     # 假设 '广州市.shp' 也在 data/raw 目录下，如果不是请修改此处
     gz_boundary_path = os.path.join(input_dir, '广州市.shp')
-    university_path = os.path.join(input_dir, 'university_wgs84.shp')
-    output_path = os.path.join(output_dir, 'Gz_university.shp')
+    # 中间数据不带扩展名：优先 GeoParquet，兼容旧的 Shapefile
+    university_base = os.path.join(input_dir, 'university_wgs84')
+    output_base = os.path.join(output_dir, 'Gz_university')
 
     print(f"工作目录设定:")
     print(f"输入目录: {input_dir}")
     print(f"输出目录: {output_dir}")
 
     # 3. 读取数据
-    if not os.path.exists(gz_boundary_path) or not os.path.exists(university_path):
+    if not os.path.exists(gz_boundary_path) or existing_path(university_base) is None:
         print("错误：找不到输入文件，请检查文件是否在 data/raw 目录下。")
         return
 
-    print("正在读取 Shapefile...")
+    print("正在读取数据...")
     try:
-        gdf_gz = gpd.read_file(gz_boundary_path)
-        gdf_uni = gpd.read_file(university_path)
+        gdf_gz = load_boundary(gz_boundary_path)
+        start = time.perf_counter()
+        gdf_uni = read_geodata(university_base)
+        print(f"读取 {len(gdf_uni)} 条数据，耗时 {time.perf_counter() - start:.2f}s")
     except Exception as e:
         print(f"读取失败: {e}")
         return
 
+    # 增量：只裁剪有变化的学校；边界文件或裁剪方式变化时全部重新裁剪
+    manifest = Manifest(manifest_path(output_base), {
+        "clip_mode": args.clip_mode,
+        "boundary": [file_hash(os.path.splitext(gz_boundary_path)[0] + ext) for ext in (".shp", ".dbf", ".prj")],
+    })
+    previous = read_previous(output_base, args.full)
+    if previous is None:
+        manifest.clear()
+    hashes = row_hashes(gdf_uni)
+    changed, removed = manifest.changed(hashes), manifest.removed(hashes)
+    if previous is not None and not changed and not removed and not args.legacy_shp:
+        print(f"{len(gdf_uni)} 条记录均无变化，跳过。")
+        return
+    gdf_uni = select(gdf_uni, changed)
+    print(f"本次裁剪 {len(gdf_uni)} 条 (共 {len(hashes)} 条，删除 {len(removed)} 条)")
+
     # 4. 统一坐标系 (以广州市边界为准)
     target_crs = gdf_gz.crs
     print(f"目标坐标系: {target_crs}")
@@ -46,18 +86,24 @@ def main():
         gdf_uni = gdf_uni.to_crs(target_crs)
 
     # 5. 执行裁剪
-    print("正在执行掩膜/裁剪 (Clip)...")
-    # clip 函数自动保留在 gdf_gz 范围内的点
-    uni_clipped = gpd.clip(gdf_uni, gdf_gz)
+    print(f"正在执行掩膜/裁剪 (Clip, {args.clip_mode})...")
+    start = time.perf_counter()
+    # 两种方式都只保留在 gdf_gz 范围内的要素，跨越边界的多边形被裁剪
+    if args.clip_mode == "fast":
+        uni_clipped = clip_gdf(gdf_uni, gdf_gz, chunk_size=args.chunk_size)
+    else:
+        uni_clipped = gpd.clip(gdf_uni, gdf_gz)
+    print(f"裁剪耗时 {time.perf_counter() - start:.2f}s")
+    uni_clipped = merge_outputs(previous, uni_clipped, changed + removed, list(hashes))
 
     # 6. 保存结果
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    print(f"正在保存至: {output_path}")
+    print(f"正在保存至: {output_base}.parquet")
     try:
-        uni_clipped.to_file(output_path, driver='ESRI Shapefile', encoding='utf-8')
+        start = time.perf_counter()
+        written = write_geodata(uni_clipped, output_base, legacy_shp=args.legacy_shp)
+        manifest.save(hashes)
         print(f"处理完成！保留了 {len(uni_clipped)} 个大学点位。")
+        print(f"已保存 {', '.join(written)} ({file_size_mb(written):.2f} MB, {time.perf_counter() - start:.2f}s)")
     except Exception as e:
         print(f"保存失败: {e}")
 
@@ -1,8 +1,8 @@
-import geopandas as gpd
+import argparse
 from sqlalchemy import create_engine, text
-from geoalchemy2 import Geometry
 from shapely.geometry import Polygon, MultiPolygon
 import os
+import sys
 
 # 【配置区】
 DB_USER = "postgres"
@@ -16,11 +16,22 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(os.path.dirname(current_dir))
 processed_dir = os.path.join(project_root, 'data', 'processed')
 
-# 指向第5步生成的 Gz_university.shp
-INPUT_SHP = os.path.join(processed_dir, "Gz_university.shp")
+# 引用项目根目录下的共用模块
+sys.path.insert(0, project_root)
+from common.university_stats import refresh_changed_universities
+from common.dataset_version import bump_dataset_version
+from common.projected import rebuild_projected_universities
+from common.geoio import read_geodata, existing_path
+from common.bulk_load import bulk_load, upsert_rows
+from common.incremental import Manifest, manifest_path, row_hashes, select
+
+# 指向第5步生成的 Gz_university.parquet (不带扩展名，兼容旧的 .shp)
+INPUT_BASE = os.path.join(processed_dir, "Gz_university")
 
 
 TABLE_NAME = "Gz_universities"
+# 上次入库的各高校内容哈希，用于只更新变化的高校
+MANIFEST_PATH = manifest_path(os.path.join(processed_dir, TABLE_NAME))
 
 def promote_to_multi(geom):
     if geom is None: return None
@@ -30,13 +41,19 @@ def promote_to_multi(geom):
         return geom
     return geom
 
-def ingest_data_to_postgis():
+def ingest_data_to_postgis(full=False):
+    """
+    增量入库：与上次入库的清单比较，只删除 / 重新插入变化的高校；
+    表不存在、没有清单或 full=True 时全量入库。
+    清单在派生表与数据版本刷新成功后才保存，失败时下次运行会重新入库并刷新。返回是否成功
+    """
     # 使用 gbk 以便能看清中文报错
     connection_url = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?client_encoding=gbk"
     
-    if not os.path.exists(INPUT_SHP):
-        print(f"错误：找不到文件 {INPUT_SHP}")
-        return
+    input_path = existing_path(INPUT_BASE)
+    if input_path is None:
+        print(f"错误：找不到文件 {INPUT_BASE}.parquet")
+        return False
 
     try:
         engine = create_engine(connection_url)
@@ -50,33 +67,66 @@ def ingest_data_to_postgis():
             conn.execute(text("CREATE EXTENSION IF NOT EXISTS postgis;"))
             conn.commit() # 提交更改
             print("PostGIS 扩展已启用！")     
+            table_exists = conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": f'"{TABLE_NAME}"'}).scalar()
    
         # 入库流程
  
-        print(f"正在读取 Shapefile: {INPUT_SHP}")
-        try:
-            gdf = gpd.read_file(INPUT_SHP, encoding='utf-8')
-        except:
-            print(" UTF-8 读取失败，尝试 GBK...")
-            gdf = gpd.read_file(INPUT_SHP, encoding='gbk')
+        print(f"正在读取: {input_path}")
+        gdf = read_geodata(INPUT_BASE)
 
         print("正在规范化几何数据 (Polygon -> MultiPolygon)...")
         gdf["geometry"] = gdf["geometry"].apply(promote_to_multi)
-        
-        print(f"正在写入表 '{TABLE_NAME}' (SRID: 4326)...") 
-        gdf.to_postgis(
-            name=TABLE_NAME, # 数据库表名
-            con=engine,
-            if_exists='replace',
-            index=False,
-            dtype={'geometry': Geometry('MULTIPOLYGON', srid=4326)},
-            chunksize=100
-        )
-        print(f"\n{len(gdf)} 条大学边界数据已成功存入数据库！")
+
+        # 清单与目标数据库、表结构绑定，换库或列有变化时全量入库
+        manifest = Manifest(MANIFEST_PATH, {"database": f"{DB_HOST}:{DB_PORT}/{DB_NAME}", "table": TABLE_NAME,
+                                            "columns": list(gdf.columns)})
+        hashes = row_hashes(gdf)
+
+        if full or not table_exists or not manifest.records:
+            print(f"正在写入表 '{TABLE_NAME}' (SRID: 4326)...") 
+            # COPY 到 staging 表，建好索引后原子替换，入库期间后端仍可查询旧表
+            with engine.begin() as conn:
+                timings = bulk_load(conn, gdf, TABLE_NAME, "MultiPolygon", srid=4326, indexes=[("name",)])
+            print(f"\n{len(gdf)} 条大学边界数据已成功存入数据库！")
+            print(f"   COPY {timings['copy']:.2f}s，建索引 {timings['index']:.2f}s，"
+                  f"ANALYZE {timings['analyze']:.2f}s，替换 {timings['swap']:.2f}s")
+        else:
+            changed, removed = manifest.changed(hashes), manifest.removed(hashes)
+            if not changed and not removed:
+                print(f"{len(gdf)} 所高校均无变化，无需入库。")
+                return True
+            print(f"正在增量更新表 '{TABLE_NAME}'：{len(changed)} 所新增或变化，{len(removed)} 所删除...")
+            with engine.begin() as conn:
+                timings = upsert_rows(conn, select(gdf, changed), TABLE_NAME, "name", "MultiPolygon",
+                                      srid=4326, removed=removed)
+            print(f"\n已写入 {timings['rows']} 条、删除旧记录 {timings['deleted']} 条！")
+            print(f"   COPY {timings['copy']:.2f}s，更新 {timings['upsert']:.2f}s，ANALYZE {timings['analyze']:.2f}s")
+
+        # 刷新派生表：物化统计表 (只重算几何有变化的高校)、米制投影表
+        print("正在刷新统计表与投影表...")
+        with engine.begin() as conn:
+            refreshed = refresh_changed_universities(conn)
+            # 重建米制投影副本 (供按校园边界计算步行范围)
+            projected = rebuild_projected_universities(conn)
+            # 写入数据版本戳，通知后端刷新索引与缓存
+            version = bump_dataset_version(conn, TABLE_NAME)
+        print(f"统计表已更新：刷新了 {refreshed} 所高校。")
+        print(f"投影表已重建：{projected} 所高校 (EPSG:32649)。")
+        print(f"数据版本已更新: {TABLE_NAME} v{version}")
+        manifest.save(hashes)
+        return True
         
     except Exception as e:
         print("\n 发生错误")
         print(f"详细报错: {e}")
+        return False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="高校边界入库 (按清单增量更新)")
+    parser.add_argument("--full", action="store_true", help="忽略清单，全量重新入库")
+    args = parser.parse_args(argv)
+    if not ingest_data_to_postgis(full=args.full):
+        sys.exit(1)
 
 if __name__ == "__main__":
-    ingest_data_to_postgis()
+    main()
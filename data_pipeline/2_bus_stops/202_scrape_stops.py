@@ -1,12 +1,14 @@
 #coding:utf-8
-import requests
-from bs4 import BeautifulSoup
-from time import sleep
-import random
+import argparse
 import os
+import random
 import re
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlsplit
+
+from bs4 import BeautifulSoup
 
 # --- 配置区 ---
 
@@ -17,8 +19,25 @@ project_root = os.path.dirname(os.path.dirname(current_dir))
 # 设置保存目录为 data/raw/bus_stops
 SAVE_DIR = os.path.join(project_root, 'data', 'raw', 'bus_stops')
 
+# 引用项目根目录下的共用模块
+sys.path.insert(0, project_root)
+from common.ratelimit import PoliteSession
+from common.atomic import atomic_write_text
+
+# 站点地址，可用 --base-url 指向本地模拟服务器 (benchmarks/mock_icauto_server.py)
+BASE_URL = 'https://www.icauto.com.cn'
+LIST_PATH = '/chuxing/bus_440100.html'
+
 TIMEOUT = 30  # 超时时间延长到30秒
-MAX_RETRIES = 3 # 最大重试次数
+MAX_RETRIES = 3 # 最大重试次数 (429 / 5xx / 网络错误，指数退避 + 随机抖动)
+
+# 并发抓取：WORKERS 个线程共享一个令牌桶，所有线程合计每秒不超过 RATE 个请求。
+# 与原来逐条抓取、每条间隔 0.5~1.2 秒的节奏相当；本地模拟服务器测试时可用 --rate 调高
+WORKERS = 8
+RATE = 1.0
+BURST = 2
+# 同一主机同时进行中的请求数上限
+PER_HOST = 4
 
 # 随机 User-Agent 列表
 USER_AGENTS = [
@@ -28,21 +47,12 @@ USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0"
 ]
 
-def get_random_header():
+def get_random_header(base_url=BASE_URL):
     return {
         'user-agent': random.choice(USER_AGENTS),
-        'Referer': 'https://www.icauto.com.cn/chuxing/bus_440100.html'
+        'Referer': base_url + LIST_PATH
     }
 
-def create_session():
-    """创建一个带有重试机制的 session"""
-    session = requests.Session()
-    retry = Retry(connect=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-    return session
-
 def clean_filename(filename):
     return re.sub(r'[\\/*?:"<>|]', "", filename)
 
@@ -60,123 +70,136 @@ def is_valid_station_name(text):
     if len(text) < 2 or len(text) > 20: return False
     return True
 
-def get_bus_stations_with_retry(session, link):
-    """带重试机制的抓取函数"""
-    for attempt in range(MAX_RETRIES):
-        try:
-            if not link.startswith('http'):
-                link = 'https://www.icauto.com.cn' + link
-                
-            res = session.get(link, headers=get_random_header(), timeout=TIMEOUT)
-            
-            if res.status_code != 200:
-                print(f"    (状态码 {res.status_code}，重试中...)")
-                sleep(2)
-                continue
-                
-            res.encoding = 'utf-8'
-            soup = BeautifulSoup(res.text, 'html.parser')
-            stations = []
-            
-            # 锁定 class='bordered' 表格
-            target_tables = soup.find_all('table', class_='bordered')
-            
-            for table in target_tables:
-                if "站名" not in table.get_text() and "站序" not in table.get_text():
-                    continue
-                tds = table.find_all('td')
-                for td in tds:
-                    text = td.get_text(strip=True)
-                    if is_valid_station_name(text):
-                        stations.append(text)
-            
-            return stations
-
-        except requests.exceptions.RequestException as e:
-            print(f"尝试 {attempt+1}/{MAX_RETRIES} 失败: {e}")
-            sleep(3) # 出错后多休息一会儿
-            
-    return [] 
+def line_url(base_url, link):
+    """线路链接统一拼到 base_url 上 (页面中的绝对地址也只取路径)，便于指向模拟服务器"""
+    return urljoin(base_url + '/', urlsplit(link).path.lstrip('/'))
 
-if __name__ == "__main__":
-    if not os.path.exists(SAVE_DIR):
-        os.makedirs(SAVE_DIR)
-    
-    # 创建全局Session
-    session = create_session()
-    
+def parse_line_list(html):
+    """解析线路列表页，返回 [(线路名, 链接), ...]；找不到线路表格时返回 None"""
+    soup = BeautifulSoup(html, 'html.parser')
+    element_table = soup.find('table', class_='bordered')
+    if not element_table:
+        return None
+
+    lines = []
+    for busLine in element_table.find('tbody').find_all('tr'):
+        tds = busLine.find_all('td')
+        if len(tds) < 2: continue
+        link_element = busLine.find('a')
+        if link_element and link_element.has_attr('href'):
+            lines.append((tds[0].text.strip(), link_element['href']))
+    return lines
+
+def parse_stations(html):
+    """解析线路详情页，返回去重 (保留顺序) 后的站名列表"""
+    soup = BeautifulSoup(html, 'html.parser')
+    stations = []
+
+    # 锁定 class='bordered' 表格
+    for table in soup.find_all('table', class_='bordered'):
+        if "站名" not in table.get_text() and "站序" not in table.get_text():
+            continue
+        for td in table.find_all('td'):
+            text = td.get_text(strip=True)
+            if is_valid_station_name(text):
+                stations.append(text)
+
+    # 去重 (保留顺序)
+    return list(dict.fromkeys(stations))
+
+def fetch_text(client, url, base_url):
+    """限速抓取一个页面，失败 (重试用尽) 时返回 None"""
+    res = client.get(url, headers=get_random_header(base_url), timeout=TIMEOUT)
+    if res.status_code != 200:
+        return None
+    res.encoding = 'utf-8'
+    return res.text
+
+def fetch_line(client, base_url, link, file_path):
+    """抓取一条线路并原子写入站点文件，返回站点数 (失败时为 0)"""
     try:
-        print("正在获取线路列表...")
-        firstPageUrl = 'https://www.icauto.com.cn/chuxing/bus_440100.html'
-        
-        # 列表页也可能超时，加上简单的重试
-        for _ in range(3):
-            try:
-                res = session.get(firstPageUrl, headers=get_random_header(), timeout=TIMEOUT)
-                if res.status_code == 200: break
-            except:
-                sleep(2)
-        
-        if res.status_code == 200:
-            res.encoding = 'utf-8'
-            soup = BeautifulSoup(res.text, 'html.parser')
-            element_table = soup.find('table', class_='bordered')
-            
-            if not element_table:
-                print("错误：无法在主页找到线路表格。")
-                exit()
-                
-            busLineList = element_table.find('tbody').find_all('tr')
-            total = len(busLineList)
-            print(f"找到 {total} 条线路，开始任务 (已开启断点续传)...")
-
-            for index, busLine in enumerate(busLineList):
-                tds = busLine.find_all('td')
-                if len(tds) < 2: continue
-                
-                name = tds[0].text.strip()
-                link_element = busLine.find('a')
-                
-                if link_element and link_element.has_attr('href'):
-                    link = link_element['href']
-                    line_id = extract_line_id(link)
-                    
-                    # --- 断点续传检查 ---
-                    clean_name = clean_filename(name)
-                    file_name = f"{clean_name}_{line_id}.txt"
-                    file_path = os.path.join(SAVE_DIR, file_name)
-                    
-                    # 如果文件已经存在且大小不为0，说明之前抓过了，跳过
-                    if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-                        # 仅打印简略信息，不刷屏
-                        # print(f"[{index+1}/{total}] {name} 已存在，跳过。") 
-                        continue
-                    
-                    print(f"[{index+1}/{total}] 正在抓取: {name} ... ", end="")
-                    
-                    # 执行抓取
-                    stations = get_bus_stations_with_retry(session, link)
-                    
-                    if stations:
-                        # 去重 (保留顺序)
-                        seen = set()
-                        unique_stations = []
-                        for s in stations:
-                            if s not in seen:
-                                unique_stations.append(s)
-                                seen.add(s)
-                        
-                        with open(file_path, 'w', encoding='utf-8') as f:
-                            for station in unique_stations:
-                                f.write(station + '\n')
-                        print(f"成功 ({len(unique_stations)} 站)")
-                    else:
-                        print(f"失败 (多次重试后无数据)")
-                    
-                    # 每次请求后休息，避免被封
-                    sleep(random.uniform(0.5, 1.2))
-        else:
-            print(f"主页访问失败: {res.status_code}")
+        html = fetch_text(client, line_url(base_url, link), base_url)
+    except Exception as e:
+        print(f"    请求失败: {e}")
+        return 0
+    if html is None:
+        return 0
+
+    stations = parse_stations(html)
+    if stations:
+        # 每条线路一个文件，写完整后才出现，完成顺序不影响结果，中断后可直接续传
+        atomic_write_text(file_path, "".join(station + '\n' for station in stations))
+    return len(stations)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="并发抓取广州公交线路的站点列表 (断点续传)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"并发线程数 (默认 {WORKERS})")
+    parser.add_argument("--rate", type=float, default=RATE, help=f"所有线程合计每秒请求数 (默认 {RATE})")
+    parser.add_argument("--burst", type=int, default=BURST, help=f"令牌桶容量 (默认 {BURST})")
+    parser.add_argument("--per-host", type=int, default=PER_HOST, help=f"同一主机的并发请求上限 (默认 {PER_HOST})")
+    parser.add_argument("--base-url", default=BASE_URL, help="站点地址，测试时可指向本地模拟服务器")
+    parser.add_argument("--save-dir", default=SAVE_DIR, help="站点文件保存目录")
+    args = parser.parse_args(argv)
+    base_url = args.base_url.rstrip('/')
 
+    os.makedirs(args.save_dir, exist_ok=True)
+
+    client = PoliteSession(args.rate, burst=args.burst, per_host=args.per_host, max_retries=MAX_RETRIES)
+
+    print("正在获取线路列表...")
+    try:
+        html = fetch_text(client, base_url + LIST_PATH, base_url)
     except Exception as e:
-        print(f"\n严重错误: {e}")
+        print(f"主页访问失败: {e}")
+        return
+    if html is None:
+        print("主页访问失败")
+        return
+
+    bus_lines = parse_line_list(html)
+    if bus_lines is None:
+        print("错误：无法在主页找到线路表格。")
+        return
+
+    # --- 断点续传检查 ---
+    # 文件已经存在且大小不为0，说明之前抓过了，跳过
+    tasks = []
+    for name, link in bus_lines:
+        file_name = f"{clean_filename(name)}_{extract_line_id(link)}.txt"
+        file_path = os.path.join(args.save_dir, file_name)
+        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+            continue
+        tasks.append((name, link, file_path))
+
+    total = len(tasks)
+    print(f"找到 {len(bus_lines)} 条线路，其中 {len(bus_lines) - total} 条已抓取，"
+          f"开始抓取 {total} 条 ({args.workers} 线程，每秒 {args.rate} 个请求)...")
+
+    start = time.perf_counter()
+    succeeded, errors = 0, 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(fetch_line, client, base_url, link, file_path): name
+                   for name, link, file_path in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            name = futures[future]
+            # 解析或写文件出错只算这一条线路失败，不中断其余线路的抓取与统计
+            try:
+                count = future.result()
+            except Exception as e:
+                errors += 1
+                print(f"[{done}/{total}] {name} 失败 (处理出错: {e})")
+                continue
+            if count:
+                succeeded += 1
+                print(f"[{done}/{total}] {name} 成功 ({count} 站)")
+            else:
+                print(f"[{done}/{total}] {name} 失败 (多次重试后无数据)")
+
+    elapsed = time.perf_counter() - start
+    stats = client.stats
+    print(f"\n完成：成功 {succeeded}/{total} 条线路 (处理出错 {errors} 条)，耗时 {elapsed:.1f}s")
+    print(f"共 {stats['requests']} 次请求，重试 {stats['retries']} 次 (其中 429 {stats['throttled']} 次)，"
+          f"限速等待累计 {stats['waited']:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,11 @@
-import requests
+import argparse
+import asyncio
+import json
 import pandas as pd
 import time
-import random
 import os
+import sys
 from urllib.parse import quote
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 # 【配置区】
 # 替换为你的百度地图 Cookie 
@@ -19,6 +19,30 @@ data_raw_dir = os.path.join(project_root, 'data', 'raw')
 INPUT_DIR = os.path.join(data_raw_dir, "bus_stops")
 # 输出文件: data/raw/bus_stops_bd09mc.csv
 OUTPUT_CSV = os.path.join(data_raw_dir, "bus_stops_bd09mc.csv")
+# 交给 204 的 Parquet: data/raw/bus_stops_bd09mc.parquet
+OUTPUT_BASE = os.path.join(data_raw_dir, "bus_stops_bd09mc")
+# 站点名 -> 坐标的持久化缓存 (断点续传)：每次查询后立即写入，重新运行时直接命中
+CACHE_PATH = os.path.join(data_raw_dir, "geocode_cache.sqlite")
+# 未找到坐标的站点多少天内不再重复查询
+NEGATIVE_TTL_DAYS = 7
+
+# 异步查询：CONCURRENCY 个请求同时进行，合计每秒不超过 RATE 个请求
+# (原先串行请求 + 每次随机休息 0.8~1.5 秒，约合每秒 1 个)
+CONCURRENCY = 4
+RATE = 1.0
+BURST = 1
+TIMEOUT = 10
+MAX_RETRIES = 3 # 429 / 5xx / 网络错误的重试次数 (指数退避 + 随机抖动)
+# 触发验证码时所有协程一起暂停的秒数 (与原来一样休息 10 秒)；连续触发 MAX_CAPTCHAS 次则停止本次查询，
+# 未查询的站点留到下次运行 (更新 Cookie 后)
+CAPTCHA_PAUSE = 10
+MAX_CAPTCHAS = 3
+
+# 引用项目根目录下的共用模块
+sys.path.insert(0, project_root)
+from common.geoio import write_table
+from common.geocode_cache import GeocodeCache, cache_key, OK, NOT_FOUND, ERROR
+from common.ratelimit import TokenBucket, backoff_delay, RETRY_STATUS
 
 # 百度地图城市代码：广州=257
 CITY_CODE = 257 
@@ -30,171 +54,235 @@ HEADERS = {
     "Connection": "keep-alive"
 }
 
+# 搜索接口返回验证码页面 (不写入缓存，站点稍后重新查询)
+CAPTCHA = "captcha"
+
 # 搜索接口
 SEARCH_URL = "https://map.baidu.com/?qt=s&wd={}&c={}&rn=1&ie=utf-8"
 
 # 【核心功能封装】
 
-def create_session():
-    """创建带有自动重试功能的 Session"""
-    session = requests.Session()
-    # connect=3: 连接错误重试3次
-    # read=3: 读取超时重试3次
-    # backoff_factor=1: 失败后等待 1s, 2s, 4s...
-    retry = Retry(total=5, connect=3, read=3, backoff_factor=1, 
-                  status_forcelist=[500, 502, 503, 504, 429])
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-    return session
-
-def load_cache_from_csv(csv_path):
-    """从现有的 CSV 中加载已抓取的坐标到内存缓存"""
-    cache = {}
-    if os.path.exists(csv_path):
-        try:
-            print(f"检测到已存在的数据文件: {csv_path}，正在加载缓存...")
-            df = pd.read_csv(csv_path)
-            # 确保列名存在
-            if 'stop_name' in df.columns and 'bd_x' in df.columns:
-                # 建立 站点名 -> (x, y) 的映射
-                # 注意：这里去重了，如果不同线路有同名站点，坐标认为是一样的
-                for _, row in df.iterrows():
-                    if pd.notnull(row['bd_x']) and pd.notnull(row['bd_y']):
-                        cache[row['stop_name']] = (row['bd_x'], row['bd_y'])
-            print(f"成功加载 {len(cache)} 个站点的坐标缓存，将跳过这些站点的网络请求。")
-        except Exception as e:
-            print(f"加载缓存失败 (可能是文件损坏)，将重新开始: {e}")
-    return cache
-
-def fetch_stop_coordinate(session, stop_name):
-    """
-    搜索站点，返回 (x, y) 百度墨卡托坐标
-    """
+def seed_cache_from_csv(cache, csv_path):
+    """缓存为空时，从旧版本生成的 CSV (原先的断点续传文件) 导入已抓取的坐标"""
+    if len(cache) > 0 or not os.path.exists(csv_path):
+        return 0
+    try:
+        df = pd.read_csv(csv_path, usecols=['stop_name', 'bd_x', 'bd_y'])
+    except Exception as e:
+        print(f"读取旧数据文件失败，跳过导入: {e}")
+        return 0
+    # 注意：这里去重了，如果不同线路有同名站点，坐标认为是一样的
+    df = df.dropna().drop_duplicates('stop_name')
+    cache.put_many([(name, OK, float(x), float(y), None)
+                    for name, x, y in zip(df['stop_name'], df['bd_x'], df['bd_y'])], CITY_CODE)
+    return len(df)
+
+def parse_search_result(data):
+    """从搜索接口的 JSON 中取第一个结果的坐标，没有结果时返回 None"""
+    if not data.get("content"):
+        return None
+    first_result = data["content"][0]
+
+    # 情况1: 直接有 x, y
+    if "x" in first_result and "y" in first_result:
+        return float(first_result["x"]), float(first_result["y"])
+
+    # 情况2: 只有 geo 字符串
+    if "geo" in first_result:
+        geo_str = first_result["geo"]
+        parts = geo_str.split('|')[-1].split(';')[0].split(',')
+        if len(parts) >= 2:
+            return float(parts[0]), float(parts[1])
+    return None
+
+def search_url(stop_name):
     search_wd = stop_name
     # 优化搜索关键词
     if "公交" not in stop_name and "总站" not in stop_name and "站" not in stop_name:
         search_wd += "公交站"
-    
-    url = SEARCH_URL.format(quote(search_wd), CITY_CODE)
-    
+    return SEARCH_URL.format(quote(search_wd), CITY_CODE)
+
+def parse_response(text):
+    """解析搜索接口的返回，得到 (状态, x, y)"""
+    # 检查内容是否可能是验证码或错误页面
+    if "验证" in text and len(text) < 500:
+        return CAPTCHA, None, None
     try:
-        # 使用 session 发送请求，自带重试
-        res = session.get(url, headers=HEADERS, timeout=10)
-        
-        # 检查内容是否可能是验证码或错误页面
-        if "验证" in res.text and len(res.text) < 500:
-             print("  警告：可能触发了百度验证码，请更新 Cookie 或暂停一段时间！")
-             time.sleep(10)
-             return None, None
-
-        data = res.json()
-        
-        if "content" in data:
-            first_result = data["content"][0]
-            
-            # 情况1: 直接有 x, y
-            if "x" in first_result and "y" in first_result:
-                return first_result["x"], first_result["y"]
-            
-            # 情况2: 只有 geo 字符串
-            if "geo" in first_result:
-                geo_str = first_result["geo"]
-                parts = geo_str.split('|')[-1].split(';')[0].split(',')
-                if len(parts) >= 2:
-                    return float(parts[0]), float(parts[1])
-                    
-        return None, None
-        
-    except Exception as e:
-        print(f"  {stop_name} 请求最终失败: {e}")
-        return None, None
+        coords = parse_search_result(json.loads(text))
+    except (ValueError, TypeError, KeyError, IndexError):
+        return ERROR, None, None
+    if coords is None:
+        return NOT_FOUND, None, None
+    return OK, coords[0], coords[1]
+
+async def fetch_stop_coordinate(session, bucket, stop_name, stats):
+    """
+    搜索站点，返回 (状态, x, y, 原始返回)，坐标为百度墨卡托。
+    每次请求 (包括重试) 先从共享令牌桶取令牌
+    """
+    import aiohttp
+
+    url = search_url(stop_name)
+    error = None
+    for attempt in range(MAX_RETRIES + 1):
+        await bucket.acquire_async()
+        stats["requests"] += 1
+        try:
+            async with session.get(url) as res:
+                text = await res.text(errors="replace")
+                if res.status not in RETRY_STATUS:
+                    status, x, y = parse_response(text)
+                    return status, x, y, text
+                error = f"HTTP {res.status}"
+                retry_after = res.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else 0.0
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = repr(e)
+            delay = 0.0
+        if attempt < MAX_RETRIES:
+            stats["retries"] += 1
+            await asyncio.sleep(max(delay, backoff_delay(attempt)))
+
+    print(f"  {stop_name} 请求最终失败: {error}")
+    return ERROR, None, None, error
+
+async def geocode_names(names, cache, concurrency, rate, burst=BURST):
+    """
+    异步查询阶段：names 中的每个站名恰好查询一次 (不计重试)，
+    concurrency 个协程从同一队列取站名，共享一个令牌桶；结果逐条写入缓存。
+    返回统计信息
+    """
+    import aiohttp
+
+    queue = asyncio.Queue()
+    for name in names:
+        queue.put_nowait(name)
+    bucket = TokenBucket(rate, burst)
+    stats = {"requests": 0, "retries": 0, "done": 0, OK: 0, NOT_FOUND: 0, ERROR: 0, CAPTCHA: 0, "stopped": False}
+    total = len(names)
+    consecutive_captchas = 0
+    resume_at = 0.0
+
+    async def worker(session):
+        nonlocal consecutive_captchas, resume_at
+        while not stats["stopped"]:
+            try:
+                stop_name = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            status, x, y, raw = await fetch_stop_coordinate(session, bucket, stop_name, stats)
+            if status == CAPTCHA:
+                # 不写入缓存，站点放回队列稍后重查
+                stats[CAPTCHA] += 1
+                queue.put_nowait(stop_name)
+                if stats["stopped"]:
+                    return
+                if time.monotonic() < resume_at:
+                    # 暂停前已发出的请求，与上一次算作同一次触发
+                    continue
+                consecutive_captchas += 1
+                if consecutive_captchas >= MAX_CAPTCHAS:
+                    print(f"  连续 {consecutive_captchas} 次触发百度验证码，停止查询；"
+                          f"请更新 Cookie 后重新运行 (剩余站点下次继续)。")
+                    stats["stopped"] = True
+                    return
+                # 通过共享令牌桶让所有协程一起暂停
+                print(f"  警告：可能触发了百度验证码，全部请求暂停 {CAPTCHA_PAUSE} 秒！")
+                bucket.pause(CAPTCHA_PAUSE)
+                resume_at = time.monotonic() + CAPTCHA_PAUSE
+                continue
+            consecutive_captchas = 0
+            # 每次查询后立即写入缓存，中断后重新运行不会重复请求
+            cache.put(stop_name, CITY_CODE, status, x, y, raw)
+            stats["done"] += 1
+            stats[status] += 1
+            if status != OK:
+                print(f"[{stats['done']}/{total}] 未找到坐标: {stop_name} ({status})")
+            elif stats["done"] % 50 == 0 or stats["done"] == total:
+                print(f"[{stats['done']}/{total}] 已查询")
+
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(headers=HEADERS, timeout=timeout, connector=connector) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    return stats
+
+def read_line_files(input_dir):
+    """读取所有线路文件，返回 DataFrame (line_name, stop_name, sequence)"""
+    records = []
+    for filename in sorted(f for f in os.listdir(input_dir) if f.endswith(".txt")):
+        # 解析线路名，例如 "1路_812.txt" -> "1路"
+        line_name = filename.split('_')[0]
+        with open(os.path.join(input_dir, filename), 'r', encoding='utf-8') as f:
+            stops = [line.strip() for line in f if line.strip()]
+        records.extend((line_name, stop_name, seq + 1) for seq, stop_name in enumerate(stops))
+    return pd.DataFrame(records, columns=["line_name", "stop_name", "sequence"])
+
+def export_results(stops, cache):
+    """
+    导出步骤：线路站点表与缓存中的坐标按键一次合并，写出 CSV 与 Parquet (供 204 读取)。
+    没有坐标的站点不输出。
+    """
+    stops = stops.assign(key=[cache_key(name, CITY_CODE) for name in stops["stop_name"]])
+    coords = cache.coordinates(CITY_CODE).rename(columns={"x": "bd_x", "y": "bd_y"})
+    df_result = stops.merge(coords, on="key", how="inner").drop(columns="key")
+
+    df_result.to_csv(OUTPUT_CSV, index=False, encoding='utf-8-sig')
+    parquet_path = write_table(df_result, OUTPUT_BASE)
+    return df_result, parquet_path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="获取公交站点的百度墨卡托坐标")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help=f"同时进行的请求数 (默认 {CONCURRENCY})")
+    parser.add_argument("--rate", type=float, default=RATE, help=f"合计每秒请求数 (默认 {RATE})")
+    parser.add_argument("--export-only", action="store_true", help="不发起请求，只用缓存中的坐标导出 CSV / Parquet")
+    parser.add_argument("--negative-ttl-days", type=float, default=NEGATIVE_TTL_DAYS,
+                        help=f"未找到坐标的站点多少天内不再查询 (默认 {NEGATIVE_TTL_DAYS})")
+    args = parser.parse_args(argv)
 
-def main():
     if not os.path.exists(INPUT_DIR):
         print(f"找不到文件夹: {INPUT_DIR}")
         return
-    
-    if not os.path.exists("data"):
-        os.makedirs("data")
 
     # 1. 准备工作
-    files = [f for f in os.listdir(INPUT_DIR) if f.endswith(".txt")]
-    print(f"找到 {len(files)} 个线路文件，准备开始处理...")
-
-    # 2. 加载断点续传缓存
-    stop_cache = load_cache_from_csv(OUTPUT_CSV)
-    
-    # 全局 Session
-    session = create_session()
-    all_data = []
-
-    # 3. 循环处理文件
-    # 我们重新遍历所有文件，利用缓存“秒过”已抓取的，只抓未抓取的
-    # 这样可以保证数据的完整性（re-build 模式）
-    
+    stops = read_line_files(INPUT_DIR)
+    print(f"读取到 {stops['line_name'].nunique()} 条线路、{len(stops)} 个线路站点，准备开始处理...")
+
+    cache = GeocodeCache(CACHE_PATH, negative_ttl=args.negative_ttl_days * 24 * 3600)
     start_time = time.time()
-    
-    for i, filename in enumerate(files):
-        # 解析线路名，例如 "1路_812.txt" -> "1路"
-        line_name = filename.split('_')[0]
-        file_path = os.path.join(INPUT_DIR, filename)
-        
-        # 读取站点
-        with open(file_path, 'r', encoding='utf-8') as f:
-            stops = [line.strip() for line in f if line.strip()]
-        
-        # 检查该线路是否所有站点都已在缓存中（如果是，则静默快速处理，不打印刷屏）
-        all_cached = all(stop in stop_cache for stop in stops)
-        
-        if not all_cached:
-            print(f"[{i+1}/{len(files)}] 正在处理: {line_name} ({len(stops)}站)...")
-        
-        for seq, stop_name in enumerate(stops):
-            x, y = None, None
-            
-            # --- 步骤 A: 查缓存 ---
-            if stop_name in stop_cache:
-                x, y = stop_cache[stop_name]
-            
-            # --- 步骤 B: 抓取 (仅当缓存未命中时) ---
-            else:
-                # 打印日志，只显示实际发起的请求
-                print(f"   Network -> 获取: {stop_name}")
-                x, y = fetch_stop_coordinate(session, stop_name)
-                
-                if x and y:
-                    stop_cache[stop_name] = (x, y) # 更新缓存
-                else:
-                    print(f"   未找到坐标: {stop_name}")
-                
-                # 只有发起网络请求后才需要延时
-                time.sleep(random.uniform(0.8, 1.5))
-
-            # --- 步骤 C: 收集数据 ---
-            if x and y:
-                all_data.append({
-                    "line_name": line_name,
-                    "stop_name": stop_name,
-                    "sequence": seq + 1,
-                    "bd_x": x,
-                    "bd_y": y
-                })
-
-        # --- 步骤 D: 定期保存 (断点续传的关键) ---
-        # 每 5 个文件保存一次，或者遇到刚抓取过数据的时候保存
-        if (i + 1) % 5 == 0 or not all_cached:
-            if len(all_data) > 0:
-                pd.DataFrame(all_data).to_csv(OUTPUT_CSV, index=False, encoding='utf-8-sig')
-                # print(f"   (已自动保存进度)")
-
-    # 4. 最终保存
-    df_result = pd.DataFrame(all_data)
-    df_result.to_csv(OUTPUT_CSV, index=False, encoding='utf-8-sig')
-    
+    try:
+        # 2. 断点续传：缓存为空时导入旧版本的 CSV
+        seeded = seed_cache_from_csv(cache, OUTPUT_CSV)
+        if seeded:
+            print(f"已从 {OUTPUT_CSV} 导入 {seeded} 个站点的坐标到缓存。")
+
+        # 3. 只查询缓存中没有 (或未找到结果已过期) 的站点，每个站名只查一次
+        if not args.export_only:
+            # 规范化后相同的站名 (如全角 / 半角、空格不同) 只查一次
+            unique_names = stops["stop_name"].drop_duplicates()
+            unique_names = unique_names[~unique_names.map(lambda n: cache_key(n, CITY_CODE)).duplicated()]
+            pending = [name for name in unique_names if cache.get(name, CITY_CODE) is None]
+            print(f"共 {len(unique_names)} 个不同站点，其中 {len(pending)} 个需要查询 "
+                  f"({args.concurrency} 并发，每秒 {args.rate} 个请求)。")
+            if pending:
+                fetch_start = time.time()
+                stats = asyncio.run(geocode_names(pending, cache, args.concurrency, args.rate))
+                fetch_time = time.time() - fetch_start
+                print(f"查询{'中止' if stats['stopped'] else '完成'}：{stats['requests']} 次请求 "
+                      f"(重试 {stats['retries']} 次，验证码 {stats[CAPTCHA]} 次)，"
+                      f"找到 {stats[OK]}，未找到 {stats[NOT_FOUND]}，失败 {stats[ERROR]}，"
+                      f"耗时 {fetch_time:.1f}s ({stats['requests'] / max(fetch_time, 1e-9):.2f} 次/秒)")
+
+        # 4. 导出
+        df_result, parquet_path = export_results(stops, cache)
+        counts = cache.status_counts()
+    finally:
+        cache.close()
+
     duration = time.time() - start_time
     print(f"\n全部完成！耗时: {duration:.2f}秒")
-    print(f"共收集 {len(df_result)} 条数据，已保存至: {OUTPUT_CSV}")
+    print(f"缓存状态: {counts}")
+    print(f"共收集 {len(df_result)} 条数据，已保存至: {OUTPUT_CSV}, {parquet_path}")
 
 if __name__ == "__main__":
     main()
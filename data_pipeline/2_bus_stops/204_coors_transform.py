@@ -1,128 +1,51 @@
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import Point
-from shapely.ops import transform
-import math
+import argparse
 import os
-
-# 坐标转换算法模块
-
-x_pi = 3.14159265358979324 * 3000.0 / 180.0
-pi = math.pi
-a = 6378245.0
-es = 0.00669342162296594323
-
-# 百度墨卡托转经纬度所需的系数表
-MCBAND = [12890594.86, 8362377.87, 5591021, 3481989.83, 1678043.12, 0]
-MC2LL = [
-    [1.410526172116255e-8, 0.00000898305509648872, -1.9939833816331, 200.9824383106796, -187.2403703815547, 91.6087516669843, -23.38765649603339, 2.57121317296198, -0.03801003308653, 17337981.2],
-    [-7.435856389565537e-9, 0.000008983055097726239, -0.78625201886289, 96.32687599759846, -1.85204757529826, -59.36935905485877, 47.40033549296737, -16.50741931063887, 2.28786674699375, 10260144.86],
-    [-3.030883460898826e-8, 0.00000898305509983578, 0.30071316287616, 59.74293618442277, 7.357984074871, -25.38371002664745, 13.45380521110908, -3.29883767235584, 0.32710905363475, 6856817.37],
-    [-1.981981304930552e-8, 0.000008983055099779535, 0.03278182852591, 40.31678527705744, 0.65659298677277, -4.44255534477492, 0.85341911805263, 0.12923347998204, -0.04625736007561, 4482777.06],
-    [3.09191371068437e-9, 0.000008983055096812155, 0.00006995724062, 23.10934304144901, -0.00023663490511, -0.6321817810242, -0.00663494467273, 0.03430082397953, -0.00466043876332, 2555164.4],
-    [2.890871144776878e-9, 0.000008983055095805407, -3.068298e-8, 7.47137025468032, -0.00000353937994, -0.02145144861037, -0.00001234426596, 0.00010322952773, -0.00000323890364, 826088.5]
-]
-
-def bdmc_to_bdll(x, y):
-    """百度墨卡托 -> 百度经纬度"""
-    abs_x, abs_y = abs(x), abs(y)
-    cf = None
-    for i in range(len(MCBAND)):
-        if abs_y >= MCBAND[i]:
-            cf = MC2LL[i]
-            break
-    if cf is None: return x, y
-    
-    lon = cf[0] + cf[1] * abs_x
-    cc = abs_y / cf[9]
-    lat = cf[2] + cf[3]*cc + cf[4]*cc**2 + cf[5]*cc**3 + cf[6]*cc**4 + cf[7]*cc**5 + cf[8]*cc**6
-    
-    if x < 0: lon = -lon
-    if y < 0: lat = -lat
-    return lon, lat
-
-def BD09_to_GCJ02(bd_lng, bd_lat):
-    """百度经纬度 -> GCJ02"""
-    x = bd_lng - 0.0065
-    y = bd_lat - 0.006
-    z = math.sqrt(x * x + y * y) - 0.00002 * math.sin(y * x_pi)
-    theta = math.atan2(y, x) - 0.000003 * math.cos(x * x_pi)
-    gcj_lng = z * math.cos(theta)
-    gcj_lat = z * math.sin(theta)
-    return gcj_lng, gcj_lat
-
-def _transformlat(lng, lat):
-    ret = -100.0 + 2.0 * lng + 3.0 * lat + 0.2 * lat * lat + 0.1 * lng * lat + 0.2 * math.sqrt(math.fabs(lng))
-    ret += (20.0 * math.sin(6.0 * lng * pi) + 20.0 * math.sin(2.0 * lng * pi)) * 2.0 / 3.0
-    ret += (20.0 * math.sin(lat * pi) + 40.0 * math.sin(lat / 3.0 * pi)) * 2.0 / 3.0
-    ret += (160.0 * math.sin(lat / 12.0 * pi) + 320 * math.sin(lat * pi / 30.0)) * 2.0 / 3.0
-    return ret
-
-def _transformlng(lng, lat):
-    ret = 300.0 + lng + 2.0 * lat + 0.1 * lng * lng + 0.1 * lng * lat + 0.1 * math.sqrt(math.fabs(lng))
-    ret += (20.0 * math.sin(6.0 * lng * pi) + 20.0 * math.sin(2.0 * lng * pi)) * 2.0 / 3.0
-    ret += (20.0 * math.sin(lng * pi) + 40.0 * math.sin(lng / 3.0 * pi)) * 2.0 / 3.0
-    ret += (150.0 * math.sin(lng / 12.0 * pi) + 300.0 * math.sin(lng / 30.0 * pi)) * 2.0 / 3.0
-    return ret
-
-def GCJ02_to_WGS84(gcj_lng, gcj_lat):
-    """GCJ02 -> WGS84"""
-    dlat = _transformlat(gcj_lng - 105.0, gcj_lat - 35.0)
-    dlng = _transformlng(gcj_lng - 105.0, gcj_lat - 35.0)
-    radlat = gcj_lat / 180.0 * pi
-    magic = math.sin(radlat)
-    magic = 1 - es * magic * magic
-    sqrtmagic = math.sqrt(magic)
-    dlat = (dlat * 180.0) / ((a * (1 - es)) / (magic * sqrtmagic) * pi)
-    dlng = (dlng * 180.0) / (a / sqrtmagic * math.cos(radlat) * pi)
-    mglat = gcj_lat + dlat
-    mglng = gcj_lng + dlng
-    lng = gcj_lng * 2 - mglng
-    lat = gcj_lat * 2 - mglat
-    return lng, lat
-
-def transform_point_logic(x, y, z=None):
-    """
-    组合变换逻辑：被 transform 自动调用
-    """
-    # 1. 墨卡托 -> 百度经纬度
-    # 注意：这里的输入 x, y 已经是除以 100 后的标准墨卡托单位了，因为我们在 main 中预处理了
-    lon_bd, lat_bd = bdmc_to_bdll(x, y)
-    # 2. 百度经纬度 -> GCJ02
-    lon_gcj, lat_gcj = BD09_to_GCJ02(lon_bd, lat_bd)
-    # 3. GCJ02 -> WGS84
-    lon_wgs, lat_wgs = GCJ02_to_WGS84(lon_gcj, lat_gcj)
-    
-    if z is not None:
-        return lon_wgs, lat_wgs, z
-    return lon_wgs, lat_wgs
+import sys
+import time
+
+# 引用项目根目录下的共用模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# 坐标转换算法：BD09MC -> BD09 -> GCJ02 -> WGS84 (与 104 共用)
+from common.coords import transform_array
+from common.geoio import read_table, write_geodata, existing_path, file_size_mb
+
+# 【配置区】
+# GCJ02 -> WGS84 的计算方式: formula = 一次近似的解析公式 (与历史数据一致，误差约 1~2 米)；
+# grid = 广州市范围内对同一公式预计算的偏移网格插值 (更快，与 formula 相差厘米级)。
+# 两者都不是 common.coords 中 exact=True 的迭代求逆
+GCJ_MODE = "formula"
+GRID_RESOLUTION = 0.005
 
 # 主逻辑
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="公交站点坐标转换 BD09MC -> WGS84")
+    parser.add_argument("--gcj-mode", choices=["formula", "grid"], default=GCJ_MODE,
+                        help="GCJ02 -> WGS84: formula 一次近似的解析公式 / grid 同一公式的偏移网格插值")
+    parser.add_argument("--grid-resolution", type=float, default=GRID_RESOLUTION, help="偏移网格分辨率 (度)")
+    parser.add_argument("--legacy-shp", action="store_true", help="另外导出 Shapefile (bus_stops_wgs84.shp)")
+    args = parser.parse_args(argv)
+
     current_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(os.path.dirname(current_dir))
     data_raw_dir = os.path.join(project_root, 'data', 'raw')
+    grid_path = os.path.join(project_root, 'data', 'processed', 'gcj02_offset_grid')
 
-    input_csv = os.path.join(data_raw_dir, "bus_stops_bd09mc.csv")
-    output_shp = os.path.join(data_raw_dir, "bus_stops_wgs84.shp")
+    # 不带扩展名：优先读取 203 导出的 Parquet，兼容旧的 CSV
+    input_base = os.path.join(data_raw_dir, "bus_stops_bd09mc")
+    output_base = os.path.join(data_raw_dir, "bus_stops_wgs84")
     
-    if not os.path.exists(input_csv):
-        # 尝试在 data 文件夹下查找（如果存在）
-        if os.path.exists(os.path.join("data", input_csv)):
-            input_csv = os.path.join("data", input_csv)
-            output_shp = os.path.join("data", output_shp)
-        else:
-            print(f"找不到文件: {input_csv}。")
-            return
-
-    print("开始读取坐标数据...")
-    try:
-        df = pd.read_csv(input_csv, encoding='utf-8')
-    except UnicodeDecodeError:
-        print("检测到编码不是 UTF-8，尝试使用 GBK...")
-        df = pd.read_csv(input_csv, encoding='gbk')
-        
-    print(f"共 {len(df)} 个站点数据。")
+    input_path = existing_path(input_base)
+    if input_path is None:
+        print(f"找不到文件: {input_base}.parquet / .csv。")
+        return
+
+    print(f"开始读取坐标数据: {input_path}")
+    start = time.perf_counter()
+    # 只读取需要的列
+    df = read_table(input_base, columns=["line_name", "stop_name", "sequence", "bd_x", "bd_y"])
+    print(f"共 {len(df)} 个站点数据，读取耗时 {time.perf_counter() - start:.2f}s。")
     print(df.head(2))
 
     # 关键步骤：数据单位修正
@@ -135,24 +58,21 @@ def main():
 
     print("正在生成几何对象并进行坐标转换 (BD09MC -> WGS84)...")
     
-    # 1. 先创建 GeoDataFrame，此时坐标系是“缩放修正后”的百度墨卡托
-    # 使用 gpd.points_from_xy 比逐行 apply Point 更快
-    gdf = gpd.GeoDataFrame(
-        df, 
-        geometry=gpd.points_from_xy(df.bd_x, df.bd_y),
-        crs="EPSG:3857" # 临时占位，实际是 Baidu Mercator
-    )
+    grid = None
+    if args.gcj_mode == "grid":
+        from common.gcj02_grid import ensure_grid
+        grid, built = ensure_grid(grid_path, os.path.join(data_raw_dir, '广州市.shp'), args.grid_resolution)
+        print(f"{'已生成' if built else '使用'}偏移网格 {grid_path}.npy，插值最大误差 {grid.meta['error']['max_m']:.4f} 米")
 
-    # 2. 使用 apply + transform 进行几何转换 (参考 03_geometry_to_wgs84.py 的写法)
-    gdf["geometry"] = gdf["geometry"].apply(
-        lambda g: transform(transform_point_logic, g)
-    )
-    
-    # 转换完成后，重置 CRS 为 WGS84
+    # 整列坐标一次完成转换
+    lon, lat = transform_array(df['bd_x'].to_numpy(), df['bd_y'].to_numpy(), "bd09mc", "wgs84", grid=grid)
+    gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(lon, lat))
+
+    # 转换后的坐标即为 WGS84
     gdf = gdf.set_crs("EPSG:4326", allow_override=True)
 
-    print("正在保存 Shapefile...")
-    # 整理字段名：Shapefile 字段名限制 10 字符，且最好避免中文
+    print("正在保存 GeoParquet...")
+    # 整理字段名：与数据库表 Gz_BusStops 的列名一致 (历史上受 Shapefile 字段名 10 字符限制)
     # input: line_name, stop_name, sequence
     rename_map = {
         "line_name": "line",
@@ -167,15 +87,9 @@ def main():
     keep_cols = list(cols_to_rename.values()) + ['geometry']
     out_gdf = out_gdf[keep_cols]
 
-    try:
-        out_gdf.to_file(output_shp, encoding='utf-8')
-        print(f"转换完成！Shapefile 已保存至: {output_shp}")
-    except Exception as e:
-        print(f"保存 Shapefile 失败: {e}")
-        # 备份方案：保存为 GeoJSON
-        json_path = output_shp.replace('.shp', '.geojson')
-        out_gdf.to_file(json_path, driver='GeoJSON')
-        print(f"   已备份保存为 GeoJSON: {json_path}")
+    start = time.perf_counter()
+    written = write_geodata(out_gdf, output_base, legacy_shp=args.legacy_shp)
+    print(f"转换完成！已保存至: {', '.join(written)} ({file_size_mb(written):.2f} MB, {time.perf_counter() - start:.2f}s)")
 
 if __name__ == "__main__":
     main()
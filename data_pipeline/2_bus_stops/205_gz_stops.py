@@ -1,7 +1,26 @@
 import geopandas as gpd
+import argparse
 import os
+import sys
+import time
+
+# 引用项目根目录下的共用模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from common.geoio import read_geodata, write_geodata, existing_path, file_size_mb
+from common.clip import clip_gdf, CHUNK_SIZE
+from common.boundary import load_boundary
+
+# 【配置区】
+# fast: STRtree 包围盒预筛 + 预处理多边形分块判断；gpd: 原来的 gpd.clip
+CLIP_MODE = "fast"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按广州市边界裁剪")
+    parser.add_argument("--legacy-shp", action="store_true", help="另外导出 Shapefile (Gz_BusStops.shp)")
+    parser.add_argument("--clip-mode", choices=("fast", "gpd"), default=CLIP_MODE, help=f"裁剪方式 (默认 {CLIP_MODE})")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help=f"fast 模式每块要素数 (默认 {CHUNK_SIZE})")
+    args = parser.parse_args(argv)
 
-def main():
     # 1. 设定相对路径
     current_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(os.path.dirname(current_dir))
@@ -11,22 +30,25 @@ def main():
     
     # 2. 定义文件路径
     gz_boundary_path = os.path.join(input_dir, '广州市.shp')
-    bus_stops_path = os.path.join(input_dir, 'bus_stops_wgs84.shp')
-    output_path = os.path.join(output_dir, 'Gz_BusStops.shp')
+    # 中间数据不带扩展名：优先 GeoParquet，兼容旧的 Shapefile
+    bus_stops_base = os.path.join(input_dir, 'bus_stops_wgs84')
+    output_base = os.path.join(output_dir, 'Gz_BusStops')
 
     print(f"工作目录设定:")
     print(f"输入目录: {input_dir}")
     print(f"输出目录: {output_dir}")
 
     # 3. 读取数据
-    if not os.path.exists(gz_boundary_path) or not os.path.exists(bus_stops_path):
+    if not os.path.exists(gz_boundary_path) or existing_path(bus_stops_base) is None:
         print("错误：找不到输入文件，请检查文件是否在 data/raw 目录下。")
         return
 
-    print("正在读取 Shapefile (公交数据量较大，请稍候)...")
+    print("正在读取数据 (公交数据量较大，请稍候)...")
     try:
-        gdf_gz = gpd.read_file(gz_boundary_path)
-        gdf_bus = gpd.read_file(bus_stops_path)
+        gdf_gz = load_boundary(gz_boundary_path)
+        start = time.perf_counter()
+        gdf_bus = read_geodata(bus_stops_base)
+        print(f"读取 {len(gdf_bus)} 条数据，耗时 {time.perf_counter() - start:.2f}s")
     except Exception as e:
         print(f"读取失败: {e}")
         return
@@ -40,21 +62,26 @@ def main():
         gdf_bus = gdf_bus.to_crs(target_crs)
 
     # 5. 执行裁剪
-    print("正在执行掩膜/裁剪 (Clip)...")
+    print(f"正在执行掩膜/裁剪 (Clip, {args.clip_mode})...")
+    start = time.perf_counter()
     try:
-        bus_clipped = gpd.clip(gdf_bus, gdf_gz)
+        if args.clip_mode == "fast":
+            # 分块处理，内存占用与 --chunk-size 成正比
+            bus_clipped = clip_gdf(gdf_bus, gdf_gz, chunk_size=args.chunk_size)
+        else:
+            bus_clipped = gpd.clip(gdf_bus, gdf_gz)
+        print(f"裁剪耗时 {time.perf_counter() - start:.2f}s")
     except Exception as e:
         print(f"裁剪过程出错 (可能是内存不足或拓扑错误): {e}")
         return
 
     # 6. 保存结果
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    print(f"正在保存至: {output_path}")
+    print(f"正在保存至: {output_base}.parquet")
     try:
-        bus_clipped.to_file(output_path, driver='ESRI Shapefile', encoding='utf-8')
+        start = time.perf_counter()
+        written = write_geodata(bus_clipped, output_base, legacy_shp=args.legacy_shp)
         print(f"处理完成！保留了 {len(bus_clipped)} 个公交站点。")
+        print(f"已保存 {', '.join(written)} ({file_size_mb(written):.2f} MB, {time.perf_counter() - start:.2f}s)")
     except Exception as e:
         print(f"保存失败: {e}")
 
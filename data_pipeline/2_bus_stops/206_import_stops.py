@@ -1,7 +1,7 @@
-import geopandas as gpd
 from sqlalchemy import create_engine, text
-from geoalchemy2 import Geometry
+import argparse
 import os
+import sys
 
 # 【配置区】
 DB_USER = "postgres"
@@ -9,14 +9,26 @@ DB_PASSWORD = "your_password"
 DB_HOST = "localhost"
 DB_PORT = "5432"
 DB_NAME = "gis_db"
+# 同名且相距不超过该距离 (米) 的站点合并为一个物理站点
+STOP_MERGE_DISTANCE = 50
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(os.path.dirname(current_dir))
 data_processed_dir = os.path.join(project_root, 'data', 'processed')
 
-INPUT_SHP = os.path.join(data_processed_dir, "Gz_BusStops.shp")
+# 第5步生成的 Gz_BusStops.parquet (不带扩展名，兼容旧的 .shp)
+INPUT_BASE = os.path.join(data_processed_dir, "Gz_BusStops")
 
-TABLE_NAME = "Gz_BusStops" # 数据库中表的名称
+# 引用项目根目录下的共用模块
+sys.path.insert(0, project_root)
+from common.geoio import read_geodata, existing_path
+from common.bulk_load import bulk_load
+from common.university_stats import snapshot_stops, refresh_for_stop_changes
+from common.dataset_version import bump_dataset_version
+from common.projected import rebuild_projected_stops
+from common.stops import rebuild_stops, STOPS_TABLE, LINE_STOPS_TABLE
+
+TABLE_NAME = "Gz_BusStops" # 数据库中表的名称 (每条线路的每个站一行，去重后的站点表由它生成)
 
 def ingest_bus_stops_to_postgis():
     # 构建数据库连接 URL
@@ -26,9 +38,10 @@ def ingest_bus_stops_to_postgis():
     # 创建数据库引擎
     engine = create_engine(connection_url)
 
-    if not os.path.exists(INPUT_SHP):
-        print(f"错误：找不到文件 {INPUT_SHP}，请检查路径。")
-        return
+    input_path = existing_path(INPUT_BASE)
+    if input_path is None:
+        print(f"错误：找不到文件 {INPUT_BASE}.parquet，请检查路径。")
+        return False
 
     # 步骤 0：自动为数据库开启 PostGIS 插件 (如果尚未开启)
     print("正在连接数据库...", end="")
@@ -40,15 +53,11 @@ def ingest_bus_stops_to_postgis():
             print(" 连接成功且 PostGIS 扩展已就绪！")
     except Exception as e:
         print(f"\n数据库连接失败: {e}")
-        return
+        return False
    
-    # 步骤 1：读取 Shapefile 数据
-    print(f"正在读取 Shapefile: {INPUT_SHP}")
-    try:
-        gdf = gpd.read_file(INPUT_SHP, encoding='utf-8')
-    except:
-        print("   UTF-8 读取失败，尝试 GBK...")
-        gdf = gpd.read_file(INPUT_SHP, encoding='gbk')
+    # 步骤 1：读取上一步的数据 (GeoParquet，或旧的 Shapefile)
+    print(f"正在读取: {input_path}")
+    gdf = read_geodata(INPUT_BASE)
 
     print(f"   共读取到 {len(gdf)} 条公交站点数据。")
 
@@ -65,24 +74,51 @@ def ingest_bus_stops_to_postgis():
     print(f"正在写入表 '{TABLE_NAME}' (SRID: 4326)...")
     
     try:
-        gdf.to_postgis(
-            name=TABLE_NAME,          # 表名
-            con=engine,               # 数据库引擎
-            if_exists='replace',      # 如果表存在则替换 ('fail', 'replace', 'append')
-            index=False,              # 不将 DataFrame 的索引写入为单独的列
-            dtype={
-                'geometry': Geometry('Point', srid=4326) # 关键：指定几何类型为点 (Point)
-            }
-        )
+        # 先保存旧站点快照，入库后只重算周边站点有变化的高校
+        with engine.begin() as conn:
+            snapshot_stops(conn)
+
+        # COPY 到 staging 表，建好索引后原子替换，入库期间后端仍可查询旧表
+        with engine.begin() as conn:
+            timings = bulk_load(conn, gdf, TABLE_NAME, "Point", srid=4326,
+                                indexes=[("station",), ("line", "seq")])
         print(f"写入成功！公交站点数据已存入表: {TABLE_NAME}")
+        print(f"   {timings['rows']} 行：COPY {timings['copy']:.2f}s，建索引 {timings['index']:.2f}s，"
+              f"ANALYZE {timings['analyze']:.2f}s，替换 {timings['swap']:.2f}s")
+
+        # 步骤 4：按站名 + 距离合并为物理站点表，并生成线路-站点关联表
+        print(f"正在生成去重站点表 '{STOPS_TABLE}' 与关联表 '{LINE_STOPS_TABLE}'...")
+        with engine.begin() as conn:
+            raw_count, stop_count, line_stop_count = rebuild_stops(conn, STOP_MERGE_DISTANCE)
+        print(f"去重完成：{raw_count} 条线路站点 -> {stop_count} 个物理站点，{line_stop_count} 条线路-站点关联。")
+
+        # 步骤 5：刷新派生表 (周边站点统计表、米制投影表)
+        print("正在刷新统计表与投影表...")
+        with engine.begin() as conn:
+            refreshed = refresh_for_stop_changes(conn)
+            # 重建米制投影副本 (供按校园边界计算步行范围)
+            projected = rebuild_projected_stops(conn)
+            # 写入数据版本戳，通知后端刷新索引与缓存
+            version = bump_dataset_version(conn, TABLE_NAME)
+        print(f"统计表已更新：刷新了 {refreshed} 所高校。")
+        print(f"投影表已重建：{projected} 个站点 (EPSG:32649)。")
+        print(f"数据版本已更新: {TABLE_NAME} v{version}")
         
         # 可选：打印前几行验证
         print("-" * 30)
         print("数据预览 (前2行):")
         print(gdf.drop(columns='geometry').head(2))
+        return True
         
     except Exception as e:
         print(f"写入数据库失败: {e}")
+        return False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="公交站点入库，并生成去重站点表与派生表")
+    parser.parse_args(argv)
+    if not ingest_bus_stops_to_postgis():
+        sys.exit(1)
 
 if __name__ == "__main__":
-    ingest_bus_stops_to_postgis()
+    main()
@@ -0,0 +1,431 @@
+#coding:utf-8
+"""
+数据流水线调度：把 1_universities 与 2_bus_stops 的各个脚本作为 DAG 中的阶段运行。
+
+- 每个阶段声明输入 / 输出文件，依赖关系由 “输出被谁作为输入” 推出；
+- 阶段脚本本身也算输入。输入内容 (按 大小 + mtime 缓存的 sha1) 与上次成功运行时相同、
+  且输出都在时跳过该阶段；
+- 互不依赖的分支 (高校、公交站点) 各在一个子进程中运行。同一分支的阶段在同一进程内依次执行，
+  geopandas 等只导入一次，城市边界只读一次 (common/boundary.py)；
+- 每个阶段的输出写入 data/.pipeline/logs/<阶段>.log，结束后打印各阶段耗时与峰值内存，
+  并写出 data/.pipeline/report.json。峰值内存是 tracemalloc 统计的单阶段值；RSS 由 getrusage
+  给出，只有进程级的累计峰值 (本进程，以及 104 进程池等已结束的子进程)，报告中按累计值标注。
+
+    python data_pipeline/run_pipeline.py                 # 运行全部 (已是最新的阶段跳过)
+    python data_pipeline/run_pipeline.py 105 205         # 只运行到 105 与 205 (连同其上游)
+    python data_pipeline/run_pipeline.py --force 103     # 强制重跑 103 (下游随输入变化自动重跑)
+    python data_pipeline/run_pipeline.py --skip-network --skip-db --dry-run
+"""
+import argparse
+import contextlib
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+sys.path.insert(0, project_root)
+from common.atomic import atomic_write_text
+
+# 【配置区】
+# 调度状态、日志与报告的目录
+PIPELINE_DIR = os.path.join(project_root, 'data', '.pipeline')
+# 各分支并行运行的进程数上限 (1 表示全部在当前进程内依次运行)
+MAX_PROCESSES = 2
+# 是否用 tracemalloc 统计每个阶段的 Python 峰值内存 (numpy 数组也计入)，会略微拖慢运行
+TRACE_MEMORY = True
+
+NETWORK = "network"
+DATABASE = "database"
+LOCAL = "local"
+
+RAW = "data/raw"
+PROCESSED = "data/processed"
+BOUNDARY = [f"{RAW}/广州市.shp", f"{RAW}/广州市.dbf", f"{RAW}/广州市.prj"]
+
+
+class Stage:
+    """
+    一个阶段：script 中的 entry 函数。entry 接受 argv 时以 argv 调用 (不读取调度器的命令行)，
+    否则无参调用。inputs / outputs 为相对项目根目录的文件或目录
+    """
+
+    def __init__(self, stage_id, script, entry, inputs=(), outputs=(), kind=LOCAL, argv=True):
+        self.id = stage_id
+        self.script = script
+        self.entry = entry
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.kind = kind
+        self.argv = argv
+
+    def __repr__(self):
+        return f"Stage({self.id})"
+
+
+STAGES = [
+    Stage("101", "data_pipeline/1_universities/101_scrape_names.py", "fetch_university_list",
+          outputs=[f"{RAW}/University Name.csv"], kind=NETWORK, argv=False),
+    Stage("102", "data_pipeline/1_universities/102_fetch_baidu_boundary.py", "main",
+          inputs=[f"{RAW}/University Name.csv"], outputs=[f"{RAW}/university_geo.csv"], kind=NETWORK),
+    Stage("103", "data_pipeline/1_universities/103_geo_to_geometry.py", "main",
+          inputs=[f"{RAW}/university_geo.csv"], outputs=[f"{RAW}/university_bd09mc.parquet"]),
+    Stage("104", "data_pipeline/1_universities/104_geometry_to_wgs84.py", "main",
+          inputs=[f"{RAW}/university_bd09mc.parquet"], outputs=[f"{RAW}/university_wgs84.parquet"]),
+    Stage("105", "data_pipeline/1_universities/105_gz_universities.py", "main",
+          inputs=[f"{RAW}/university_wgs84.parquet"] + BOUNDARY, outputs=[f"{PROCESSED}/Gz_university.parquet"]),
+    Stage("106", "data_pipeline/1_universities/106_import_universities.py", "main",
+          inputs=[f"{PROCESSED}/Gz_university.parquet"], outputs=[f"{PROCESSED}/Gz_universities.manifest.json"],
+          kind=DATABASE),
+    Stage("201", "data_pipeline/2_bus_stops/201_scrape_lines.py", "main",
+          outputs=[f"{RAW}/bus_names.txt"], kind=NETWORK, argv=False),
+    Stage("202", "data_pipeline/2_bus_stops/202_scrape_stops.py", "main",
+          outputs=[f"{RAW}/bus_stops"], kind=NETWORK),
+    Stage("203", "data_pipeline/2_bus_stops/203_fetch_stops_coords.py", "main",
+          inputs=[f"{RAW}/bus_stops"], outputs=[f"{RAW}/bus_stops_bd09mc.parquet"], kind=NETWORK),
+    Stage("204", "data_pipeline/2_bus_stops/204_coors_transform.py", "main",
+          inputs=[f"{RAW}/bus_stops_bd09mc.parquet"], outputs=[f"{RAW}/bus_stops_wgs84.parquet"]),
+    Stage("205", "data_pipeline/2_bus_stops/205_gz_stops.py", "main",
+          inputs=[f"{RAW}/bus_stops_wgs84.parquet"] + BOUNDARY, outputs=[f"{PROCESSED}/Gz_BusStops.parquet"]),
+    Stage("206", "data_pipeline/2_bus_stops/206_import_stops.py", "main",
+          inputs=[f"{PROCESSED}/Gz_BusStops.parquet"], kind=DATABASE),
+]
+
+
+def build_graph(stages):
+    """返回 {阶段: 上游阶段列表}；同一文件由多个阶段输出时报错"""
+    producers = {}
+    for stage in stages:
+        for path in stage.outputs:
+            if path in producers:
+                raise ValueError(f"{path} 同时由 {producers[path].id} 与 {stage.id} 输出")
+            producers[path] = stage
+    return {stage.id: [producers[p].id for p in stage.inputs if p in producers] for stage in stages}
+
+
+def topological_order(stages, upstream):
+    order, state = [], {}
+
+    def visit(stage_id):
+        if state.get(stage_id) == "done":
+            return
+        if state.get(stage_id) == "visiting":
+            raise ValueError(f"阶段之间存在循环依赖: {stage_id}")
+        state[stage_id] = "visiting"
+        for dep in upstream[stage_id]:
+            visit(dep)
+        state[stage_id] = "done"
+        order.append(stage_id)
+
+    for stage in stages:
+        visit(stage.id)
+    return order
+
+
+def select_stages(targets, upstream):
+    """targets 及其全部上游；targets 为空时选中全部"""
+    if not targets:
+        return set(upstream)
+    selected, todo = set(), list(targets)
+    while todo:
+        stage_id = todo.pop()
+        if stage_id not in upstream:
+            raise ValueError(f"未知阶段: {stage_id}")
+        if stage_id not in selected:
+            selected.add(stage_id)
+            todo.extend(upstream[stage_id])
+    return selected
+
+
+def branches(order, upstream):
+    """按依赖关系把阶段分为互不相连的分支，每个分支内保持拓扑顺序"""
+    parent = {stage_id: stage_id for stage_id in order}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for stage_id in order:
+        for dep in upstream[stage_id]:
+            if dep in parent:
+                parent[find(dep)] = find(stage_id)
+    groups = {}
+    for stage_id in order:
+        groups.setdefault(find(stage_id), []).append(stage_id)
+    return list(groups.values())
+
+
+# --- 输入指纹 ---
+
+class Fingerprints:
+    """文件内容 sha1，按 (大小, mtime) 缓存，未改动的大文件不重复计算；目录取其中各文件的 名称 + 大小 + mtime"""
+
+    def __init__(self, known=None):
+        self._known = dict(known or {})
+
+    def __call__(self, rel_path):
+        path = os.path.join(project_root, rel_path)
+        if not os.path.exists(path):
+            return None
+        if os.path.isdir(path):
+            h = hashlib.sha1()
+            for entry in sorted(os.scandir(path), key=lambda e: e.name):
+                if entry.is_file() and not entry.name.startswith('.'):
+                    st = entry.stat()
+                    h.update(f"{entry.name}\x1f{st.st_size}\x1f{st.st_mtime_ns}\x1e".encode("utf-8"))
+            return {"dir": h.hexdigest()}
+        st = os.stat(path)
+        known = self._known.get(rel_path)
+        if known and known.get("stat") == [st.st_size, st.st_mtime_ns]:
+            return known
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self._known[rel_path] = {"stat": [st.st_size, st.st_mtime_ns], "sha1": h.hexdigest()}
+        return self._known[rel_path]
+
+
+def _same(a, b):
+    """比较两个指纹 (mtime 不同但内容相同的文件视为相同)"""
+    if a is None or b is None:
+        return a is b
+    return a.get("sha1", a.get("dir")) == b.get("sha1", b.get("dir"))
+
+
+def state_path(stage_id):
+    return os.path.join(PIPELINE_DIR, f"{stage_id}.json")
+
+
+def load_state(stage_id):
+    path = state_path(stage_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def stale_reason(stage, fingerprint, force):
+    """需要运行的原因；已是最新时返回 None"""
+    if force:
+        return "强制运行"
+    for path in stage.outputs:
+        if fingerprint(path) is None:
+            return f"缺少输出 {path}"
+    state = load_state(stage.id)
+    if state is None:
+        return "没有运行记录"
+    for path in [stage.script] + stage.inputs:
+        if not _same(fingerprint(path), state["inputs"].get(path)):
+            return f"输入变化 {path}"
+    for path in stage.outputs:
+        if not _same(fingerprint(path), state["outputs"].get(path)):
+            return f"输出被修改 {path}"
+    return None
+
+
+def save_state(stage, fingerprint):
+    state = {
+        "inputs": {path: fingerprint(path) for path in [stage.script] + stage.inputs},
+        "outputs": {path: fingerprint(path) for path in stage.outputs},
+        "finished_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    atomic_write_text(state_path(stage.id), json.dumps(state, ensure_ascii=False, indent=1))
+
+
+# --- 运行 ---
+
+class _Tee:
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def write(self, text):
+        for stream in self.streams:
+            stream.write(text)
+        return len(text)
+
+    def flush(self):
+        for stream in self.streams:
+            stream.flush()
+
+
+_modules = {}
+
+
+def load_entry(stage):
+    """导入阶段脚本 (同一进程内只导入一次)，返回入口函数"""
+    if stage.script not in _modules:
+        spec = importlib.util.spec_from_file_location(f"stage_{stage.id}", os.path.join(project_root, stage.script))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[stage.script] = module
+    return getattr(_modules[stage.script], stage.entry)
+
+
+def max_rss_mb(children=False):
+    """
+    峰值常驻内存 (MB)，是进程至今的累计峰值，不是单个阶段的值。children=True 时为已结束的子进程
+    (如 104 的进程池) 中最大的峰值。不支持的平台 (Windows) 返回 None
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def run_stage(stage, verbose=False, trace_memory=TRACE_MEMORY):
+    """运行一个阶段，输出写入日志文件；返回 (是否成功, 耗时, tracemalloc 峰值 MB, 错误信息)"""
+    log_path = os.path.join(PIPELINE_DIR, "logs", f"{stage.id}.log")
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    error = None
+    if trace_memory:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        out = _Tee(log, sys.stdout) if verbose else log
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+            try:
+                entry = load_entry(stage)
+                entry([]) if stage.argv else entry()
+            except SystemExit as e:
+                if e.code not in (None, 0):
+                    error = f"SystemExit({e.code})"
+            except Exception as e:
+                import traceback
+                traceback.print_exc()
+                error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024 if trace_memory else None
+    return error is None, seconds, peak, error
+
+
+def run_branch(stage_ids, options):
+    """
+    在当前进程内按顺序运行一个分支，返回各阶段的结果 (可在子进程中调用)。
+    上游失败或被跳过但缺少输出时，下游标记为 blocked
+    """
+    stages = {stage.id: stage for stage in STAGES}
+    upstream = build_graph(STAGES)
+    fingerprint = Fingerprints()
+    if options["trace_memory"]:
+        tracemalloc.start()
+    results, failed, will_run = [], set(), set()
+    for stage_id in stage_ids:
+        stage = stages[stage_id]
+        result = {"stage": stage_id, "kind": stage.kind, "status": None, "seconds": 0.0,
+                  "peak_mb": None, "max_rss_mb": None, "children_rss_mb": None, "reason": None, "pid": os.getpid()}
+        results.append(result)
+
+        blocked = [dep for dep in upstream[stage_id] if dep in failed]
+        if blocked:
+            result.update(status="blocked", reason=f"上游 {', '.join(blocked)} 未完成")
+            failed.add(stage_id)
+            continue
+
+        reason = stale_reason(stage, fingerprint, stage_id in options["force"] or "all" in options["force"])
+        if reason is None and any(dep in will_run for dep in upstream[stage_id]):
+            reason = "上游将重新运行"
+        skip_kind = (stage.kind == NETWORK and options["skip_network"]) or \
+                    (stage.kind == DATABASE and options["skip_db"])
+        if reason is None or skip_kind:
+            missing = [path for path in stage.outputs if fingerprint(path) is None]
+            if missing:
+                result.update(status="blocked", reason=f"已跳过 ({stage.kind})，缺少输出 {missing[0]}")
+                failed.add(stage_id)
+            else:
+                result.update(status="skipped", reason="已是最新" if reason is None else f"已跳过 ({stage.kind})")
+            continue
+
+        if options["dry_run"]:
+            result.update(status="would run", reason=reason)
+            will_run.add(stage_id)
+            continue
+
+        print(f"[{stage_id}] 开始 ({reason})", flush=True)
+        ok, seconds, peak, error = run_stage(stage, options["verbose"], options["trace_memory"])
+        missing = [path for path in stage.outputs if fingerprint(path) is None]
+        if ok and missing:
+            ok, error = False, f"未生成输出 {missing[0]}"
+        result.update(status="ok" if ok else "failed", seconds=seconds, peak_mb=peak,
+                      max_rss_mb=max_rss_mb(), children_rss_mb=max_rss_mb(children=True),
+                      reason=reason if ok else error)
+        if ok:
+            save_state(stage, fingerprint)
+        else:
+            failed.add(stage_id)
+        print(f"[{stage_id}] {'完成' if ok else '失败'} {seconds:.1f}s"
+              + (f"，峰值内存 {peak:.1f} MB" if peak is not None else "")
+              + ("" if ok else f"：{error} (日志 {os.path.relpath(os.path.join(PIPELINE_DIR, 'logs', stage_id + '.log'), project_root)})"),
+              flush=True)
+    if options["trace_memory"]:
+        tracemalloc.stop()
+    return results
+
+
+def print_report(results, elapsed):
+    def fmt(value, spec):
+        return "-" if value is None else format(value, spec)
+
+    # RSS 两列是所在分支进程截至该阶段结束时的累计峰值，不是各阶段单独的值
+    print(f"\n{'阶段':<6}{'状态':<12}{'耗时(s)':>10}{'峰值(MB)':>10}{'累计RSS(MB)':>13}{'子进程RSS(MB)':>14}  说明")
+    for r in results:
+        print(f"{r['stage']:<8}{r['status']:<12}{fmt(r['seconds'] if r['status'] in ('ok', 'failed') else None, '.2f'):>10}"
+              f"{fmt(r['peak_mb'], '.1f'):>10}{fmt(r['max_rss_mb'], '.0f'):>15}{fmt(r.get('children_rss_mb'), '.0f'):>17}"
+              f"  {r['reason'] or ''}")
+    print(f"总耗时 {elapsed:.1f}s (RSS 为分支进程 / 其已结束子进程截至该阶段的累计峰值)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", help="要运行到的阶段 (连同上游)，默认全部")
+    parser.add_argument("--force", nargs="+", default=[], metavar="STAGE", help="强制重跑的阶段，all 表示全部")
+    parser.add_argument("--skip-network", action="store_true", help="不运行需要联网抓取的阶段 (输出已存在时直接使用)")
+    parser.add_argument("--skip-db", action="store_true", help="不运行入库阶段")
+    parser.add_argument("--processes", type=int, default=MAX_PROCESSES, help=f"并行分支的进程数 (默认 {MAX_PROCESSES})")
+    parser.add_argument("--no-trace-memory", action="store_true", help="不统计 tracemalloc 峰值内存")
+    parser.add_argument("--dry-run", action="store_true", help="只显示各阶段是否需要运行")
+    parser.add_argument("--verbose", action="store_true", help="阶段输出同时打印到终端")
+    args = parser.parse_args(argv)
+
+    upstream = build_graph(STAGES)
+    selected = select_stages(args.targets, upstream)
+    order = [stage_id for stage_id in topological_order(STAGES, upstream) if stage_id in selected]
+    groups = branches(order, upstream)
+    options = {"force": set(args.force), "skip_network": args.skip_network, "skip_db": args.skip_db,
+               "dry_run": args.dry_run, "verbose": args.verbose, "trace_memory": not args.no_trace_memory}
+
+    processes = min(args.processes, len(groups))
+    print(f"共 {len(order)} 个阶段，{len(groups)} 个分支: "
+          + " | ".join(" -> ".join(group) for group in groups)
+          + (f" ({processes} 个进程并行)" if processes > 1 else ""))
+
+    start = time.perf_counter()
+    if processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(run_branch, group, options) for group in groups]
+            branch_results = [future.result() for future in futures]
+    else:
+        branch_results = [run_branch(group, options) for group in groups]
+    elapsed = time.perf_counter() - start
+
+    position = {stage_id: i for i, stage_id in enumerate(order)}
+    results = sorted((r for group in branch_results for r in group), key=lambda r: position[r["stage"]])
+    print_report(results, elapsed)
+    if not args.dry_run:
+        atomic_write_text(os.path.join(PIPELINE_DIR, "report.json"),
+                          json.dumps({"elapsed": elapsed, "stages": results}, ensure_ascii=False, indent=1))
+    return 1 if any(r["status"] in ("failed", "blocked") for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
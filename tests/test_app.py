@@ -0,0 +1,82 @@
+"""后端请求解析与名称解析 (不访问数据库)"""
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+pytest.importorskip("psycopg2")
+pytest.importorskip("numpy")
+
+import app as backend
+from name_search import NameIndex
+
+
+def test_parse_batch_request_names_then_points():
+    queries, k, max_radius = backend.parse_batch_request(
+        {"names": [" 中山大学 "], "points": [[113.3, 23.1], {"lon": 113.4, "lat": 23.2}], "k": 3})
+    assert queries == [{"name": "中山大学"}, {"lon": 113.3, "lat": 23.1}, {"lon": 113.4, "lat": 23.2}]
+    assert (k, max_radius) == (3, None)
+    assert backend.parse_batch_request({"points": [[113.3, 23.1]], "max_radius": 500})[2] == 500.0
+
+
+@pytest.mark.parametrize("body", [
+    {"points": [[113.3, 23.1]], "k": True},
+    {"points": [[113.3, 23.1]], "max_radius": True},
+    {"points": [[True, False]]},
+    {"points": [{"lon": 113.3, "lat": True}]},
+    {"points": [[113.3, 23.1]], "k": 0},
+    {"points": [[113.3, 23.1]], "k": 1.5},
+    {"points": [[113.3, 23.1]], "max_radius": -1},
+    {"points": [[200, 23.1]]},
+    {"points": [["a", "b"]]},
+    {"points": [[113.3, 23.1]], "crs": "epsg3857"},
+    {"names": [""]},
+    {},
+    [],
+])
+def test_parse_batch_request_rejects_invalid(body):
+    with pytest.raises(ValueError):
+        backend.parse_batch_request(body)
+
+
+def test_parse_batch_request_converts_crs():
+    from common.coords import transform
+
+    queries, _, _ = backend.parse_batch_request({"points": [[113.3, 23.1]], "crs": "gcj02"})
+    lon, lat = transform(113.3, 23.1, "gcj02", "wgs84")
+    assert queries == [{"lon": lon, "lat": lat}]
+
+
+def test_batch_endpoint_returns_400_for_bool_k():
+    response = backend.app.test_client().post("/api/nearest_bus_stops", json={"points": [[113.3, 23.1]], "k": True})
+    assert response.status_code == 400
+    assert "k" in response.get_json()["error"]
+
+
+def test_parse_distances():
+    assert backend.parse_distances("") == backend.config.CATCHMENT_DEFAULT_DISTANCES
+    assert backend.parse_distances("500, 100,100.7,") == (100, 500)
+
+
+@pytest.mark.parametrize("raw", ["inf", "-inf", "1e400", "nan", "100,abc", ",", "-5", "999999"])
+def test_parse_distances_rejects_invalid(raw):
+    with pytest.raises(ValueError):
+        backend.parse_distances(raw)
+    # 缓存键的规范化同样不能抛出其它异常
+    assert backend.normalize_catchment_args({"name": "中山大学", "distances": raw})[1] is None
+
+
+@pytest.mark.parametrize("raw", ["inf", "1e400"])
+def test_catchment_returns_400_for_non_finite_distances(raw):
+    response = backend.app.test_client().get(f"/api/catchment?name=中山大学&distances={raw}")
+    assert response.status_code == 400
+    assert "distances" in response.get_json()["error"]
+
+
+def test_resolve_university_name_uses_stored_spelling(monkeypatch):
+    monkeypatch.setattr(backend.name_index, "current", NameIndex(["South China Normal University", "华南理工大学"]))
+    assert backend.resolve_university_name("south china normal university") == "South China Normal University"
+    assert backend.resolve_university_name("华工") == "华南理工大学"
+    assert backend.resolve_university_name("不存在的学校") == "不存在的学校"
+
+    monkeypatch.setattr(backend.name_index, "current", None)
+    assert backend.resolve_university_name("华工") == "华工"
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+from common.coords import transform, transform_array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+from coords_reference import REFERENCE
+
+# 广州范围内的样本：百度墨卡托与经纬度各一组
+MERCATOR = [(12600000.0 + i * 5000.0, 2560000.0 + j * 5000.0) for i in range(10) for j in range(10)]
+LONLAT = [(112.95 + i * 0.1, 22.55 + j * 0.15) for i in range(10) for j in range(10)]
+TOLERANCE = 1e-9
+
+
+def samples(src):
+    return MERCATOR if src == "bd09mc" else LONLAT
+
+
+@pytest.mark.parametrize("src, dst", list(REFERENCE))
+def test_scalar_matches_original_formulas(src, dst):
+    reference = REFERENCE[(src, dst)]
+    for x, y in samples(src):
+        rx, ry = reference(x, y)
+        tx, ty = transform(x, y, src, dst)
+        assert abs(tx - rx) <= TOLERANCE and abs(ty - ry) <= TOLERANCE
+
+
+@pytest.mark.parametrize("src, dst", list(REFERENCE))
+def test_array_matches_original_formulas(src, dst):
+    np = pytest.importorskip("numpy")
+    reference = REFERENCE[(src, dst)]
+    xs, ys = np.array(samples(src)).T
+    rx, ry = np.array([reference(x, y) for x, y in zip(xs.tolist(), ys.tolist())]).T
+    tx, ty = transform_array(xs, ys, src, dst)
+    assert np.abs(tx - rx).max() <= TOLERANCE
+    assert np.abs(ty - ry).max() <= TOLERANCE
+
+
+def test_round_trips():
+    for lng, lat in LONLAT:
+        x, y = transform(lng, lat, "wgs84", "bd09mc")
+        back = transform(x, y, "bd09mc", "wgs84", exact=True)
+        assert abs(back[0] - lng) < 1e-6 and abs(back[1] - lat) < 1e-6
+
+        gcj = transform(lng, lat, "wgs84", "gcj02")
+        exact = transform(*gcj, "gcj02", "wgs84", exact=True)
+        assert abs(exact[0] - lng) < 1e-9 and abs(exact[1] - lat) < 1e-9
+
+
+def test_unknown_crs_and_exact_with_grid_are_rejected():
+    with pytest.raises(ValueError):
+        transform(113.3, 23.1, "wgs84", "epsg3857")
+    pytest.importorskip("numpy")
+    with pytest.raises(ValueError):
+        transform_array([113.3], [23.1], "gcj02", "wgs84", exact=True, grid=object())
@@ -0,0 +1,52 @@
+import contextlib
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import data_version
+from data_version import DataVersion
+
+
+class FakeEngine:
+    @contextlib.contextmanager
+    def connect(self):
+        yield None
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    rows = [("Gz_Stops", 1, datetime(2024, 1, 1))]
+    monkeypatch.setattr(data_version, "fetch_dataset_versions", lambda conn: list(rows))
+    return rows
+
+
+def test_token_is_published_after_listeners(versions):
+    watcher = DataVersion(FakeEngine(), check_seconds=0)
+    seen = []
+    watcher.add_listener(lambda token: seen.append((token, watcher.token)))
+
+    first = watcher.check()
+    assert seen == [(first, None)]
+    assert watcher.last_modified == datetime(2024, 1, 1)
+
+    versions[0] = ("Gz_Stops", 2, datetime(2024, 1, 2))
+    second = watcher.check()
+    assert second != first
+    # 订阅方刷新期间 token 仍是旧版本
+    assert seen[-1] == (second, first)
+    assert watcher.token == second
+
+
+def test_failing_listener_does_not_block_others(versions):
+    watcher = DataVersion(FakeEngine(), check_seconds=0)
+    called = []
+
+    def broken(token):
+        raise RuntimeError("reload failed")
+
+    watcher.add_listener(broken)
+    watcher.add_listener(called.append)
+    token = watcher.check()
+    assert called == [token] and watcher.token == token
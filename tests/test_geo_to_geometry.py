@@ -0,0 +1,85 @@
+"""103_geo_to_geometry.py：批量解析与逐行解析一致、编码识别"""
+import pytest
+
+pytest.importorskip("geopandas")
+np = pytest.importorskip("numpy")
+shapely = pytest.importorskip("shapely")
+
+SCRIPT = "data_pipeline/1_universities/103_geo_to_geometry.py"
+
+SQUARE = "1-0,0,10,0,10,10,0,10,0,0"
+GEO_STRINGS = [
+    f"4|bound|{SQUARE}",
+    f"4|bound|{SQUARE};1-20,20,30,20,30,30,20,30",       # 两个校区，第二个未闭合
+    "4|bound|1-0,0,10,10,10,0,0,10,0,0",                  # 自相交，需要修复
+    "4|bound|1-0,0,10,0,10,10,0,10,0,0,5",                # 奇数个数值，丢弃最后一个
+    "4|bound|1-0,0,10,0,0,0",                             # 首尾相同的 3 点段
+    "4|bound|1-0,0,10,0,x,10,0,10,0,0",                   # 无法解析的数值
+    "4|bound",
+    None,
+    "",
+]
+
+
+def test_bulk_parse_matches_row_by_row(load_script):
+    module = load_script(SCRIPT)
+    bulk = module.parse_baidu_geo_bulk(GEO_STRINGS)
+    assert len(bulk) == len(GEO_STRINGS)
+    for geo, fast in zip(GEO_STRINGS, bulk):
+        slow = module.parse_baidu_geo(geo)
+        if slow is None or slow.is_empty:
+            assert fast is None or fast.is_empty
+        else:
+            assert fast is not None and shapely.equals(fast, slow)
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "gbk"])
+def test_detect_encoding_reads_past_ascii_prefix(load_script, tmp_path, encoding):
+    module = load_script(SCRIPT)
+    path = tmp_path / "university_geo.csv"
+    # 开头的 ASCII 比一次读取的字节数更长，中文名称在后面
+    path.write_bytes(("name,geo\n" + "x" * 100 + ",4|bound|" + "1" * 300 + "\n华南理工大学,\n").encode(encoding))
+    assert module.detect_encoding(str(path), sniff_bytes=64) == encoding
+
+
+def test_detect_encoding_tolerates_truncated_utf8_character(load_script, tmp_path):
+    module = load_script(SCRIPT)
+    data = "大学".encode("utf-8")
+    path = tmp_path / "university_geo.csv"
+    path.write_bytes(data)
+    # 读取的样本在第一个汉字中间截断
+    assert module.detect_encoding(str(path), sniff_bytes=2) == "utf-8"
+
+
+def test_incremental_run_hashes_schools_split_across_chunks(load_script, tmp_path, monkeypatch, capsys):
+    pd = pytest.importorskip("pandas")
+    from common.geoio import read_geodata
+
+    module = load_script(SCRIPT)
+    # main() 由脚本位置推出 data/raw，放到临时目录下的同名层级中
+    monkeypatch.setattr(module, "__file__", str(tmp_path / "data_pipeline" / "1_universities" / "103.py"))
+    raw = tmp_path / "data" / "raw"
+    raw.mkdir(parents=True)
+
+    def run(rows):
+        pd.DataFrame(rows, columns=["name", "uid", "geo"]).to_csv(raw / "university_geo.csv", index=False)
+        # 每块 2 行：乙大学的两个校区分在两块
+        module.main(["--chunk-rows", "2"])
+        return read_geodata(str(raw / "university_bd09mc"))
+
+    rows = [["甲大学", "u1", f"4|bound|{SQUARE}"],
+            ["乙大学", "u2", f"4|bound|{SQUARE}"],
+            ["乙大学", "u2", "4|bound|1-20,20,30,20,30,30,20,30,20,20"],
+            ["丙大学", "u3", f"4|bound|{SQUARE}"]]
+    assert run(rows)["name"].tolist() == ["甲大学", "乙大学", "乙大学", "丙大学"]
+
+    # 只修改乙大学在第一块中的校区：整组哈希变化，乙大学两行都按新输入重新解析，不残留旧行
+    rows[1][2] = "4|bound|1-40,40,50,40,50,50,40,50,40,40"
+    output = run(rows)
+    assert output["name"].tolist() == ["甲大学", "乙大学", "乙大学", "丙大学"]
+    assert output[output["name"] == "乙大学"].geometry.total_bounds.tolist() == [20.0, 20.0, 50.0, 50.0]
+
+    # 再次运行、输入不变：只计算哈希即跳过
+    capsys.readouterr()
+    assert run(rows).equals(output)
+    assert "3 所学校均无变化" in capsys.readouterr().out
@@ -0,0 +1,68 @@
+import pytest
+
+from common.incremental import Manifest, manifest_path, merge_outputs, row_hashes
+
+
+def test_manifest_changed_and_removed(tmp_path):
+    path = manifest_path(str(tmp_path / "out"))
+    Manifest(path, params={"repair": "buffer"}).save({"a": "1", "b": "2", "c": "3"})
+
+    manifest = Manifest(path, params={"repair": "buffer"})
+    hashes = {"a": "1", "b": "changed", "d": "4"}
+    assert manifest.changed(hashes) == ["b", "d"]
+    assert manifest.removed(hashes) == ["c"]
+
+
+def test_manifest_params_change_resets_records(tmp_path):
+    path = manifest_path(str(tmp_path / "out"))
+    Manifest(path, params={"grid": (0.01, 0.01)}).save({"a": "1"})
+
+    # tuple 与读回的 list 视为相同参数
+    assert Manifest(path, params={"grid": (0.01, 0.01)}).changed({"a": "1"}) == []
+    reset = Manifest(path, params={"grid": (0.02, 0.02)})
+    assert reset.records == {}
+    assert reset.changed({"a": "1"}) == ["a"]
+    assert reset.removed({"a": "1"}) == []
+
+
+def test_merge_outputs_keeps_input_order():
+    pd = pytest.importorskip("pandas")
+    previous = pd.DataFrame({"name": ["a", "b", "c"], "v": [1, 2, 3]})
+    processed = pd.DataFrame({"name": ["b", "d"], "v": [20, 40]})
+
+    merged = merge_outputs(previous, processed, replaced=["b", "d"], order=["d", "a", "b", "c"])
+    assert merged["name"].tolist() == ["d", "a", "b", "c"]
+    assert merged["v"].tolist() == [40, 1, 20, 3]
+
+
+def test_merge_outputs_drops_keys_missing_from_input_after_manifest_reset():
+    pd = pytest.importorskip("pandas")
+    previous = pd.DataFrame({"name": ["a", "gone", "b"], "v": [1, 2, 3]})
+    # 清单失效时全部记录都算变化、removed 为空；已从输入中删除的 "gone" 不能留在输出里
+    processed = pd.DataFrame({"name": ["a", "b"], "v": [10, 30]})
+
+    merged = merge_outputs(previous, processed, replaced=["a", "b"], order=["a", "b"])
+    assert merged["name"].tolist() == ["a", "b"]
+    assert merged["v"].tolist() == [10, 30]
+
+
+def test_merge_outputs_without_processed_rows():
+    pd = pytest.importorskip("pandas")
+    previous = pd.DataFrame({"name": ["a", "b", "c"], "v": [1, 2, 3]})
+
+    merged = merge_outputs(previous, processed=None, replaced=[], order=["c", "a"])
+    assert merged["name"].tolist() == ["c", "a"]
+    assert merge_outputs(None, previous, replaced=[], order=[]) is previous
+
+
+def test_row_hashes_accumulate_across_chunks():
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("shapely")
+    df = pd.DataFrame({"name": ["a", "b", "b", "c", "b"], "v": [1, 2, 3, 4, 5]})
+
+    digests = {}
+    assert row_hashes(df.iloc[:2], digests=digests).keys() == {"a", "b"}
+    row_hashes(df.iloc[2:], digests=digests)
+    # 跨块、不相邻的同名行与一次计算整个表的结果相同
+    assert {k: h.hexdigest() for k, h in digests.items()} == row_hashes(df)
+    assert row_hashes(df)["b"] != row_hashes(df.iloc[:3])["b"]
@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from name_search import NameIndex, resolve_name
+
+NAMES = ["华南理工大学", "中山大学", "广东工业大学", "South China Normal University"]
+
+
+@pytest.fixture
+def index():
+    return NameIndex(NAMES)
+
+
+def test_canonical_ignores_case_and_spacing(index):
+    assert index.canonical("south  china normal UNIVERSITY") == "South China Normal University"
+    assert index.canonical(" 中山 大学 ") == "中山大学"
+    assert index.canonical("中山") is None
+
+
+def test_resolve_name(index):
+    # 大小写 / 空白不同时解析为库中的写法，而不是原样返回
+    assert resolve_name(index, "SOUTH CHINA NORMAL UNIVERSITY") == "South China Normal University"
+    assert resolve_name(index, "华工") == "华南理工大学"
+    assert resolve_name(index, "中山大") == "中山大学"
+    assert resolve_name(index, "完全无关的名字") == "完全无关的名字"
+    assert resolve_name(None, "华工") == "华工"
+
+
+def test_search_ranks_exact_match_first(index):
+    results = index.search("中山大学")
+    assert results[0][:2] == ("中山大学", "exact")
+    assert index.search("") == []
@@ -0,0 +1,60 @@
+import ntpath
+import threading
+import time
+from types import SimpleNamespace
+
+import profiler as profiler_module
+from profiler import SamplingProfiler
+
+
+def busy(profiler, stop):
+    profiler.enter("busy")
+    while not stop.is_set():
+        sum(range(1000))
+    profiler.exit()
+
+
+def test_samples_registered_request_threads():
+    profiler = SamplingProfiler()
+    assert profiler.start(endpoint="busy", seconds=5, interval=0.001)
+    stop = threading.Event()
+    worker = threading.Thread(target=busy, args=(profiler, stop))
+    worker.start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    status = profiler.status()
+    assert not status["running"] and status["finished_at"] is not None
+    assert status["samples"] > 0
+    assert all(line.startswith("busy;") for line in profiler.collapsed().splitlines())
+
+
+def test_restart_after_stop_runs_a_single_sampler():
+    profiler = SamplingProfiler()
+    assert profiler.start(seconds=5)
+    assert not profiler.start(seconds=5)
+    profiler.stop()
+    assert profiler.start(seconds=5)
+    assert profiler.running
+    # 旧会话的线程已退出，不会在收尾时把新会话标记为结束
+    assert sum(t.name == "sampling-profiler" for t in threading.enumerate()) == 1
+    profiler.stop()
+    assert not profiler.running
+
+
+def test_session_ends_after_duration():
+    profiler = SamplingProfiler()
+    profiler.start(seconds=0.05, interval=0.01)
+    profiler._thread.join(timeout=2)
+    assert not profiler.running
+
+
+def test_collapsed_stack_strips_windows_paths(monkeypatch):
+    # waitress 可在 Windows 上运行：co_filename 为反斜杠路径时也只保留文件名
+    monkeypatch.setattr(profiler_module, "os", SimpleNamespace(path=ntpath))
+    namespace = {}
+    exec(compile("import sys\nframe = sys._getframe()", r"C:\srv\backend\app.py", "exec"), namespace)
+    stack = SamplingProfiler._collapse("busy", namespace["frame"])
+    assert stack.startswith("busy;") and stack.split(";")[-1] == "<module> (app.py:2)"
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("requests")
+
+from common.ratelimit import TokenBucket, backoff_delay
+
+
+def test_reserve_queues_callers_at_rate():
+    bucket = TokenBucket(rate=10, burst=2)
+    waits = [bucket.reserve() for _ in range(4)]
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1, abs=0.01)
+    assert waits[3] == pytest.approx(0.2, abs=0.01)
+
+
+def test_refund_returns_unused_token():
+    bucket = TokenBucket(rate=10, burst=1)
+    bucket.reserve()
+    bucket.refund()
+    assert bucket.reserve() == 0.0
+
+
+def test_pause_delays_next_request_for_everyone():
+    bucket = TokenBucket(rate=10, burst=5)
+    bucket.pause(2.0)
+    assert bucket.reserve() == pytest.approx(2.0, abs=0.01)
+    assert bucket.reserve() == pytest.approx(2.1, abs=0.01)
+    # 再次暂停不会缩短已经在排队的等待
+    bucket.pause(0.5)
+    assert bucket.reserve() == pytest.approx(2.2, abs=0.01)
+
+
+def test_invalid_rate_and_backoff_cap():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+    class Fixed:
+        @staticmethod
+        def uniform(a, b):
+            return b
+
+    assert backoff_delay(0, base=1.0, cap=30.0, rng=Fixed) == 1.0
+    assert backoff_delay(10, base=1.0, cap=30.0, rng=Fixed) == 30.0
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("flask")
+
+from flask import Flask, jsonify, request
+
+from response_cache import ResponseCache, cached_endpoint
+
+
+def test_get_put_and_token_invalidation():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    cache.put("k", "v1", b"body", 200, "application/json")
+
+    assert cache.get("k", "v1").body == b"body"
+    assert cache.get("k", "v2") is None
+    # 旧版本条目在 get 时已删除
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_eviction_and_ttl():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.put("a", "t", b"a", 200, "text/plain")
+    cache.put("b", "t", b"b", 200, "text/plain")
+    cache.get("a", "t")
+    cache.put("c", "t", b"c", 200, "text/plain")
+    assert cache.get("b", "t") is None
+    assert cache.get("a", "t") is not None
+
+    expired = ResponseCache(ttl=-1)
+    expired.put("a", "t", b"a", 200, "text/plain")
+    assert expired.get("a", "t") is None
+
+
+def test_on_data_change_drops_other_versions():
+    cache = ResponseCache()
+    cache.put("a", "old", b"a", 200, "text/plain")
+    cache.put("b", "new", b"b", 200, "text/plain")
+    cache.on_data_change("new")
+    assert len(cache) == 1 and cache.get("b", "new") is not None
+
+
+def test_etag_is_stable_within_a_version():
+    cache = ResponseCache()
+    first = cache.put("a", "v1", b"same", 200, "text/plain").etag
+    assert cache.put("b", "v1", b"same", 200, "text/plain").etag == first
+    assert cache.put("c", "v2", b"same", 200, "text/plain").etag != first
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    cache = ResponseCache()
+    version = SimpleNamespace(token="v1", last_modified=None)
+    calls = []
+
+    @app.route("/items")
+    @cached_endpoint(cache, version, "items", lambda args: args.get("q", ""))
+    def items():
+        calls.append(request.args.get("q"))
+        if request.args.get("q") == "error":
+            return jsonify({"error": "boom"}), 500
+        return jsonify({"q": request.args.get("q"), "call": len(calls)})
+
+    client = app.test_client()
+    client.calls, client.version = calls, version
+    return client
+
+
+def test_cached_endpoint_serves_cache_and_304(client):
+    first = client.get("/items?q=a")
+    assert first.status_code == 200 and first.headers["ETag"]
+    assert client.get("/items?q=a").get_json() == first.get_json()
+    assert client.calls == ["a"]
+
+    conditional = client.get("/items?q=a", headers={"If-None-Match": first.headers["ETag"]})
+    assert conditional.status_code == 304
+    assert client.calls == ["a"]
+
+
+def test_cached_endpoint_new_version_and_uncacheable(client):
+    etag = client.get("/items?q=a").headers["ETag"]
+    client.version.token = "v2"
+    again = client.get("/items?q=a", headers={"If-None-Match": etag})
+    assert again.status_code == 200 and again.headers["ETag"] != etag
+    assert client.calls == ["a", "a"]
+
+    # 500 不缓存；数据版本未知时不缓存
+    client.get("/items?q=error")
+    client.get("/items?q=error")
+    client.version.token = None
+    client.get("/items?q=b")
+    client.get("/items?q=b")
+    assert client.calls == ["a", "a", "error", "error", "b", "b"]
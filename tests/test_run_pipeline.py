@@ -0,0 +1,44 @@
+"""run_pipeline.py 的依赖图推导与阶段选择"""
+import pytest
+
+
+@pytest.fixture
+def pipeline(load_script):
+    return load_script("data_pipeline/run_pipeline.py")
+
+
+def test_graph_follows_declared_outputs(pipeline):
+    upstream = pipeline.build_graph(pipeline.STAGES)
+    assert upstream["101"] == []
+    assert upstream["104"] == ["103"]
+    assert upstream["206"] == ["205"]
+
+
+def test_select_and_branches(pipeline):
+    upstream = pipeline.build_graph(pipeline.STAGES)
+    order = pipeline.topological_order(pipeline.STAGES, upstream)
+    assert order.index("103") < order.index("104") < order.index("106")
+
+    selected = pipeline.select_stages(["105", "204"], upstream)
+    assert selected == {"101", "102", "103", "104", "105", "202", "203", "204"}
+    # 高校与公交站点两条分支互不依赖，分别在两个进程中运行
+    groups = pipeline.branches([s for s in order if s in selected], upstream)
+    assert sorted(groups) == [["101", "102", "103", "104", "105"], ["202", "203", "204"]]
+    with pytest.raises(ValueError):
+        pipeline.select_stages(["999"], upstream)
+
+
+def test_database_stages_report_failure_through_exit_status(pipeline):
+    # 106 / 206 失败时以非零状态退出，调度器据此记为失败
+    stages = {stage.id: stage for stage in pipeline.STAGES}
+    assert (stages["106"].entry, stages["106"].argv) == ("main", True)
+    assert (stages["206"].entry, stages["206"].argv) == ("main", True)
+
+
+def test_report_labels_rss_as_cumulative(pipeline, capsys):
+    results = [{"stage": "104", "status": "ok", "seconds": 1.0, "peak_mb": 2.0,
+                "max_rss_mb": 300.0, "children_rss_mb": 120.0, "reason": "输入有变化"}]
+    pipeline.print_report(results, 1.0)
+    out = capsys.readouterr().out
+    assert "累计RSS(MB)" in out and "子进程RSS(MB)" in out
+    assert "300" in out and "120" in out
@@ -0,0 +1,62 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("shapely")
+pytest.importorskip("pyproj")
+pytest.importorskip("sqlalchemy")
+
+from spatial_index import GEOD, SpatialIndex
+
+
+@pytest.fixture(scope="module")
+def index():
+    rng = np.random.default_rng(0)
+    lons = rng.uniform(113.2, 113.5, 300)
+    lats = rng.uniform(23.0, 23.3, 300)
+    return SpatialIndex([f"s{i}" for i in range(300)], lons, lats, {"某大学": (113.35, 23.15)})
+
+
+@pytest.fixture(scope="module")
+def queries():
+    rng = np.random.default_rng(1)
+    lons = np.r_[rng.uniform(113.2, 113.5, 40), 113.0, 114.5, 100.0]
+    lats = np.r_[rng.uniform(23.0, 23.3, 40), 23.1, 23.1, 40.0]
+    return lons, lats
+
+
+def brute_force(index, lon, lat, k, max_radius=None):
+    """与 SQL 路径相同：(按半径过滤后) 取平面距离最近的 k 个，再按测地线距离排序"""
+    _, _, dist = GEOD.inv(np.full(len(index), lon), np.full(len(index), lat), index.lons, index.lats)
+    candidates = np.arange(len(index))
+    if max_radius is not None:
+        candidates = candidates[dist <= max_radius]
+    planar = np.hypot(index.lons[candidates] - lon, index.lats[candidates] - lat)
+    nearest = candidates[np.lexsort((candidates, planar))][:k]
+    return [index.stations[i] for i in nearest[np.argsort(dist[nearest], kind="stable")]]
+
+
+@pytest.mark.parametrize("k, max_radius", [(1, None), (5, None), (3, 1500.0), (50, 800.0)])
+def test_nearest_many_matches_brute_force(index, queries, k, max_radius):
+    lons, lats = queries
+    results = index.nearest_many(lons, lats, k=k, max_radius=max_radius)
+    assert len(results) == len(lons)
+    for lon, lat, found in zip(lons, lats, results):
+        assert [station for station, *_ in found] == brute_force(index, lon, lat, k, max_radius)
+        distances = [d for *_, d in found]
+        assert distances == sorted(distances)
+        if max_radius is not None:
+            assert all(d <= max_radius for d in distances)
+
+
+def test_nearest_many_far_points_expand_search(index):
+    # 距离所有站点上千公里的点：从 2 km 起逐步放大范围，仍然返回 k 个
+    results = index.nearest_many([100.0], [40.0], k=4)
+    assert [s for s, *_ in results[0]] == brute_force(index, 100.0, 40.0, 4)
+
+
+def test_nearest_and_university(index):
+    station, lon, lat, dist = index.nearest(113.35, 23.15)
+    assert [station] == brute_force(index, 113.35, 23.15, 1)
+    assert index.nearest_to_university("某大学") == (station, lon, lat, dist)
+    assert index.nearest_to_university("不存在") is None
+    assert SpatialIndex([], [], [], {}).nearest_many([113.3], [23.1], k=3) == [[]]